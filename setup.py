@@ -9,6 +9,13 @@ setup(
     install_requires=[
         "PyExpUtils>=2.4",
     ],
+    extras_require={
+        'yaml': ['pyyaml'],
+        'sobol': ['scipy'],
+    },
+    entry_points={
+        'console_scripts': ['shb=shb.cli:main'],
+    },
     version=0.0,
     license='MIT',
     description='todo',
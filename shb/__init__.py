@@ -1 +1 @@
-from .shb import SHB, Job, SC_CHS, DMC_CHS
+from .shb import SHB, Job, JobBatch, SC_CHS, DMC_CHS
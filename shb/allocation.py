@@ -0,0 +1,126 @@
+import numpy as np
+from typing import TYPE_CHECKING, Dict, Generator, List
+
+if TYPE_CHECKING:
+    from .shb import SHB, Job
+
+def neymanAllocation(std: np.ndarray, budget: int, lower: int, upper: int) -> np.ndarray:
+    """
+    Splits `budget` runs between cells in proportion to the standard deviation of each cell (Neyman allocation),
+    giving every cell between `lower` and `upper` runs.
+
+    The variance of a stratified mean is sum(std**2 / n), which for a fixed total sum(n) is minimized by n proportional to std.
+    Cells that hit a bound are fixed there and the rest of the budget is shared out again between the remaining cells.
+    """
+    std = np.nan_to_num(np.asarray(std, dtype=np.float64))
+    n_cells = std.size
+    if budget < lower * n_cells or budget > upper * n_cells:
+        raise ValueError(f'Expected a budget between {lower * n_cells} and {upper * n_cells} runs', budget)
+
+    weights = std.ravel()
+    # with no information about any cell, fall back to a uniform allocation
+    if np.all(weights == 0):
+        weights = np.ones(n_cells)
+
+    alloc = np.zeros(n_cells)
+    free = np.ones(n_cells, dtype=bool)
+    while np.any(free):
+        remaining = budget - alloc[~free].sum()
+        w = weights[free]
+        share = remaining * w / w.sum() if w.sum() > 0 else np.full(w.shape, remaining / w.size)
+
+        clipped = np.clip(share, lower, upper)
+        if np.allclose(clipped, share):
+            alloc[free] = share
+            break
+
+        # fix the cells which went out of bounds and try again with the rest
+        idx = np.flatnonzero(free)
+        out = clipped != share
+        alloc[idx[out]] = clipped[out]
+        free[idx[out]] = False
+
+    # round down, then hand out the leftover runs by largest remainder
+    counts = np.floor(alloc + 1e-9).astype(np.int64)
+    leftover = int(budget - counts.sum())
+    if leftover > 0:
+        order = np.argsort(-(alloc - counts), kind='stable')
+        order = order[counts[order] < upper]
+        counts[order[:leftover]] += 1
+
+    return counts.reshape(std.shape)
+
+class RunAllocation:
+    """
+    Adaptive selection stage which spends a fixed budget of runs where the results are noisiest.
+
+    Every (env, setting) cell is first run `pilot_runs` times. The remaining runs are then allocated between cells
+    in proportion to the standard deviation of their CDF-scaled results (see `neymanAllocation`),
+    which minimizes the total variance of the cross-environment scores for the given budget.
+    No cell gets more than `selection_runs` runs, so cells end up with different numbers of runs.
+    Jobs use exactly the same seeds and indices as the full selection stage.
+
+    All jobs from the pilot round must be recorded before the second round is requested.
+
+    Attributes
+    ----------
+    budget : int
+        The total number of runs for each alg, across all envs and settings (including the pilot runs)
+    allocation : Dict[str, np.ndarray]
+        The (envs, settings) number of runs given to each stored cell for each alg, available after the pilot round
+    """
+    def __init__(self, shb: 'SHB', budget: int, pilot_runs: int = 2):
+        if pilot_runs < 2 or pilot_runs > shb.selection_runs:
+            raise ValueError('Expected 2 <= pilot_runs <= selection_runs', pilot_runs)
+
+        self.shb = shb
+        self.budget = budget
+        self.pilot_runs = pilot_runs
+        self.allocation: Dict[str, np.ndarray] = {}
+
+        n_envs = len(shb._envs)
+        for alg in shb._algs:
+            n_cells = n_envs * shb._numSettings(alg)
+            if budget < pilot_runs * n_cells or budget > shb.selection_runs * n_cells:
+                raise ValueError(f'Expected a budget between {pilot_runs * n_cells} and {shb.selection_runs * n_cells} runs for {alg}', budget)
+
+    def allocate(self) -> Dict[str, np.ndarray]:
+        shb = self.shb
+        if shb._getData() is None:
+            raise Exception("Can't allocate runs without pilot data")
+
+        assert shb.completed is not None
+        for alg in shb._algs:
+            if not np.all(shb.completed[alg][:, :, :self.pilot_runs]):
+                raise Exception('All jobs from the pilot round must be recorded before allocating runs', alg)
+
+        scaled = shb.scaleData(completed_only=True)
+        for alg in shb._algs:
+            std = np.nanstd(scaled[alg], axis=2, ddof=1)
+            self.allocation[alg] = neymanAllocation(std, self.budget, self.pilot_runs, shb.selection_runs)
+
+        return self.allocation
+
+    def iterateRounds(self) -> Generator[List['Job'], None, None]:
+        shb = self.shb
+        algs = shb._sortedAlgs()
+        n_envs = len(shb._envs)
+        settings = { alg: list(map(int, shb._settingIndices(alg))) for alg in algs }
+
+        yield [
+            shb._buildSelectionJob(alg, e, sr, idx)
+            for alg in algs
+            for e in range(n_envs)
+            for sr in range(self.pilot_runs)
+            for idx in settings[alg]
+        ]
+
+        allocation = self.allocate()
+        yield [
+            shb._buildSelectionJob(alg, e, sr, idx)
+            for alg in algs
+            for e in range(n_envs)
+            for sr in range(self.pilot_runs, shb.selection_runs)
+            for k, idx in enumerate(settings[alg])
+            if sr < allocation[alg][e, k]
+        ]
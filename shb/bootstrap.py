@@ -0,0 +1,174 @@
+import numpy as np
+from typing import Dict, NamedTuple, Optional
+
+class BootstrapSummary(NamedTuple):
+    """
+    Bootstrap estimates of the reliability of the selected parameters for a single alg.
+
+    Attributes
+    ----------
+    frequency : np.ndarray
+        The fraction of bootstraps in which each parameter setting was selected
+    score : np.ndarray
+        The mean cross-environment score of each parameter setting over bootstraps
+    lower : np.ndarray
+        The lower end of the confidence interval on each setting's score
+    upper : np.ndarray
+        The upper end of the confidence interval on each setting's score
+    picks : np.ndarray
+        The index of the selected parameter setting in each bootstrap
+    """
+    frequency: np.ndarray
+    score: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+    picks: np.ndarray
+
+class SelectionReliability(NamedTuple):
+    """
+    Bootstrap estimates of how reliably a single alg's parameters would be selected with fewer selection runs.
+
+    Attributes
+    ----------
+    runs : np.ndarray
+        The candidate numbers of selection runs
+    agreement : np.ndarray
+        For each candidate, the fraction of bootstraps which selected the same setting as the full data
+    regret : np.ndarray
+        For each candidate, the mean cross-environment score (on the full data) lost by not selecting the full data's setting
+    best : int
+        The index of the setting selected with the full data
+    picks : np.ndarray
+        The (candidates, n_boot) index of the selected setting in each bootstrap
+    """
+    runs: np.ndarray
+    agreement: np.ndarray
+    regret: np.ndarray
+    best: int
+    picks: np.ndarray
+
+def sampleRunIndices(rng: np.random.Generator, n_boot: int, n_envs: int, runs: int, repeated_measures: bool = False, draws: Optional[int] = None) -> np.ndarray:
+    # gives back a (n_boot, n_envs, draws) tensor of run indices sampled with replacement from `runs` runs,
+    # drawing as many runs as there are unless told otherwise.
+    # the same runs are used for every alg and setting, which are paired by seed.
+    # with repeated measures, runs are also paired across envs so use the same indices for each
+    if draws is None:
+        draws = runs
+
+    if repeated_measures:
+        idx = rng.integers(0, runs, size=(n_boot, 1, draws))
+        return np.repeat(idx, n_envs, axis=1)
+
+    return rng.integers(0, runs, size=(n_boot, n_envs, draws))
+
+def bootstrapScores(data: Dict[str, np.ndarray], run_idx: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Gives back the (n_boot, params) cross-environment score of every parameter setting for each alg
+    when the runs of `data` are resampled according to `run_idx`, exactly as `SHB.scoreParameters` would
+    compute them on the resampled data.
+
+    Rather than materializing every resampled dataset, we use the fact that a resample only changes how many
+    times each run appears. For each env we compute once how many samples of run `j` are below each cell `(p, r)`,
+    then the counts for every bootstrap are a weighted sum over runs, which is a single matrix product.
+    `run_idx` may draw fewer runs than `data` has, to score the data as if fewer runs had been done.
+    """
+    algs = list(data.keys())
+    n_boot, n_envs, draws = run_idx.shape
+    runs = data[algs[0]].shape[2]
+
+    # each alg's pool is weighted by its size so that every alg counts equally
+    sizes = np.array([data[alg].shape[1] * draws for alg in algs])
+
+    out = { alg: np.zeros((n_boot, data[alg].shape[1])) for alg in algs }
+    for e in range(n_envs):
+        # number of times each run appears in each bootstrap sample
+        weights = np.zeros((n_boot, runs))
+        np.add.at(weights, (np.arange(n_boot)[:, None], run_idx[:, e]), 1)
+
+        # pool every sample for this env, labelled by its (alg, run) group.
+        # after sorting, a cumulative count per group tells us how many samples
+        # of each group are below any position in the pool
+        values = np.concatenate([data[alg][e].ravel() for alg in algs])
+        groups = np.concatenate([
+            a * runs + np.tile(np.arange(runs), data[alg].shape[1]) for a, alg in enumerate(algs)
+        ])
+
+        order = np.argsort(values, kind='stable')
+        values = values[order]
+
+        below = np.zeros((values.shape[0] + 1, len(algs) * runs))
+        below[np.arange(1, values.shape[0] + 1), groups[order]] = 1
+        below = np.cumsum(below, axis=0)
+
+        for alg in algs:
+            cells = data[alg][e]
+            n_params = cells.shape[0]
+
+            # counts[p, r, a, j] is the number of samples from run `j` of alg `a` below the cell `(p, r)`
+            counts = below[np.searchsorted(values, cells, side='left')]
+            counts = counts.reshape(n_params, runs, len(algs), runs)
+
+            # so the CDF contribution of run `j` for the cell `(p, r)`, averaged over algs
+            contrib = np.einsum('praj,a->jpr', counts, 1 / sizes) / len(algs)
+
+            # nothing compares as greater than NaN
+            contrib[:, np.isnan(cells)] = 0
+
+            # cdf of each cell in each bootstrap, then average over resampled runs
+            cdfs = (weights @ contrib.reshape(runs, -1)).reshape(n_boot, n_params, runs)
+            out[alg] += np.einsum('bpr,br->bp', cdfs, weights) / draws
+
+    # average over environments
+    for alg in algs:
+        out[alg] /= n_envs
+
+    return out
+
+def summarize(scores: np.ndarray, confidence: float = 0.95) -> BootstrapSummary:
+    n_boot, n_params = scores.shape
+    picks = np.argmax(scores, axis=1)
+
+    tail = (1 - confidence) / 2
+    lower, upper = np.quantile(scores, [tail, 1 - tail], axis=0)
+
+    return BootstrapSummary(
+        frequency=np.bincount(picks, minlength=n_params) / n_boot,
+        score=np.mean(scores, axis=0),
+        lower=lower,
+        upper=upper,
+        picks=picks,
+    )
+
+def selectionReliability(data: Dict[str, np.ndarray], full_scores: Dict[str, np.ndarray], candidate_runs: np.ndarray, rng: np.random.Generator, n_boot: int, repeated_measures: bool = False) -> Dict[str, SelectionReliability]:
+    """
+    For each candidate number of runs, draws that many runs with replacement from the dense `data`,
+    repeats the whole selection procedure on each bootstrap sample, and compares the picks against
+    the setting picked by `full_scores` (the scores of the full data).
+
+    Regret is measured with the full-data scores, which stand in for the evaluation scores
+    of the settings as they are the best estimate available before the evaluation stage.
+    """
+    algs = list(data.keys())
+    n_envs, _, runs = data[algs[0]].shape
+
+    picks = { alg: np.empty((len(candidate_runs), n_boot), dtype=np.int64) for alg in algs }
+    for c, draws in enumerate(candidate_runs):
+        run_idx = sampleRunIndices(rng, n_boot, n_envs, runs, repeated_measures, draws=int(draws))
+        scores = bootstrapScores(data, run_idx)
+        for alg in algs:
+            picks[alg][c] = np.argmax(scores[alg], axis=1)
+
+    out: Dict[str, SelectionReliability] = {}
+    for alg in algs:
+        full = full_scores[alg]
+        best = int(np.argmax(full))
+
+        out[alg] = SelectionReliability(
+            runs=np.asarray(candidate_runs),
+            agreement=np.mean(picks[alg] == best, axis=1),
+            regret=np.mean(full[best] - full[picks[alg]], axis=1),
+            best=best,
+            picks=picks[alg],
+        )
+
+    return out
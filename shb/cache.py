@@ -0,0 +1,78 @@
+import os
+import glob
+import json
+import hashlib
+import numpy as np
+from typing import Any, Dict, Optional
+
+def jobKey(alg: str, env: str, params: Dict[str, Any], seed: int, alg_seed: int, env_seed: int) -> str:
+    """
+    A stable hash of everything that determines the outcome of a job.
+
+    Two jobs with the same key are the same experiment, regardless of where
+    their parameters sit in a sweep or which other algs and envs are registered.
+    """
+    desc = [alg, env, params, int(seed), int(alg_seed), int(env_seed)]
+    blob = json.dumps(desc, sort_keys=True, separators=(',', ':'), default=_jsonDefault)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+def _jsonDefault(o: Any):
+    # numpy scalars and arrays sometimes sneak into params
+    if isinstance(o, np.generic):
+        return o.item()
+
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+
+    raise TypeError(f'Cannot hash params containing {type(o)}')
+
+class ResultCache:
+    """
+    A content-addressed store of selection results, keyed by `jobKey`.
+
+    With a `path`, results are persisted as append-only logs in that directory.
+    Each process appends to its own log, so many processes can share a cache without locking;
+    the logs of all processes are read back when the cache is opened.
+    Without a `path`, the cache only lives in memory.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._results: Dict[str, float] = {}
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            for log in sorted(glob.glob(os.path.join(path, '*.log'))):
+                self._readLog(log)
+
+    def _readLog(self, log: str):
+        with open(log, 'r') as f:
+            for line in f:
+                parts = line.split()
+                # a process could have died part way through a line
+                if len(parts) != 2:
+                    continue
+
+                key, result = parts
+                self._results[key] = float(result)
+
+    def __len__(self):
+        return len(self._results)
+
+    def __contains__(self, key: str):
+        return key in self._results
+
+    def get(self, key: str) -> Optional[float]:
+        return self._results.get(key)
+
+    def put(self, key: str, result: float):
+        result = float(result)
+
+        # nothing to do if we already know this result
+        old = self._results.get(key)
+        if old is not None and (old == result or (np.isnan(old) and np.isnan(result))):
+            return
+
+        self._results[key] = result
+        if self.path is not None:
+            with open(os.path.join(self.path, f'{os.getpid()}.log'), 'a') as f:
+                f.write(f'{key} {result!r}\n')
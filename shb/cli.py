@@ -0,0 +1,255 @@
+"""
+A command-line pipeline for running the benchmark in stages.
+
+Each stage reads and writes plain files in a campaign directory, so that every stage
+can be its own script (or cluster array job) and no stage needs to rebuild the job generators:
+
+    shb plan registration.yaml campaign/    # writes the selection job manifest
+    shb job campaign/ 1234                  # prints the seeds and params for job 1234
+    shb ingest campaign/ results/           # loads results into the campaign's store
+    shb pick campaign/                      # writes the picked params
+    shb plan-eval campaign/                 # writes the evaluation job manifest
+    shb job campaign/ 1234 --eval           # prints evaluation job 1234
+
+Instead of fixed array indices, workers on any number of nodes can share a work queue:
+
+    shb plan registration.yaml campaign/ --ledger
+    shb claim campaign/ --n 10              # claims 10 jobs, printing one JSON line per job
+    shb complete campaign/ 17 0.53          # sends back the result of the job with `job_id` 17
+    shb ingest campaign/                    # loads the completed results into the campaign's store
+"""
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from typing import Any, Dict, List, Optional
+from .shb import SHB, Job
+from .ledger import JobLedger
+
+REGISTRATION = 'registration.json'
+MANIFEST = 'manifest.npy'
+EVAL_MANIFEST = 'eval_manifest.npy'
+PARAMS = 'params.json'
+STORE = 'data'
+LEDGER = 'ledger.sqlite'
+
+def readRegistration(path: str) -> Dict[str, Any]:
+    with open(path, 'r') as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise Exception('Reading YAML registrations requires pyyaml, `pip install pyyaml`')
+
+            return yaml.safe_load(f)
+
+        return json.load(f)
+
+def openCampaign(campaign: str) -> SHB:
+    # only reads the registration, nothing is enumerated
+    with open(os.path.join(campaign, REGISTRATION), 'r') as f:
+        registration = json.load(f)
+
+    return SHB.fromRegistration(registration, storage_path=os.path.join(campaign, STORE))
+
+def readParams(path: str) -> Dict[str, Any]:
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def writeJson(path: str, obj: Any):
+    # written to a temporary file first, so readers never see a partial file
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(obj, f, indent=2, sort_keys=True)
+
+    os.replace(tmp, path)
+
+def saveManifest(path: str, manifest: np.ndarray):
+    tmp = f'{path}.{os.getpid()}.tmp.npy'
+    np.save(tmp, manifest)
+    os.replace(tmp, path)
+
+def describeJob(job: Job) -> Dict[str, Any]:
+    return {
+        'alg': job.alg,
+        'env': job.env,
+        'idx': job.idx,
+        'run': job.run,
+        'seed': int(job.seed),
+        'alg_seed': int(job.alg_seed),
+        'env_seed': int(job.env_seed),
+        'params': job.params,
+        'type': job.type,
+    }
+
+# ---------------
+# -- Subcommands
+# ---------------
+
+def plan(args: argparse.Namespace):
+    shb = SHB.fromRegistration(readRegistration(args.registration), storage_path=os.path.join(args.campaign, STORE))
+
+    # set up the store before writing anything else. When re-planning an existing campaign
+    # with more envs, this grows the store and gives the new envs their own slots
+    os.makedirs(args.campaign, exist_ok=True)
+    shb._setUpDataStorage(grow=True)
+    writeJson(os.path.join(args.campaign, REGISTRATION), shb.registration())
+
+    manifest = shb.selectionManifest(skip_completed=args.skip_completed)
+    saveManifest(os.path.join(args.campaign, MANIFEST), manifest)
+
+    if args.ledger:
+        with JobLedger(os.path.join(args.campaign, LEDGER)) as ledger:
+            ledger.plan(manifest)
+
+    print(len(manifest))
+
+def job(args: argparse.Namespace):
+    shb = openCampaign(args.campaign)
+
+    # the manifest is memory-mapped, so looking up a single row doesn't read the whole file
+    if args.eval:
+        manifest = np.load(os.path.join(args.campaign, EVAL_MANIFEST), mmap_mode='r')
+        j = shb.getManifestJob(manifest[args.i], readParams(os.path.join(args.campaign, PARAMS)))
+    else:
+        manifest = np.load(os.path.join(args.campaign, MANIFEST), mmap_mode='r')
+        j = shb.getManifestJob(manifest[args.i])
+
+    print(json.dumps(describeJob(j), sort_keys=True))
+
+def claim(args: argparse.Namespace):
+    shb = openCampaign(args.campaign)
+    with JobLedger(os.path.join(args.campaign, LEDGER), lease=args.lease) as ledger:
+        rows = ledger.claim(args.n, args.worker)
+
+    for row in rows:
+        desc = describeJob(shb.getManifestJob(row))
+        desc['job_id'] = int(row['job_id'])
+        print(json.dumps(desc, sort_keys=True))
+
+def complete(args: argparse.Namespace):
+    with JobLedger(os.path.join(args.campaign, LEDGER)) as ledger:
+        ledger.complete(args.job_id, args.result)
+
+def ingest(args: argparse.Namespace):
+    """
+    Results can be laid out in the results directory as any mix of:
+      * `<alg>.npy` containing the full (envs, params, runs) tensor for an alg
+      * `<alg>/<env>.npy` containing the (params, runs) slab for one env
+      * `<i>.txt` containing the single result of the i'th job in the manifest
+
+    Completed results in the campaign's work queue are always loaded too.
+    """
+    shb = openCampaign(args.campaign)
+    manifest: Optional[np.ndarray] = None
+    algs = shb._sortedAlgs()
+
+    count = 0
+    ledger_path = os.path.join(args.campaign, LEDGER)
+    if os.path.exists(ledger_path):
+        with JobLedger(ledger_path) as ledger:
+            count += shb.loadLedger(ledger)
+
+    for name in sorted(os.listdir(args.results)) if args.results is not None else []:
+        path = os.path.join(args.results, name)
+        base, ext = os.path.splitext(name)
+
+        if os.path.isdir(path) and name in algs:
+            for env_file in sorted(os.listdir(path)):
+                env, ext = os.path.splitext(env_file)
+                if ext == '.npy':
+                    shb.loadResults(name, os.path.join(path, env_file), env=env, mmap=True)
+                    count += 1
+
+        elif ext == '.npy' and base in algs:
+            shb.loadResults(base, path, mmap=True)
+            count += 1
+
+        elif ext == '.txt' and base.isdigit():
+            if manifest is None:
+                manifest = np.load(os.path.join(args.campaign, MANIFEST), mmap_mode='r')
+
+            row = manifest[int(base)]
+            with open(path, 'r') as f:
+                result = float(f.read())
+
+            alg = algs[int(row['alg_id'])]
+            env = shb._envSlots()[int(row['env_id'])]
+            shb.record(alg, env, int(row['idx']), int(row['run']), result)
+            count += 1
+
+    shb.flush()
+    print(count)
+
+def pick(args: argparse.Namespace):
+    shb = openCampaign(args.campaign)
+    params = shb.pickParameters(completed_only=args.completed_only)
+
+    writeJson(os.path.join(args.campaign, PARAMS), params)
+    print(json.dumps(params, sort_keys=True))
+
+def planEval(args: argparse.Namespace):
+    shb = openCampaign(args.campaign)
+
+    # params picked elsewhere can be supplied instead of those from `shb pick`
+    if args.params is not None:
+        writeJson(os.path.join(args.campaign, PARAMS), readParams(args.params))
+
+    manifest = shb.evaluationManifest()
+    saveManifest(os.path.join(args.campaign, EVAL_MANIFEST), manifest)
+    print(len(manifest))
+
+def buildParser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='shb', description='Run the cross-environment hyperparameter setting benchmark in stages')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('plan', help='write the selection job manifest for a JSON or YAML registration')
+    p.add_argument('registration')
+    p.add_argument('campaign')
+    p.add_argument('--skip-completed', action='store_true', help='leave out jobs which already have results in the campaign')
+    p.add_argument('--ledger', action='store_true', help='also add the jobs to a work queue that workers can claim from')
+    p.set_defaults(fn=plan)
+
+    p = sub.add_parser('job', help="print a single job's seeds and params as JSON")
+    p.add_argument('campaign')
+    p.add_argument('i', type=int)
+    p.add_argument('--eval', action='store_true', help='look up an evaluation job rather than a selection job')
+    p.set_defaults(fn=job)
+
+    p = sub.add_parser('claim', help="claim jobs from the campaign's work queue, printing one JSON line per job")
+    p.add_argument('campaign')
+    p.add_argument('--n', type=int, default=1, help='the number of jobs to claim')
+    p.add_argument('--worker', default=None, help='a name for this worker, defaults to host:pid')
+    p.add_argument('--lease', type=float, default=3600.0, help='seconds before unfinished jobs are handed out again')
+    p.set_defaults(fn=claim)
+
+    p = sub.add_parser('complete', help="send back the result of a job claimed from the campaign's work queue")
+    p.add_argument('campaign')
+    p.add_argument('job_id', type=int)
+    p.add_argument('result', type=float)
+    p.set_defaults(fn=complete)
+
+    p = sub.add_parser('ingest', help="bulk-load selection results from a directory and the campaign's work queue")
+    p.add_argument('campaign')
+    p.add_argument('results', nargs='?', default=None)
+    p.set_defaults(fn=ingest)
+
+    p = sub.add_parser('pick', help='pick the best params for each alg from the ingested results')
+    p.add_argument('campaign')
+    p.add_argument('--completed-only', action='store_true', help='only score the results which have been recorded')
+    p.set_defaults(fn=pick)
+
+    p = sub.add_parser('plan-eval', help='write the evaluation job manifest for the picked params')
+    p.add_argument('campaign')
+    p.add_argument('--params', default=None, help='a JSON file of params to evaluate, instead of those from `shb pick`')
+    p.set_defaults(fn=planEval)
+
+    return parser
+
+def main(argv: Optional[List[str]] = None):
+    args = buildParser().parse_args(argv)
+    args.fn(args)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,102 @@
+import numpy as np
+from typing import Any, Dict, List, Tuple
+from PyExpUtils.utils.permute import _flattenToKeyValues, getNumberOfPermutations
+
+# a swept hyperparameter: its dotted path (e.g. 'optimizer.stepsize') and the values it takes
+Axis = Tuple[str, List[Any]]
+
+def sweepAxes(sweeps: Dict[str, Any]) -> List[Axis]:
+    """
+    Flattens a parameter sweep into its axes, in the same order that PyExpUtils enumerates settings:
+    axes are sorted by their dotted path, and the first axis varies fastest with the setting index.
+    Values which are not lists are axes with a single value, and each dict in a list
+    is flattened into its own axes (e.g. 'layers.[0].units').
+    """
+    # use PyExpUtils' own flattening, so that the grid always lines up with the setting indices
+    axes: List[Axis] = [(key, values) for key, values in _flattenToKeyValues(sweeps)]
+
+    n, size = getNumberOfPermutations(sweeps), int(np.prod(axisSizes(axes)))
+    if size != n:
+        raise ValueError(f'The axes of the sweep give {size} settings, but PyExpUtils counts {n}')
+
+    return axes
+
+def axisSizes(axes: List[Axis]) -> np.ndarray:
+    # empty lists are a single setting, just like in PyExpUtils
+    return np.array([max(1, len(values)) for _, values in axes], dtype=np.int64)
+
+def gridPositions(axes: List[Axis], idx: Any) -> np.ndarray:
+    # gives back the (..., axes) position along each axis of the setting(s) `idx`
+    idx = np.asarray(idx, dtype=np.int64)
+    sizes = axisSizes(axes)
+    strides = np.concatenate(([1], np.cumprod(sizes)[:-1])).astype(np.int64)
+    return (idx[..., None] // strides) % sizes
+
+def gridIndex(axes: List[Axis], positions: Any) -> np.ndarray:
+    # the inverse of `gridPositions`
+    positions = np.asarray(positions, dtype=np.int64)
+    sizes = axisSizes(axes)
+    strides = np.concatenate(([1], np.cumprod(sizes)[:-1])).astype(np.int64)
+    return np.sum(positions * strides, axis=-1)
+
+def sampleSettingIndices(sweeps: Dict[str, Any], max_settings: int, method: str = 'random', seed: int = 0) -> np.ndarray:
+    """
+    Gives back a reproducible, sorted subset of at most `max_settings` setting indices of the full sweep.
+
+    `method` is either 'random' (uniformly without replacement) or 'sobol' (a scrambled Sobol sequence
+    mapped onto the grid, which spreads the settings more evenly along every axis; requires scipy).
+    Indices are those of the full grid, so results for a subset line up with results for the full sweep.
+    """
+    axes = sweepAxes(sweeps)
+    sizes = axisSizes(axes)
+    n = int(np.prod(sizes))
+
+    if max_settings < 1:
+        raise ValueError('Expected max_settings to be at least 1', max_settings)
+
+    if max_settings >= n:
+        return np.arange(n)
+
+    rng = np.random.default_rng(seed)
+    if method == 'random':
+        return np.sort(rng.choice(n, size=max_settings, replace=False))
+
+    if method == 'sobol':
+        return _sobolSettingIndices(axes, max_settings, rng)
+
+    raise ValueError('Only know how to sample settings by "random" or "sobol"', method)
+
+def _sobolSettingIndices(axes: List[Axis], max_settings: int, rng: np.random.Generator) -> np.ndarray:
+    try:
+        from scipy.stats import qmc
+    except ImportError:
+        raise Exception('Sobol sampling requires scipy, `pip install scipy`')
+
+    sizes = axisSizes(axes)
+
+    # only the swept axes need to be spread out
+    swept = sizes > 1
+    sobol = qmc.Sobol(int(swept.sum()), scramble=True, seed=rng)
+
+    # distinct points can land on the same grid cell, so keep drawing until there are enough settings.
+    # each draw doubles the number of points, keeping the sequence balanced
+    m = int(np.ceil(np.log2(max_settings)))
+    chosen: Dict[int, None] = {}
+    for k in range(8):
+        points = sobol.random_base2(m + max(0, k - 1))
+        positions = np.zeros((points.shape[0], len(axes)), dtype=np.int64)
+        positions[:, swept] = np.floor(points * sizes[swept]).astype(np.int64)
+
+        for idx in gridIndex(axes, positions):
+            chosen.setdefault(int(idx), None)
+
+        if len(chosen) >= max_settings:
+            break
+
+    # very coarse grids can run out of new cells, top them up at random
+    out = np.array(list(chosen.keys())[:max_settings], dtype=np.int64)
+    if len(out) < max_settings:
+        rest = np.setdiff1d(np.arange(int(np.prod(sizes))), out)
+        out = np.concatenate((out, rng.choice(rest, size=max_settings - len(out), replace=False)))
+
+    return np.sort(out)
@@ -0,0 +1,81 @@
+import numpy as np
+from typing import TYPE_CHECKING, Dict, Generator, List
+
+if TYPE_CHECKING:
+    from .shb import SHB, Job
+
+class SuccessiveHalving:
+    """
+    Multi-fidelity selection stage which only runs promising hyperparameter settings with the full step budget.
+
+    Settings are first run with a fraction of `max_steps`, then only the top `1 / eta` of the settings
+    (separately for each alg) are promoted to a budget `eta` times larger, up to `max_steps` on the final rung.
+    Partial results are CDF-scaled amongst themselves in a separate `SHB` for each rung, so they never mix with
+    full-budget results. Only full-budget results are recorded to the parent `shb`.
+
+    The step budget for each job is given by `job.steps`. All jobs from a rung must be recorded before the next rung is requested.
+
+    Attributes
+    ----------
+    budgets : List[int]
+        The step budget of each rung, the last of which is always `max_steps`
+    rung_data : List[SHB]
+        An `SHB` holding the results of each rung; the last of these is the parent `shb`
+    survivors : Dict[str, np.ndarray]
+        A boolean mask over the stored settings of each alg (every setting, or only the sampled ones, see `SHB.sampleSettings`),
+        indicating which settings are still being run
+    """
+    def __init__(self, shb: 'SHB', max_steps: int, eta: int = 3, rungs: int = 3):
+        if eta < 2 or rungs < 1:
+            raise ValueError('Expected eta >= 2 and rungs >= 1', eta, rungs)
+
+        self.shb = shb
+        self.eta = eta
+
+        self.budgets = [max(1, int(max_steps / eta**(rungs - 1 - r))) for r in range(rungs)]
+        self.rung_data = [shb._emptyCopy() for _ in range(rungs - 1)] + [shb]
+
+        self.survivors: Dict[str, np.ndarray] = {}
+        for alg in shb._algs:
+            self.survivors[alg] = np.ones(shb._numSettings(alg), dtype=bool)
+
+    def promote(self, rung: int):
+        data = self.rung_data[rung]
+        if data._getData() is None:
+            raise Exception("Can't promote without data")
+
+        assert data.completed is not None
+        for alg, survivors in self.survivors.items():
+            if not np.all(data.completed[alg][:, survivors]):
+                raise Exception('All jobs from the previous rung must be recorded before promoting', alg)
+
+        scores = data.scoreParameters(completed_only=True)
+        for alg, survivors in self.survivors.items():
+            idxs = np.flatnonzero(survivors)
+            keep = max(1, int(np.ceil(len(idxs) / self.eta)))
+
+            # stable sort so ties are broken by lowest index, same as argmax
+            order = np.argsort(-scores[alg][idxs], kind='stable')
+            survivors[:] = False
+            survivors[idxs[order[:keep]]] = True
+
+    def iterateRounds(self) -> Generator[List['Job'], None, None]:
+        shb = self.shb
+        algs = shb._sortedAlgs()
+        n_envs = len(shb._envs)
+
+        for rung, steps in enumerate(self.budgets):
+            if rung > 0:
+                self.promote(rung - 1)
+
+            data = self.rung_data[rung]
+            jobs: List['Job'] = []
+            for alg in algs:
+                for e in range(n_envs):
+                    for sr in range(shb.selection_runs):
+                        for idx in shb._settingIndices(alg)[self.survivors[alg]]:
+                            job = data._buildSelectionJob(alg, e, sr, int(idx))
+                            job.steps = steps
+                            jobs.append(job)
+
+            yield jobs
@@ -0,0 +1,203 @@
+"""
+A work queue of selection jobs, kept in a SQLite database that every worker can open.
+
+Workers atomically claim batches of jobs for a limited time (a lease). Jobs whose lease runs out
+without a result, e.g. because their worker died, are handed out again to the next worker that asks.
+Results are kept in the ledger until they are loaded into an `SHB` object with `SHB.loadLedger`,
+so that no two nodes ever write to the same results store.
+
+SQLite relies on the filesystem's locks. These work on local disks and most cluster filesystems
+(e.g. Lustre or GPFS), but not on every NFS mount, so check that `flock` works on the shared filesystem first.
+Leases compare wall-clock times across nodes, so they should be much longer than any clock skew.
+"""
+import os
+import time
+import socket
+import sqlite3
+import numpy as np
+from contextlib import contextmanager
+from typing import Any, Dict, Generator, Optional
+from .shb import MANIFEST_DTYPE
+
+# the ledger's own id for a job, alongside the fields of the job manifest
+LEDGER_FIELDS = ['job_id', 'alg_id', 'env_id', 'idx', 'run', 'seed', 'alg_seed', 'env_seed']
+
+PENDING = 0
+CLAIMED = 1
+DONE = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY,
+    alg_id INTEGER NOT NULL,
+    env_id INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    run INTEGER NOT NULL,
+    seed INTEGER NOT NULL,
+    alg_seed INTEGER NOT NULL,
+    env_seed INTEGER NOT NULL,
+    state INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result REAL,
+    UNIQUE (alg_id, env_id, idx, run)
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, expires);
+"""
+
+def defaultWorker() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+class JobLedger:
+    """
+    A SQLite-backed queue of selection jobs with leases.
+
+    Parameters
+    ----------
+    path : str
+        The database file, created if it does not exist
+    lease : float
+        How many seconds a worker has to complete a claimed job before it is handed out again
+    timeout : float
+        How many seconds to wait for another process to release its lock on the database
+    """
+    def __init__(self, path: str, lease: float = 3600.0, timeout: float = 60.0):
+        if lease <= 0:
+            raise ValueError('Expected a positive lease', lease)
+
+        self.path = path
+        self.lease = lease
+
+        # transactions are managed explicitly, so that claiming is a single atomic step
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args: Any):
+        self.close()
+
+    def plan(self, manifest: np.ndarray) -> int:
+        # adds the jobs of a `selectionManifest` to the queue. Jobs which are already
+        # in the ledger keep their state, so re-planning a grown campaign only adds the new jobs.
+        # gives back the number of jobs added
+        rows = (
+            (int(r['alg_id']), int(r['env_id']), int(r['idx']), int(r['run']), int(r['seed']), int(r['alg_seed']), int(r['env_seed']))
+            for r in manifest
+        )
+
+        before = self._count()
+        with self._transaction():
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO jobs (alg_id, env_id, idx, run, seed, alg_seed, env_seed) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                rows,
+            )
+
+        return self._count() - before
+
+    def claim(self, n: int = 1, worker: Optional[str] = None) -> np.ndarray:
+        """
+        Atomically claims up to `n` jobs which are pending or whose lease has run out.
+
+        Gives back a structured array with the fields of `MANIFEST_DTYPE` plus the `job_id` used to complete them,
+        so rows can be turned into jobs with `SHB.getManifestJob`. An empty array means there is nothing left to claim,
+        though jobs claimed by other workers may still be handed out again if their lease runs out.
+        """
+        if n < 1:
+            raise ValueError('Expected to claim at least 1 job', n)
+
+        worker = worker or defaultWorker()
+        now = time.time()
+
+        with self._transaction():
+            rows = self._conn.execute(
+                f'SELECT {", ".join(LEDGER_FIELDS)} FROM jobs WHERE state = ? OR (state = ? AND expires < ?) ORDER BY job_id LIMIT ?',
+                (PENDING, CLAIMED, now, n),
+            ).fetchall()
+
+            self._conn.executemany(
+                'UPDATE jobs SET state = ?, worker = ?, expires = ?, attempts = attempts + 1 WHERE job_id = ?',
+                ((CLAIMED, worker, now + self.lease, row[0]) for row in rows),
+            )
+
+        return toRows(rows)
+
+    def renew(self, job_ids: Any, worker: Optional[str] = None):
+        # extends the lease on jobs which are taking longer than expected
+        worker = worker or defaultWorker()
+        expires = time.time() + self.lease
+        with self._transaction():
+            self._conn.executemany(
+                'UPDATE jobs SET expires = ? WHERE job_id = ? AND state = ? AND worker = ?',
+                ((expires, int(i), CLAIMED, worker) for i in np.atleast_1d(job_ids)),
+            )
+
+    def complete(self, job_ids: Any, results: Any):
+        # a job's seeds fully determine its result, so results from a worker
+        # whose lease had already run out are kept rather than thrown away
+        job_ids = np.atleast_1d(job_ids)
+        results = np.broadcast_to(np.asarray(results, dtype=np.float64), job_ids.shape)
+
+        with self._transaction():
+            self._conn.executemany(
+                'UPDATE jobs SET state = ?, result = ?, expires = NULL WHERE job_id = ? AND state != ?',
+                ((DONE, float(r), int(i), DONE) for i, r in zip(job_ids, results)),
+            )
+
+    def results(self) -> np.ndarray:
+        # every completed job as a structured array, with its result in the `result` field
+        rows = self._conn.execute(
+            f'SELECT {", ".join(LEDGER_FIELDS)}, result FROM jobs WHERE state = ? ORDER BY job_id',
+            (DONE,),
+        ).fetchall()
+
+        return toRows(rows, with_result=True)
+
+    def progress(self) -> Dict[str, int]:
+        # the number of jobs in each state, claimed jobs with an expired lease count as pending
+        now = time.time()
+        counts = { 'pending': 0, 'claimed': 0, 'done': 0 }
+        for state, expired, count in self._conn.execute(
+            'SELECT state, state = ? AND expires < ?, COUNT(*) FROM jobs GROUP BY 1, 2',
+            (CLAIMED, now),
+        ):
+            if state == DONE:
+                counts['done'] += count
+            elif state == PENDING or expired:
+                counts['pending'] += count
+            else:
+                counts['claimed'] += count
+
+        return counts
+
+    def _count(self) -> int:
+        return self._conn.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+
+    @contextmanager
+    def _transaction(self) -> Generator[None, None, None]:
+        # takes the write lock up front, so that two workers can't select the same jobs
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+
+        self._conn.execute('COMMIT')
+
+def toRows(rows: Any, with_result: bool = False) -> np.ndarray:
+    fields = [('job_id', np.int64)] + [(name, MANIFEST_DTYPE[name]) for name in MANIFEST_DTYPE.names]
+    if with_result:
+        fields.append(('result', np.float64))
+
+    out = np.empty(len(rows), dtype=np.dtype(fields))
+    names = LEDGER_FIELDS + (['result'] if with_result else [])
+    for k, name in enumerate(names):
+        out[name] = [row[k] for row in rows]
+
+    return out
@@ -0,0 +1,61 @@
+import numpy as np
+from typing import TYPE_CHECKING, Dict, Optional, Set
+from PyExpUtils.utils.permute import getParameterPermutation
+
+if TYPE_CHECKING:
+    from .shb import SHB, Params
+
+class OnlineScorer:
+    """
+    Keeps an up-to-date view of the cross-environment score of every parameter setting while results are still arriving.
+
+    Only recorded cells are used, exactly as in `shb.scoreParameters(completed_only=True)`: each setting is averaged over
+    the runs it has so far in each env, then over the envs it has been run on. Settings with no runs yet are NaN.
+
+    Every new result shifts the CDF of every other result above it in the same env,
+    so rather than touching every cell on each `record`, the per-env averages are cached and an env is only
+    rescored (with a single vectorized pass) the next time scores are requested after it received new data.
+    Recording is O(1) and reading costs O(n log n) only for envs that changed since the last read.
+    """
+    def __init__(self, shb: 'SHB'):
+        self.shb = shb
+
+        self._env_vals: Dict[str, np.ndarray] = {}
+        self._dirty: Set[int] = set(range(len(shb._envs)))
+
+    def invalidate(self, env_idx: Optional[int] = None):
+        if env_idx is None:
+            self._dirty = set(range(len(self.shb._envs)))
+        else:
+            self._dirty.add(env_idx)
+
+    def scores(self) -> Dict[str, np.ndarray]:
+        shb = self.shb
+        if shb._getData() is None:
+            raise Exception("Can't score parameters without data")
+
+        # the storage grows when envs are added, then every env needs to be rescored
+        assert shb.data is not None
+        if any(alg not in self._env_vals or self._env_vals[alg].shape != shb.data[alg].shape[:2] for alg in shb._algs):
+            self._env_vals = { alg: np.full(shb.data[alg].shape[:2], np.nan) for alg in shb._algs }
+            self._dirty = set(range(len(shb._envs)))
+
+        for i in sorted(self._dirty):
+            scaled = shb._scaleEnv(i, completed_only=True)
+            for alg in shb._algs:
+                self._env_vals[alg][i] = shb._averageRuns(scaled[alg], completed_only=True)
+
+        self._dirty = set()
+        return { alg: shb._averageEnvs(vals, completed_only=True) for alg, vals in self._env_vals.items() }
+
+    def currentBest(self) -> Dict[str, 'Params']:
+        # algs without any recorded data yet are left out
+        out: Dict[str, 'Params'] = {}
+        for alg, scores in self.scores().items():
+            if np.all(np.isnan(scores)):
+                continue
+
+            _, sweepable, _ = self.shb._algs[alg]
+            out[alg] = getParameterPermutation(sweepable, int(self.shb._settingIndices(alg)[np.nanargmax(scores)]))
+
+        return out
@@ -0,0 +1,39 @@
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+# a rough relative cost for each (alg, env) pair, e.g. expected seconds per run
+CostHint = Dict[Tuple[str, str], float]
+
+def orderJobs(jobs: Iterable[T], costs: Optional[CostHint] = None) -> List[T]:
+    jobs = list(jobs)
+    if costs is None:
+        return jobs
+
+    # longest-first, so that the expensive jobs don't end up as a long tail
+    # at the end of the campaign. Sorting is stable so ties keep their usual order
+    return sorted(jobs, key=lambda job: -costs.get((job.alg, job.env), 0))  # type: ignore
+
+def runJobs(fn: Callable[[T], Any], jobs: Iterable[T], executor: Optional[Executor] = None, max_workers: Optional[int] = None, chunksize: int = 1, costs: Optional[CostHint] = None) -> Iterator[Tuple[T, Any]]:
+    """
+    Runs `fn(job)` for every job, yielding `(job, result)` pairs in dispatch order.
+
+    If no `executor` is given, a `ProcessPoolExecutor` with `max_workers` processes is used (and shut down afterwards).
+    `fn` and the jobs must be picklable when using a process pool, so `fn` should be a module-level function.
+    """
+    jobs = orderJobs(jobs, costs)
+
+    owned = executor is None
+    if executor is None:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+
+    try:
+        # only process pools know how to chunk, other executors ignore the argument
+        results = executor.map(fn, jobs, chunksize=chunksize)
+        for job, result in zip(jobs, results):
+            yield job, result
+
+    finally:
+        if owned:
+            executor.shutdown()
@@ -0,0 +1,102 @@
+import numpy as np
+from statistics import NormalDist
+from typing import TYPE_CHECKING, Dict, Generator, List, Tuple
+
+if TYPE_CHECKING:
+    from .shb import SHB, Job
+
+def confidenceBounds(scaled: np.ndarray, confidence: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Gives back the (mean, lower, upper) bounds on the cross-environment score of each parameter setting.
+
+    `scaled` is a CDF-scaled (envs, params, runs) tensor with NaN for runs which have not been recorded.
+    Runs are treated as independent samples of the cross-environment score, using a normal approximation.
+    Settings with fewer than two complete runs get infinitely wide bounds.
+    """
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+
+    # a run only counts once it has been recorded in every env
+    per_run = np.mean(scaled, axis=0)
+    n = np.sum(~np.isnan(per_run), axis=1)
+
+    mean = np.full(per_run.shape[0], np.nan)
+    half_width = np.full(per_run.shape[0], np.inf)
+
+    has_runs = n > 0
+    mean[has_runs] = np.nanmean(per_run[has_runs], axis=1)
+
+    has_var = n > 1
+    std = np.nanstd(per_run[has_var], axis=1, ddof=1)
+    half_width[has_var] = z * std / np.sqrt(n[has_var])
+
+    return mean, mean - half_width, mean + half_width
+
+class Race:
+    """
+    Adaptive selection stage which stops running hyperparameter settings once they are clearly dominated.
+
+    Every setting is first run `initial_runs` times, then further runs are scheduled one round at a time.
+    Before each new round, settings whose upper confidence bound falls below the leader's lower confidence bound
+    are eliminated (separately for each alg). Jobs use exactly the same seeds and indices as the full selection stage.
+
+    All jobs from a round must be recorded before the next round is requested.
+
+    Attributes
+    ----------
+    survivors : Dict[str, np.ndarray]
+        A boolean mask over the stored settings of each alg (every setting, or only the sampled ones, see `SHB.sampleSettings`),
+        indicating which settings are still being run
+    """
+    def __init__(self, shb: 'SHB', initial_runs: int = 2, confidence: float = 0.95):
+        if initial_runs < 1 or initial_runs > shb.selection_runs:
+            raise ValueError('Expected 1 <= initial_runs <= selection_runs', initial_runs)
+
+        self.shb = shb
+        self.initial_runs = initial_runs
+        self.confidence = confidence
+
+        self.survivors: Dict[str, np.ndarray] = {}
+        for alg in shb._algs:
+            self.survivors[alg] = np.ones(shb._numSettings(alg), dtype=bool)
+
+        self._scheduled = 0
+
+    def eliminate(self):
+        shb = self.shb
+        if shb._getData() is None:
+            raise Exception("Can't race without data")
+
+        assert shb.completed is not None
+        for alg, survivors in self.survivors.items():
+            if not np.all(shb.completed[alg][:, survivors, :self._scheduled]):
+                raise Exception('All jobs from the previous round must be recorded before continuing the race', alg)
+
+        scaled = shb.scaleData(completed_only=True)
+        for alg, survivors in self.survivors.items():
+            mean, lo, hi = confidenceBounds(scaled[alg], self.confidence)
+
+            leader = np.flatnonzero(survivors)[np.argmax(mean[survivors])]
+            survivors &= ~(hi < lo[leader])
+
+    def iterateRounds(self) -> Generator[List['Job'], None, None]:
+        shb = self.shb
+        algs = shb._sortedAlgs()
+        n_envs = len(shb._envs)
+
+        runs = list(range(self.initial_runs))
+        while len(runs) > 0:
+            if self._scheduled > 0:
+                self.eliminate()
+
+            jobs = [
+                shb._buildSelectionJob(alg, e, sr, int(idx))
+                for alg in algs
+                for e in range(n_envs)
+                for sr in runs
+                for idx in shb._settingIndices(alg)[self.survivors[alg]]
+            ]
+
+            self._scheduled = runs[-1] + 1
+            yield jobs
+
+            runs = [self._scheduled] if self._scheduled < shb.selection_runs else []
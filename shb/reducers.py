@@ -0,0 +1,24 @@
+import numpy as np
+from typing import Callable, Union
+
+# reduces (..., steps) learning curves to a (...) array of scalars
+CurveReducer = Callable[[np.ndarray], np.ndarray]
+
+def auc(curves: np.ndarray) -> np.ndarray:
+    return np.nanmean(curves, axis=-1)
+
+def end(curves: np.ndarray, fraction: float = 0.25) -> np.ndarray:
+    steps = curves.shape[-1]
+    return np.nanmean(curves[..., -max(1, int(steps * fraction)):], axis=-1)
+
+def getCurveReducer(reducer: Union[str, CurveReducer]) -> CurveReducer:
+    if callable(reducer):
+        return reducer
+
+    if reducer == 'auc':
+        return auc
+
+    if reducer == 'end':
+        return end
+
+    raise ValueError('Only know how to reduce curves by "auc" or "end"', reducer)
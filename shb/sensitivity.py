@@ -0,0 +1,79 @@
+import warnings
+import numpy as np
+from typing import Any, Dict, List, NamedTuple, Tuple
+from .grid import axisSizes, sweepAxes
+
+class Sensitivity(NamedTuple):
+    """
+    The cross-environment score of every parameter setting of a single alg, laid out on the grid of swept axes.
+
+    Only axes with more than one value are part of the grid. Settings without results are NaN.
+
+    Attributes
+    ----------
+    axes : List[str]
+        The dotted path of each swept hyperparameter (e.g. 'optimizer.stepsize'), one per grid dimension
+    values : List[List[Any]]
+        The values each swept hyperparameter takes, in grid order
+    grid : np.ndarray
+        The N-dimensional tensor of scores, `grid[i, j, ...]` is the score with `values[0][i]`, `values[1][j]`, ...
+    best : Tuple[int, ...]
+        The grid position of the highest scoring setting
+    marginal : Dict[str, np.ndarray]
+        For each axis, the score along that axis averaged over every other axis
+    conditional : Dict[str, np.ndarray]
+        For each axis, the score along that axis with every other axis held at the best setting
+    """
+    axes: List[str]
+    values: List[List[Any]]
+    grid: np.ndarray
+    best: Tuple[int, ...]
+    marginal: Dict[str, np.ndarray]
+    conditional: Dict[str, np.ndarray]
+
+def sensitivityGrid(sweeps: Dict[str, Any], scores: np.ndarray) -> Sensitivity:
+    """
+    Reshapes the score of every setting of `sweeps` (indexed as by PyExpUtils) into a grid over the swept axes
+    and computes the marginal and conditional curves along each axis.
+
+    The first axis varies fastest with the setting index, so the scores are exactly a Fortran-ordered
+    tensor over all axes. Axes with a single value are then dropped from the grid.
+    """
+    all_axes = sweepAxes(sweeps)
+    sizes = axisSizes(all_axes)
+    if scores.shape[0] != int(np.prod(sizes)):
+        raise ValueError(f'Expected a score for each of the {int(np.prod(sizes))} settings', scores.shape)
+
+    if np.all(np.isnan(scores)):
+        raise Exception('No settings have been scored')
+
+    swept = [i for i, size in enumerate(sizes) if size > 1]
+    grid = np.reshape(scores, sizes, order='F').reshape(sizes[swept], order='F')
+
+    best = tuple(int(p) for p in np.unravel_index(np.nanargmax(grid), grid.shape))
+
+    axes = [all_axes[i][0] for i in swept]
+    values = [list(all_axes[i][1]) for i in swept]
+
+    marginal: Dict[str, np.ndarray] = {}
+    conditional: Dict[str, np.ndarray] = {}
+    for d, axis in enumerate(axes):
+        others = tuple(o for o in range(grid.ndim) if o != d)
+
+        # values of an axis that were never run give NaN rather than a warning
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            marginal[axis] = np.nanmean(grid, axis=others)
+
+        at_best = list(best)
+        at_best[d] = slice(None)
+        conditional[axis] = grid[tuple(at_best)]
+
+    return Sensitivity(
+        axes=axes,
+        values=values,
+        grid=grid,
+        best=best,
+        marginal=marginal,
+        conditional=conditional,
+    )
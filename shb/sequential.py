@@ -0,0 +1,96 @@
+import numpy as np
+from statistics import NormalDist
+from typing import TYPE_CHECKING, Dict, Generator, List
+
+if TYPE_CHECKING:
+    from .shb import SHB, Job, Params
+
+class SequentialEvaluation:
+    """
+    Evaluation stage which stops adding runs for an (alg, env) pair once its score is known precisely enough.
+
+    Every pair is first run `initial_runs` times, then further runs are released in waves of `wave_size`.
+    Before each new wave, a pair stops once the confidence interval on its CDF-scaled evaluation score
+    (as in `shb.evaluationScores()`) has a half-width of at most `half_width`, or once it reaches `eval_runs` runs.
+    Jobs use exactly the same seeds as the full evaluation stage, run `k` of a pair is always the same job.
+
+    All jobs from a wave must be recorded (or merged into `shb.evaluation`) before the next wave is requested.
+
+    Attributes
+    ----------
+    runs : Dict[str, Dict[str, int]]
+        The number of runs released so far for each (alg, env)
+    stopped : Dict[str, Dict[str, bool]]
+        Whether each (alg, env) has stopped receiving runs
+    """
+    def __init__(self, shb: 'SHB', alg_params: Dict[str, 'Params'], half_width: float = 0.01, initial_runs: int = 30, wave_size: int = 30, confidence: float = 0.95):
+        if initial_runs < 2 or initial_runs > shb.eval_runs:
+            raise ValueError('Expected 2 <= initial_runs <= eval_runs', initial_runs)
+
+        if wave_size < 1:
+            raise ValueError('Expected wave_size to be at least 1', wave_size)
+
+        self.shb = shb
+        self.alg_params = alg_params
+        self.half_width = half_width
+        self.initial_runs = initial_runs
+        self.wave_size = wave_size
+        self.confidence = confidence
+
+        self.runs: Dict[str, Dict[str, int]] = { alg: { env: 0 for env in shb._envs } for alg in shb._algs }
+        self.stopped: Dict[str, Dict[str, bool]] = { alg: { env: False for env in shb._envs } for alg in shb._algs }
+
+    def halfWidth(self, alg: str, env: str) -> float:
+        _, std, n = self.shb._evaluationMoments(alg, env)
+        if n < 2:
+            return np.inf
+
+        z = NormalDist().inv_cdf(1 - (1 - self.confidence) / 2)
+        return z * std / np.sqrt(n)
+
+    def stop(self):
+        shb = self.shb
+        for alg, envs in self.runs.items():
+            for env, runs in envs.items():
+                if self.stopped[alg][env]:
+                    continue
+
+                summary = shb.evaluation.get(alg, {}).get(env)
+                if summary is None or summary.count < runs:
+                    raise Exception('All jobs from the previous wave must be recorded before continuing', alg, env)
+
+                if runs >= shb.eval_runs or self.halfWidth(alg, env) <= self.half_width:
+                    self.stopped[alg][env] = True
+
+    def iterateWaves(self) -> Generator[List['Job'], None, None]:
+        shb = self.shb
+        algs = shb._sortedAlgs()
+        envs = shb._envSlots()
+
+        size = self.initial_runs
+        first = True
+        while True:
+            if not first:
+                self.stop()
+
+            jobs: List['Job'] = []
+            for a, alg in enumerate(algs):
+                for e, env in enumerate(envs):
+                    if self.stopped[alg][env]:
+                        continue
+
+                    start = self.runs[alg][env]
+                    end = min(start + size, shb.eval_runs)
+                    self.runs[alg][env] = end
+
+                    # the same ordering as `getEvaluationJob`, so the seeds are the same
+                    for run in range(start, end):
+                        i = (a * len(envs) + e) * shb.eval_runs + run
+                        jobs.append(shb.getEvaluationJob(i, self.alg_params))
+
+            if len(jobs) == 0:
+                return
+
+            yield jobs
+            size = self.wave_size
+            first = False
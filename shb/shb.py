@@ -1,12 +1,45 @@
+import os
+import json
+import zlib
+import warnings
 import numpy as np
 from logging import warn
-from typing import Any, Callable, Dict, List, Generator, Optional, Tuple, Union
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Generator, Optional, Tuple, Union
 from PyExpUtils.utils.dict import merge
 from PyExpUtils.utils.permute import getParameterPermutation, getNumberOfPermutations
+from concurrent.futures import Executor
+from .storage import openMemmap, dataPath, completedPath, curvesPath, envsPath, settingsPath
+from .parallel import CostHint, runJobs
+from .racing import Race
+from .halving import SuccessiveHalving
+from .allocation import RunAllocation
+from .sequential import SequentialEvaluation
+from .online import OnlineScorer
+from .sketch import EvaluationSummary
+from .cache import ResultCache, jobKey
+from .grid import sampleSettingIndices
+from .reducers import CurveReducer, getCurveReducer
+from .bootstrap import BootstrapSummary, SelectionReliability, bootstrapScores, sampleRunIndices, selectionReliability, summarize
+from .sensitivity import Sensitivity, sensitivityGrid
+
+if TYPE_CHECKING:
+    from .ledger import JobLedger
 
 # Type aliases
 Params = Dict[str, Any]
 AlgDescription = Tuple[str, Params, Dict[str, Params]]
+ArrayLike = Union[np.ndarray, str, os.PathLike]
+
+# one row per selection job, see `SHB.selectionManifest`
+MANIFEST_DTYPE = np.dtype([
+    ('alg_id', np.int32),
+    ('env_id', np.int32),
+    ('idx', np.int64),
+    ('run', np.int64),
+    ('seed', np.int64),
+    ('alg_seed', np.int64),
+    ('env_seed', np.int64),
+])
 
 class Job:
     """
@@ -27,18 +60,30 @@ class Job:
         The run number for this particular tuple of (alg, env, hyper-setting)
 
     params : Dict[str, Any]
-        A dictionary mapping from a hyper name to a single value for that hyper
+        A dictionary mapping from a hyper name to a single value for that hyper.
+        Selection jobs only build this from `idx` the first time it is accessed
 
     type : 'selection' | 'evaluation'
         A string literal indicating which stage of the SHB is being executed
 
+    steps : int | None
+        A budget on the number of steps to run this job for, or None to use the full budget
+
     Methods
     -------
 
     record(data: float) -> None
-        saves a single result of this particular job to the parent `shb` object
+        saves a single result of this particular job to the parent `shb` object.
+        Evaluation results are folded into a mergeable summary rather than stored individually
+
+    recordCurve(curve: np.ndarray) -> None
+        saves the full learning curve of this particular (selection) job to the parent `shb` object
     """
-    def __init__(self, idx: int, alg: str, env: str, params: Params, run: int, _type: str):
+    # millions of jobs can be alive at once for large campaigns,
+    # so keep each one as small as possible
+    __slots__ = ('seed', 'alg_seed', 'env_seed', 'idx', 'run', 'env', 'alg', 'type', 'steps', '_params', '_sweep', '_env_params', '_storeData', '_storeCurve')
+
+    def __init__(self, idx: int, alg: str, env: str, params: Optional[Params], run: int, _type: str, sweep: Optional[Params] = None, env_params: Optional[Params] = None):
         self.seed: int
         self.alg_seed: int
         self.env_seed: int
@@ -49,21 +94,117 @@ class Job:
         self.env = env
         self.alg = alg
 
-        self.params = params
+        # if not given directly, params are built from `sweep` and `idx` the first time they are needed
+        if params is None and sweep is None:
+            raise ValueError('Expected either params or a sweep to build them from')
+
+        self._params = params
+        self._sweep = sweep
+        self._env_params = env_params
 
         self.type = _type
 
+        self.steps: Optional[int] = None
+
         self._storeData: Callable
+        self._storeCurve: Callable
+
+    @property
+    def params(self) -> Params:
+        if self._params is None:
+            assert self._sweep is not None
+            self._params = merge(getParameterPermutation(self._sweep, self.idx), self._env_params or {})
+
+        return self._params
+
+    @params.setter
+    def params(self, params: Params):
+        self._params = params
 
     def record(self, result: float):
+        self._storeData(self.alg, self.env, self.idx, self.run, result)
+
+    def recordCurve(self, curve: np.ndarray):
         if self.type == 'evaluation':
-            raise Exception("Sorry, don't know how to store evaluation data")
+            raise Exception("Sorry, don't know how to store evaluation curves")
 
-        self._storeData(self.alg, self.env, self.idx, self.run, result)
+        self._storeCurve(self.alg, self.env, self.idx, self.run, curve)
+
+    def __getstate__(self):
+        # jobs are sent to worker processes on their own,
+        # don't drag the whole parent `shb` object (and its data) along with them
+        return {
+            k: getattr(self, k) for k in self.__slots__
+            if k not in ('_storeData', '_storeCurve') and hasattr(self, k)
+        }
+
+    def __setstate__(self, state: Dict[str, Any]):
+        for k, v in state.items():
+            setattr(self, k, v)
+
+
+class JobBatch:
+    """
+    A group of selection jobs which share the same (alg, env, hyper-setting) and differ only in their run (and so seeds).
+
+    Building the environment and agent code once per batch, or running every seed of a batch
+    in a single vectorized process, avoids paying construction costs for every job.
+
+    Attributes
+    ----------
+    alg, env, idx, params, type
+        Identical for every job in the batch, see `Job`
+
+    runs : np.ndarray
+        The run number of each job in the batch
+    seeds, alg_seeds, env_seeds : np.ndarray
+        The random seeds of each job in the batch, aligned with `runs`
+
+    jobs : List[Job]
+        The individual jobs making up this batch
+
+    Methods
+    -------
+
+    record(results: ArrayLike) -> None
+        saves one result per job (aligned with `runs`) to the parent `shb` object
+    """
+    def __init__(self, jobs: List[Job]):
+        if len(jobs) == 0:
+            raise ValueError('Expected at least one job in a batch')
+
+        first = jobs[0]
+        self.idx = first.idx
+        self.alg = first.alg
+        self.env = first.env
+        self.type = first.type
+
+        self.runs = np.array([job.run for job in jobs], dtype=np.int64)
+        self.seeds = np.array([job.seed for job in jobs], dtype=np.int64)
+        self.alg_seeds = np.array([job.alg_seed for job in jobs], dtype=np.int64)
+        self.env_seeds = np.array([job.env_seed for job in jobs], dtype=np.int64)
+
+        self.jobs = jobs
+
+    @property
+    def params(self) -> Params:
+        # built on first use, just like `Job.params`
+        return self.jobs[0].params
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def record(self, results: Any):
+        results = np.asarray(results)
+        if results.shape != (len(self.jobs),):
+            raise ValueError(f'Expected one result per job in the batch, got shape {results.shape}')
+
+        for job, result in zip(self.jobs, results):
+            job.record(result)
 
 
 class SHB:
-    def __init__(self, selection_runs: int = 3, eval_runs: int = 250, repeated_measures: bool = False, algs: Optional[List[AlgDescription]] = None, envs: Optional[List[str]] = None) -> None:
+    def __init__(self, selection_runs: int = 3, eval_runs: int = 250, repeated_measures: bool = False, algs: Optional[List[AlgDescription]] = None, envs: Optional[List[str]] = None, storage_path: Optional[str] = None, dtype: Any = np.float64) -> None:
         self._algs: Dict[str, AlgDescription] = {}
         self._envs = envs if envs is not None else []
 
@@ -77,6 +218,49 @@ class SHB:
 
         self.data: Union[None, Dict[str, np.ndarray]] = None
 
+        # optionally keep the selection data in memory-mapped files on disk
+        # so that it persists and can be shared between worker processes
+        self.storage_path = storage_path
+        self.dtype = np.dtype(dtype)
+        self.completed: Union[None, Dict[str, np.ndarray]] = None
+
+        # optionally, only a reproducible sample of the settings of each sweep is run, see `sampleSettings`
+        self.setting_sample: Optional[Dict[str, Any]] = None
+        self._settings: Optional[Dict[str, np.ndarray]] = None
+
+        # the size of each alg's full sweep, which is too slow to count for every job
+        self._num_perms: Dict[str, int] = {}
+
+        # the position of each env along the first axis of the storage, and in the seed scheme.
+        # alphabetical until storage is set up, after which the existing slots are frozen
+        # and any newly registered envs are given new slots at the end, see `_envSlots`
+        self._env_slots: Optional[List[str]] = None
+
+        # lazily built lookup structures for CDF scaling
+        # these are purely caches and are rebuilt whenever they are invalidated
+        self._env_index: Optional[Dict[str, int]] = None
+        self._cdf_index: Dict[int, Dict[str, np.ndarray]] = {}
+        self._online: Optional[OnlineScorer] = None
+
+        # optionally, full learning curves for each selection run.
+        # `self.data` then holds these curves reduced to a scalar by the current reducer
+        self.curves: Union[None, Dict[str, np.ndarray]] = None
+        self.curve_length: Optional[int] = None
+        self._reducer: Union[str, CurveReducer] = 'auc'
+        self._reduced: Dict[str, Dict[str, np.ndarray]] = {}
+
+        # optional bounded-memory sketches of the selection data for each (alg, env)
+        # used for approximate CDF scaling, see `useApproximateCdf`
+        self.sketches: Union[None, Dict[str, List[EvaluationSummary]]] = None
+        self.sketch_relative_accuracy = 0.01
+
+        # optional content-addressed store of selection results shared between campaigns, see `useResultCache`
+        self.result_cache: Optional[ResultCache] = None
+
+        # mergeable summaries of evaluation results for each (alg, env)
+        self.evaluation: Dict[str, Dict[str, EvaluationSummary]] = {}
+        self.eval_relative_accuracy = 0.01
+
         if repeated_measures and selection_runs < 30:
             warn('Using repeated measures with a small number of runs will result in high bias.')
 
@@ -92,6 +276,9 @@ class SHB:
 
         self._algs[alg] = (alg, params, per_env_params)
 
+        if self._settings is not None and self.setting_sample is not None:
+            self._settings[alg] = self._sampleAlgSettings(alg, **self.setting_sample)
+
     def registerEnvPool(self, envs: List[str]):
         # sanity check, make sure not registered yet
         for env in envs:
@@ -100,95 +287,534 @@ class SHB:
 
         # otherwise, register them
         self._envs += envs
+        self._env_index = None
+
+        # once there is data, existing envs keep their slot (and seeds)
+        # and the new envs are appended, growing the storage to make room
+        if self._env_slots is not None:
+            self._env_slots = self._env_slots + sorted(envs, key=str.casefold)
+            self._growEnvStorage()
+
+        # a store created by another process keeps its slots too, the new envs go after them
+        elif self._storeExists():
+            self._envSlots()
+            self._growEnvStorage()
+
+    def _sortedAlgs(self) -> List[str]:
+        return sorted(self._algs.keys(), key=str.casefold)
+
+    def _envSlots(self) -> List[str]:
+        if self._env_slots is not None:
+            return self._env_slots
+
+        # a store on disk may have been created (or grown) by another process
+        if self.storage_path is not None and os.path.exists(envsPath(self.storage_path)):
+            with open(envsPath(self.storage_path), 'r') as f:
+                self._env_slots = self._extendEnvSlots(json.load(f))
+
+            return self._env_slots
+
+        return sorted(self._envs, key=str.casefold)
+
+    def _extendEnvSlots(self, slots: List[str]) -> List[str]:
+        # keeps the given slots, then appends any registered envs which don't have one yet
+        for env in slots:
+            if env not in self._envs:
+                raise Exception('Stored data contains an environment which is not registered', env)
+
+        new = [env for env in self._envs if env not in slots]
+        return list(slots) + sorted(new, key=str.casefold)
+
+    def _freezeEnvSlots(self):
+        # called whenever storage is set up, from then on env slots never move
+        self._env_slots = self._envSlots()
+        self._env_index = None
+
+        if self.storage_path is not None:
+            os.makedirs(self.storage_path, exist_ok=True)
+            path = envsPath(self.storage_path)
+            tmp = f'{path}.{os.getpid()}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self._env_slots, f)
+
+            os.replace(tmp, path)
+
+    def _growEnvStorage(self):
+        n_envs = len(self._envs)
+
+        if self.storage_path is not None:
+            # re-opening the memmaps grows the files on disk.
+            # this is the only place (along with `shb plan`) that grows a store, because growing
+            # replaces the files and any process still writing to the old ones would lose its writes
+            self.flush()
+            had_data = self.data is not None or self._storeExists()
+            had_curves = self.curves is not None or (self.curve_length is not None and self._curveStoreExists())
+            self.data, self.completed, self.curves = None, None, None
+
+            if had_data:
+                self.data = self._setUpDataStorage(grow=True)
+
+            if had_curves:
+                self.curves = self._setUpCurveStorage(grow=True)
+
+            self._freezeEnvSlots()
+
+        else:
+            def grow(arr: np.ndarray, fill: Any) -> np.ndarray:
+                extra = np.full((n_envs - arr.shape[0],) + arr.shape[1:], fill, dtype=arr.dtype)
+                return np.concatenate((arr, extra), axis=0)
+
+            if self.data is not None and self.completed is not None:
+                self.data = { alg: grow(arr, 0) for alg, arr in self.data.items() }
+                self.completed = { alg: grow(arr, False) for alg, arr in self.completed.items() }
+
+            if self.curves is not None:
+                self.curves = { alg: grow(arr, np.nan) for alg, arr in self.curves.items() }
+
+        # cached reductions are shaped by the number of envs, the sorted samples of existing envs are still valid
+        self._reduced = {}
+        if self._online is not None:
+            self._online.invalidate()
+
+    def sampleSettings(self, max_settings: int, method: str = 'random', seed: int = 0) -> Dict[str, np.ndarray]:
+        """
+        Only run a reproducible sample of at most `max_settings` settings from the sweep of each alg,
+        drawn either uniformly at random or from a Sobol sequence over the axes of the sweep (requires scipy).
+
+        Setting indices (`job.idx`) stay those of the full grid, so results can be merged
+        with those of other samples or of the full sweep. Every job iterator then only gives back jobs
+        for the sampled settings, and settings are only picked from amongst those with results.
+        Only the sampled settings are stored: `shb.data` has one column per sampled setting, in the order given back here,
+        so settings must be sampled before anything is recorded.
+        Gives back the sorted setting indices for each alg.
+        """
+        if self.data is not None:
+            raise Exception('Settings must be sampled before any results are stored')
+
+        settings = { alg: self._sampleAlgSettings(alg, max_settings, method, seed) for alg in self._algs }
+        self.setting_sample = { 'max_settings': max_settings, 'method': method, 'seed': seed }
+        self._settings = settings
+        return self._settings
+
+    def _sampleAlgSettings(self, alg: str, max_settings: int, method: str, seed: int) -> np.ndarray:
+        # each alg gets its own sample, which doesn't change as other algs are registered
+        _, param_sweeps, _ = self._algs[alg]
+        return sampleSettingIndices(param_sweeps, max_settings, method, [seed, zlib.crc32(alg.encode('utf-8'))])  # type: ignore
+
+    def _settingIndices(self, alg: str) -> np.ndarray:
+        if self._settings is not None:
+            return self._settings[alg]
+
+        return np.arange(self._numPermutations(alg))
+
+    def _column(self, alg: str, idx: Any) -> Any:
+        # the position of setting(s) `idx` along the settings axis of the storage,
+        # which only holds the sampled settings (in sorted order) if there is a sample
+        if self._settings is None:
+            return idx
+
+        settings = self._settings[alg]
+        col = np.searchsorted(settings, idx)
+        if np.any(col >= len(settings)) or np.any(settings[np.minimum(col, len(settings) - 1)] != idx):
+            raise ValueError('Setting is not part of the sample', alg, idx)
+
+        return col
 
-    def iterateModelSelectionJobs(self) -> Generator[Job, None, None]:
-        # let's guarantee some orderings
-        algs = sorted(self._algs.keys(), key=str.casefold)
-        envs = sorted(self._envs, key=str.casefold)
+    def _numPermutations(self, alg: str) -> int:
+        if alg not in self._num_perms:
+            _, param_sweeps, _ = self._algs[alg]
+            self._num_perms[alg] = getNumberOfPermutations(param_sweeps)
 
-        for alg in algs:
-            _, param_sweeps, per_env = self._algs[alg]
-            for e, env in enumerate(envs):
-                env_params = per_env.get(env, {})
-                num_perm = getNumberOfPermutations(param_sweeps)
+        return self._num_perms[alg]
 
-                seed = e * self.selection_runs
-                alg_seed = e * self.selection_runs
-                env_seed = 0
+    def _numSettings(self, alg: str) -> int:
+        if self._settings is not None:
+            return len(self._settings[alg])
 
-                if self.repeated_measures:
-                    seed = 0
-                    alg_seed = 0
+        return self._numPermutations(alg)
 
+    def _numSelectionJobsForAlg(self, alg: str) -> int:
+        return len(self._envs) * self.selection_runs * self._numSettings(alg)
+
+    def numSelectionJobs(self) -> int:
+        return sum(self._numSelectionJobsForAlg(alg) for alg in self._algs)
+
+    def numEvaluationJobs(self) -> int:
+        return len(self._algs) * len(self._envs) * self.eval_runs
+
+    def getSelectionJob(self, i: int) -> Job:
+        # jobs are ordered by (alg, env, run, idx) with algs and envs sorted alphabetically.
+        # this computes the i'th job directly so that we never need to walk the generator
+        return self._buildSelectionJob(*self._selectionJobAddress(i))
+
+    def _selectionJobAddress(self, i: int) -> Tuple[str, int, int, int]:
+        if i < 0 or i >= self.numSelectionJobs():
+            raise IndexError('Selection job index out of range', i)
+
+        for alg in self._sortedAlgs():
+            n = self._numSelectionJobsForAlg(alg)
+            if i < n:
+                break
+
+            i -= n
+
+        num_perm = self._numSettings(alg)
+
+        e, i = divmod(i, self.selection_runs * num_perm)
+        sr, k = divmod(i, num_perm)
+
+        idx = self._settings[alg][k] if self._settings is not None else k
+        return alg, e, sr, int(idx)
+
+    def _selectionAddresses(self, shard: int = 0, num_shards: int = 1) -> Generator[Tuple[str, int, int, int, int], None, None]:
+        # the (alg, env, run, storage column, idx) of every `num_shards`-th job in job order,
+        # without the per-job address computation of `getSelectionJob`
+        i = 0
+        for alg in self._sortedAlgs():
+            settings = list(map(int, self._settingIndices(alg)))
+            for e in range(len(self._envs)):
                 for sr in range(self.selection_runs):
-                    for idx in range(num_perm):
-                        swept_params = getParameterPermutation(param_sweeps, idx)
-                        params = merge(swept_params, env_params)
+                    for k, idx in enumerate(settings):
+                        if i % num_shards == shard:
+                            yield alg, e, sr, k, idx
+
+                        i += 1
 
-                        job = Job(idx, alg, env, params, sr, _type='selection')
+    def _buildSelectionJob(self, alg: str, e: int, sr: int, idx: int) -> Job:
+        _, param_sweeps, per_env = self._algs[alg]
+        env = self._envSlots()[e]
 
-                        job.seed = seed
-                        job.alg_seed = alg_seed
-                        job.env_seed = env_seed
+        # params are only built if the job actually asks for them
+        job = Job(idx, alg, env, None, sr, _type='selection', sweep=param_sweeps, env_params=per_env.get(env, {}))
+        job.seed, job.alg_seed, job.env_seed = self._selectionSeeds(e, sr)
 
-                        job._storeData = self.record
+        job._storeData = self.record
+        job._storeCurve = self.recordCurve
 
-                        yield job
+        return job
 
-                    alg_seed += 1
-                    env_seed += 1
-                    seed += 1
+    def _selectionSeeds(self, e: Any, sr: Any) -> Tuple[Any, Any, Any]:
+        # works elementwise on arrays of env and run indices too.
+        # each env gets a fresh block of seeds, unless we are
+        # intentionally reusing seeds across envs for repeated measures
+        seed = sr if self.repeated_measures else e * self.selection_runs + sr
+        return seed, seed, sr
 
-    def iterateEvaluationJobs(self, alg_params: Dict[str, Params]) -> Generator[Job, None, None]:
-        algs = sorted(self._algs.keys(), key=str.casefold)
-        envs = sorted(self._envs, key=str.casefold)
+    def selectionManifest(self, shard: int = 0, num_shards: int = 1, skip_completed: bool = False) -> np.ndarray:
+        """
+        A compact description of every selection job as a structured array with one row per job, in job order.
 
-        # sanity check that we have params specified for each alg
-        # also ensure there is only one setting specified for each alg
-        for alg in algs:
-            params = alg_params[alg]
-            num_perm = getNumberOfPermutations(params)
-            assert num_perm == 1
+        Fields are `MANIFEST_DTYPE`: `alg_id` and `env_id` index into the alphabetically sorted algs and envs,
+        the rest are the same as on `Job`. Arguments are the same as for `iterateModelSelectionJobs`.
+        The manifest can be saved with `np.save` and rows turned back into jobs with `getManifestJob`.
+        """
+        if shard < 0 or shard >= num_shards:
+            raise ValueError('Expected 0 <= shard < num_shards', shard, num_shards)
+
+        completed = None
+        if skip_completed and self._getData() is not None:
+            completed = self.completed
+
+        parts = []
+        offset = 0
+        for a, alg in enumerate(self._sortedAlgs()):
+            settings = self._settingIndices(alg)
+            num_perm = len(settings)
+            n = self._numSelectionJobsForAlg(alg)
+
+            i = np.arange(n)
+            e, rem = np.divmod(i, self.selection_runs * num_perm)
+            sr, k = np.divmod(rem, num_perm)
+            idx = settings[k]
+
+            keep = (i + offset) % num_shards == shard
+            if completed is not None:
+                keep &= ~completed[alg][e, k, sr]
+
+            offset += n
+
+            part = np.empty(int(keep.sum()), dtype=MANIFEST_DTYPE)
+            part['alg_id'] = a
+            part['env_id'] = e[keep]
+            part['idx'] = idx[keep]
+            part['run'] = sr[keep]
+            part['seed'], part['alg_seed'], part['env_seed'] = self._selectionSeeds(e[keep], sr[keep])
+            parts.append(part)
+
+        if len(parts) == 0:
+            return np.empty(0, dtype=MANIFEST_DTYPE)
+
+        return np.concatenate(parts)
+
+    def getManifestJob(self, row: Any, alg_params: Optional[Dict[str, Params]] = None) -> Job:
+        # rebuilds the full job from a single row of `selectionManifest`,
+        # or of `evaluationManifest` if the parameters to evaluate are given
+        if alg_params is not None:
+            i = (int(row['alg_id']) * len(self._envs) + int(row['env_id'])) * self.eval_runs + int(row['run'])
+            return self.getEvaluationJob(i, alg_params)
+
+        alg = self._sortedAlgs()[int(row['alg_id'])]
+        return self._buildSelectionJob(alg, int(row['env_id']), int(row['run']), int(row['idx']))
+
+    def getEvaluationJob(self, i: int, alg_params: Dict[str, Params]) -> Job:
+        # jobs are ordered by (alg, env, run) with algs and envs sorted alphabetically
+        if i < 0 or i >= self.numEvaluationJobs():
+            raise IndexError('Evaluation job index out of range', i)
+
+        a, i = divmod(i, len(self._envs) * self.eval_runs)
+        e, run = divmod(i, self.eval_runs)
+
+        alg = self._sortedAlgs()[a]
+        env = self._envSlots()[e]
+
+        params = alg_params[alg]
+        assert getNumberOfPermutations(params) == 1
+
+        _, _, per_env = self._algs[alg]
+        all_params = merge(params, per_env.get(env, {}))
+
+        job = Job(0, alg, env, all_params, run, _type='evaluation')
+        job.seed, job.alg_seed, job.env_seed = self._evaluationSeeds(e, run)
+        job._storeData = self.recordEvaluation
+
+        return job
 
+    def _evaluationSeeds(self, e: Any, run: Any) -> Tuple[Any, Any, Any]:
+        # works elementwise on arrays of env and run indices too.
         # we need to know how many seeds we've tranversed so far
         # so that we use fresh seeds for the evaluation runs
         # otherwise we suffer a *large* amount of maximization bias
         # for now just use a lazy heuristic: we've definitely used less seeds than num selection jobs
-        selection_jobs = self.iterateModelSelectionJobs()
-        seed_offset = len(list(selection_jobs))
+        seed_offset = self.numSelectionJobs()
+
+        # if using repeated measures, reset seeds for each env
+        # always reset the env seed for each new env
+        seed = seed_offset + run if self.repeated_measures else seed_offset + e * self.eval_runs + run
+        return seed, seed, seed_offset + run
+
+    def evaluationManifest(self, shard: int = 0, num_shards: int = 1) -> np.ndarray:
+        # the evaluation counterpart of `selectionManifest`, `idx` is always 0.
+        # rows are turned back into jobs with `getManifestJob(row, alg_params)`
+        if shard < 0 or shard >= num_shards:
+            raise ValueError('Expected 0 <= shard < num_shards', shard, num_shards)
+
+        i = np.arange(shard, self.numEvaluationJobs(), num_shards)
+        a, rem = np.divmod(i, len(self._envs) * self.eval_runs)
+        e, run = np.divmod(rem, self.eval_runs)
+
+        manifest = np.zeros(len(i), dtype=MANIFEST_DTYPE)
+        manifest['alg_id'] = a
+        manifest['env_id'] = e
+        manifest['run'] = run
+        manifest['seed'], manifest['alg_seed'], manifest['env_seed'] = self._evaluationSeeds(e, run)
+
+        return manifest
+
+    def iterateModelSelectionJobs(self, shard: int = 0, num_shards: int = 1, skip_completed: bool = False) -> Generator[Job, None, None]:
+        # when sharding, take every `num_shards`-th job so that each
+        # shard sees a similar mix of algs and envs
+        if shard < 0 or shard >= num_shards:
+            raise ValueError('Expected 0 <= shard < num_shards', shard, num_shards)
+
+        # when resuming a campaign, only give back jobs which have not been recorded yet
+        completed = None
+        if skip_completed and self._getData() is not None:
+            completed = self.completed
+
+        for alg, e, sr, k, idx in self._selectionAddresses(shard, num_shards):
+            if completed is not None and completed[alg][e, k, sr]:
+                continue
+
+            job = self._buildSelectionJob(alg, e, sr, idx)
+            if self._recordFromCache(job):
+                continue
+
+            yield job
+
+    def iterateJobBatches(self, batch_size: Optional[int] = None, shard: int = 0, num_shards: int = 1, skip_completed: bool = False) -> Generator[JobBatch, None, None]:
+        # groups the selection jobs of each (alg, env, hyper-setting) into batches of at most `batch_size` runs,
+        # or all `selection_runs` runs at once if no size is given.
+        # jobs are identical to those from `iterateModelSelectionJobs`, only their order differs
+        if shard < 0 or shard >= num_shards:
+            raise ValueError('Expected 0 <= shard < num_shards', shard, num_shards)
+
+        if batch_size is None:
+            batch_size = self.selection_runs
+
+        if batch_size < 1:
+            raise ValueError('Expected batch_size to be at least 1', batch_size)
+
+        completed = None
+        if skip_completed and self._getData() is not None:
+            completed = self.completed
+
+        for alg, e, k, idx, runs in self._batchAddresses(batch_size, shard, num_shards):
+            jobs = self._pendingJobs(alg, e, k, idx, runs, completed)
+            if len(jobs) > 0:
+                yield JobBatch(jobs)
+
+    def _batchAddresses(self, batch_size: int, shard: int, num_shards: int) -> Generator[Tuple[str, int, int, int, range], None, None]:
+        # the (alg, env, storage column, idx, runs) of every `num_shards`-th batch.
+        # shards are assigned by position in the full set of batches,
+        # so that the assignment doesn't change as jobs are completed
+        i = 0
+        for alg in self._sortedAlgs():
+            for e in range(len(self._envs)):
+                for k, idx in enumerate(map(int, self._settingIndices(alg))):
+                    for start in range(0, self.selection_runs, batch_size):
+                        if i % num_shards == shard:
+                            yield alg, e, k, idx, range(start, min(start + batch_size, self.selection_runs))
+
+                        i += 1
+
+    def _pendingJobs(self, alg: str, e: int, k: int, idx: int, runs: Iterable[int], completed: Optional[Dict[str, np.ndarray]]) -> List[Job]:
+        # the jobs for `runs` of a single (alg, env, setting) which are neither recorded nor in the result cache
+        if completed is not None:
+            runs = [sr for sr in runs if not completed[alg][e, k, sr]]
+
+        jobs = [self._buildSelectionJob(alg, e, sr, idx) for sr in runs]
+        return [job for job in jobs if not self._recordFromCache(job)]
+
+    def planLedger(self, ledger: 'JobLedger', skip_completed: bool = False) -> int:
+        # adds every selection job to a shared work queue, gives back the number of new jobs
+        return ledger.plan(self.selectionManifest(skip_completed=skip_completed))
+
+    def iterateLedgerJobs(self, ledger: 'JobLedger', batch_size: int = 1, worker: Optional[str] = None) -> Generator[Job, None, None]:
+        # claims jobs from a shared work queue `batch_size` at a time until none are left.
+        # `job.record` sends the result back to the ledger rather than to this object's store,
+        # use `loadLedger` to bring the results into the store
+        while True:
+            rows = ledger.claim(batch_size, worker)
+            if len(rows) == 0:
+                return
+
+            for row in rows:
+                job = self.getManifestJob(row)
+                job._storeData = self._ledgerRecorder(ledger, int(row['job_id']))
+                yield job
+
+    @staticmethod
+    def _ledgerRecorder(ledger: 'JobLedger', job_id: int) -> Callable[[str, str, int, int, float], None]:
+        def store(alg: str, env: str, param_idx: int, run: int, result: float):
+            ledger.complete(job_id, result)
+
+        return store
+
+    def loadLedger(self, ledger: 'JobLedger') -> int:
+        # records every completed result from a shared work queue which is not already in the store.
+        # gives back the number of results loaded
+        if self.data is None:
+            self.data = self._setUpDataStorage()
+
+        algs = self._sortedAlgs()
+        envs = self._envSlots()
+
+        count = 0
+        for row in ledger.results():
+            alg = algs[int(row['alg_id'])]
+            e, idx, run = int(row['env_id']), int(row['idx']), int(row['run'])
+            if self.completed is not None and self.completed[alg][e, self._column(alg, idx), run]:
+                continue
 
-        # if we've gotten here, things are appropriately specified
-        for alg in algs:
-            seed = seed_offset
-            alg_seed = seed_offset
-            env_seed = seed_offset
+            self.record(alg, envs[e], idx, run, float(row['result']))
+            count += 1
 
+        return count
+
+    def iterateEvaluationJobs(self, alg_params: Dict[str, Params], shard: int = 0, num_shards: int = 1) -> Generator[Job, None, None]:
+        if shard < 0 or shard >= num_shards:
+            raise ValueError('Expected 0 <= shard < num_shards', shard, num_shards)
+
+        # sanity check that we have params specified for each alg
+        # also ensure there is only one setting specified for each alg
+        for alg in self._algs:
             params = alg_params[alg]
-            _, _, per_env = self._algs[alg]
-            for env in envs:
-                env_params = per_env.get(env, {})
-                all_params = merge(params, env_params)
-                for run in range(self.eval_runs):
-                    job = Job(0, alg, env, all_params, run, _type='evaluation')
-
-                    job.seed = seed
-                    job.alg_seed = alg_seed
-                    job.env_seed = env_seed
-                    yield job
-
-                    seed += 1
-                    alg_seed += 1
-                    env_seed += 1
-
-                # if using repeated measures, reset seeds for each env
-                if self.repeated_measures:
-                    alg_seed = seed_offset
-                    seed = seed_offset
-
-                # always reset the env seed for each new env
-                env_seed = seed_offset
-
-    def _setUpDataStorage(self):
+            num_perm = getNumberOfPermutations(params)
+            assert num_perm == 1
+
+        for i in range(shard, self.numEvaluationJobs(), num_shards):
+            yield self.getEvaluationJob(i, alg_params)
+
+    def sequentialEvaluation(self, alg_params: Dict[str, Params], half_width: float = 0.01, initial_runs: int = 30, wave_size: int = 30, confidence: float = 0.95) -> SequentialEvaluation:
+        # an adaptive alternative to `iterateEvaluationJobs`, see `SequentialEvaluation`
+        for alg in self._algs:
+            assert getNumberOfPermutations(alg_params[alg]) == 1
+
+        return SequentialEvaluation(self, alg_params, half_width, initial_runs, wave_size, confidence)
+
+    def iterateSequentialEvaluationJobs(self, alg_params: Dict[str, Params], half_width: float = 0.01, initial_runs: int = 30, wave_size: int = 30, confidence: float = 0.95) -> Generator[Job, None, None]:
+        # each job must be recorded before asking for the next wave
+        for jobs in self.sequentialEvaluation(alg_params, half_width, initial_runs, wave_size, confidence).iterateWaves():
+            yield from jobs
+
+    def race(self, initial_runs: int = 2, confidence: float = 0.95) -> Race:
+        # an adaptive alternative to `iterateModelSelectionJobs`, see `Race`.
+        # once finished, use `pickParameters(completed_only=True)`
+        return Race(self, initial_runs, confidence)
+
+    def iterateRacingJobs(self, initial_runs: int = 2, confidence: float = 0.95) -> Generator[Job, None, None]:
+        # each job must be recorded before asking for the next one
+        for jobs in self.race(initial_runs, confidence).iterateRounds():
+            yield from jobs
+
+    def successiveHalving(self, max_steps: int, eta: int = 3, rungs: int = 3) -> SuccessiveHalving:
+        # an adaptive alternative to `iterateModelSelectionJobs`, see `SuccessiveHalving`.
+        # once finished, use `pickParameters(completed_only=True)`
+        return SuccessiveHalving(self, max_steps, eta, rungs)
+
+    def iterateHalvingJobs(self, max_steps: int, eta: int = 3, rungs: int = 3) -> Generator[Job, None, None]:
+        # each job must be recorded before asking for the next one
+        for jobs in self.successiveHalving(max_steps, eta, rungs).iterateRounds():
+            yield from jobs
+
+    def allocateRuns(self, budget: int, pilot_runs: int = 2) -> RunAllocation:
+        # an adaptive alternative to `iterateModelSelectionJobs`, see `RunAllocation`.
+        # once finished, use `pickParameters(completed_only=True)`
+        return RunAllocation(self, budget, pilot_runs)
+
+    def iterateAllocatedJobs(self, budget: int, pilot_runs: int = 2) -> Generator[Job, None, None]:
+        # each job of the pilot round must be recorded before asking for the next round
+        for jobs in self.allocateRuns(budget, pilot_runs).iterateRounds():
+            yield from jobs
+
+    def _emptyCopy(self) -> 'SHB':
+        # same registration, but without any data
+        other = SHB(self.selection_runs, self.eval_runs, algs=list(self._algs.values()), envs=list(self._envs), dtype=self.dtype)
+        other.repeated_measures = self.repeated_measures
+        other._env_slots = self._env_slots
+        other.setting_sample = self.setting_sample
+        other._settings = self._settings
+        return other
+
+    def runSelection(self, fn: Callable[[Job], float], executor: Optional[Executor] = None, max_workers: Optional[int] = None, chunksize: int = 1, costs: Optional[CostHint] = None, skip_completed: bool = False):
+        # runs `fn(job)` for every selection job in a pool of processes
+        # and records the returned results in this (parent) process
+        jobs = self.iterateModelSelectionJobs(skip_completed=skip_completed)
+        for job, result in runJobs(fn, jobs, executor, max_workers, chunksize, costs):
+            job.record(result)
+
+    def runSelectionBatches(self, fn: Callable[[JobBatch], Any], batch_size: Optional[int] = None, executor: Optional[Executor] = None, max_workers: Optional[int] = None, chunksize: int = 1, costs: Optional[CostHint] = None, skip_completed: bool = False):
+        # like `runSelection`, but `fn(batch)` gives back one result per job in the batch
+        batches = self.iterateJobBatches(batch_size, skip_completed=skip_completed)
+        for batch, results in runJobs(fn, batches, executor, max_workers, chunksize, costs):
+            batch.record(results)
+
+    def runEvaluation(self, fn: Callable[[Job], float], alg_params: Dict[str, Params], executor: Optional[Executor] = None, max_workers: Optional[int] = None, chunksize: int = 1, costs: Optional[CostHint] = None):
+        # gives back a mapping alg -> env -> array of results, ordered by run
+        out: Dict[str, Dict[str, np.ndarray]] = {}
+        for alg in self._algs:
+            out[alg] = { env: np.zeros(self.eval_runs) for env in self._envs }
+
+        jobs = self.iterateEvaluationJobs(alg_params)
+        for job, result in runJobs(fn, jobs, executor, max_workers, chunksize, costs):
+            out[job.alg][job.env][job.run] = result
+            job.record(result)
+
+        return out
+
+    def _setUpDataStorage(self, grow: bool = False):
+        # `grow` extends a store on disk which has fewer envs than are registered,
+        # otherwise opening a store of a different size is an error
         if self.data is not None:
             raise Exception('We have already setup the data storage')
 
@@ -198,72 +824,617 @@ class SHB:
         # so use separate storage for each
         self.data = {}
 
+        # also keep track of which cells have actually been recorded
+        self.completed = {}
+
+        if self.storage_path is not None:
+            os.makedirs(self.storage_path, exist_ok=True)
+
         for alg in self._algs:
-            _, sweepable, _ = self._algs[alg]
-            n_params = getNumberOfPermutations(sweepable)
+            # only the settings being run are stored, see `sampleSettings`
+            shape = (n_envs, self._numSettings(alg), self.selection_runs)
+
+            if self.storage_path is None:
+                self.data[alg] = np.zeros(shape, dtype=self.dtype)
+                self.completed[alg] = np.zeros(shape, dtype=np.bool_)
+                continue
+
+            self._checkStoredSettings(alg)
 
-            self.data[alg] = np.zeros((n_envs, n_params, self.selection_runs))
+            # one byte per cell rather than a packed bitmap, so that concurrent
+            # writers never need to read-modify-write a shared byte
+            self.data[alg] = openMemmap(dataPath(self.storage_path, alg), shape, self.dtype, grow=grow)
+            self.completed[alg] = openMemmap(completedPath(self.storage_path, alg), shape, np.bool_, grow=grow)
+
+            if self._settings is not None:
+                self._saveStoredSettings(alg)
+
+        # only written once the store is known to match, so a failed open never changes the slots of other processes
+        self._freezeEnvSlots()
 
         # for type inference purposes
         return self.data
 
-    def record(self, alg: str, env: str, param_idx: int, run: int, result: float):
-        envs = sorted(self._envs, key=str.casefold)
+    def _checkStoredSettings(self, alg: str):
+        # the columns of a store only mean something alongside the sample of settings they hold
+        assert self.storage_path is not None
+        path = settingsPath(self.storage_path, alg)
+        if not os.path.exists(path):
+            return
+
+        if not np.array_equal(np.load(path), self._settingIndices(alg)):
+            raise ValueError(f'Existing store at {self.storage_path} holds a different sample of settings for {alg}')
+
+    def _saveStoredSettings(self, alg: str):
+        assert self.storage_path is not None and self._settings is not None
+        path = settingsPath(self.storage_path, alg)
+        if os.path.exists(path):
+            return
+
+        # every process samples the same settings, so it doesn't matter who writes them
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, self._settings[alg])
+
+        os.replace(tmp, path)
+
+    def _getData(self):
+        # on-disk storage may already contain data from other processes
+        # so open it rather than failing for lack of calls to `record`.
+        # reading never creates a store, that only happens on the first `record` (or `shb plan`)
+        if self.data is None and self._storeExists():
+            self.data = self._setUpDataStorage()
+
+        return self.data
+
+    def _storeExists(self) -> bool:
+        if self.storage_path is None:
+            return False
 
-        env_idx = envs.index(env)
+        return any(os.path.exists(dataPath(self.storage_path, alg)) for alg in self._algs)
 
+    def _curveStoreExists(self) -> bool:
+        if self.storage_path is None:
+            return False
+
+        return any(os.path.exists(curvesPath(self.storage_path, alg)) for alg in self._algs)
+
+    def _requireData(self, msg: str):
+        if self._getData() is None:
+            raise Exception(msg)
+
+        # a store on disk is set up before anything is run (e.g. by `shb plan`),
+        # so one which nothing has been recorded into is no better than no store at all
+        assert self.completed is not None
+        if self.storage_path is not None and not any(completed.any() for completed in self.completed.values()):
+            raise Exception(msg)
+
+    def flush(self):
+        if self.storage_path is None or self.data is None:
+            return
+
+        for arr in self.data.values():
+            if isinstance(arr, np.memmap):
+                arr.flush()
+
+        for arr in (self.completed or {}).values():
+            if isinstance(arr, np.memmap):
+                arr.flush()
+
+        for arr in (self.curves or {}).values():
+            if isinstance(arr, np.memmap):
+                arr.flush()
+
+    def record(self, alg: str, env: str, param_idx: int, run: int, result: float):
         # if we've not stored any data yet, first initialize some storage
         if self.data is None:
             self.data = self._setUpDataStorage()
 
+        env_idx = self._envIndex(env)
+        col = self._column(alg, param_idx)
+
         storage = self.data[alg]
 
-        storage[env_idx, param_idx, run] = result
+        overwrite = self.completed is not None and self.completed[alg][env_idx, col, run]
+        storage[env_idx, col, run] = result
 
-    def cdfScale(self, env: Union[str, int], data: float):
-        if self.data is None:
-            raise Exception("Can't cdfScale without data")
+        if self.completed is not None:
+            self.completed[alg][env_idx, col, run] = True
+
+        # sketches can't forget a value, so need to be rebuilt if a result is replaced
+        if self.sketches is not None:
+            if overwrite:
+                self._rebuildSketch(alg, env_idx)
+            else:
+                self._sketch(alg, env_idx).add(result)
+
+        self._invalidateResults(alg, env_idx)
+
+        if self.result_cache is not None:
+            job = self._buildSelectionJob(alg, env_idx, run, param_idx)
+            self.result_cache.put(self._cacheKey(job), result)
+
+    def loadResults(self, alg: str, results: ArrayLike, env: Optional[str] = None, mmap: bool = False):
+        # bulk version of `record`.
+        # `results` is either an array or the path to an `.npy` file containing
+        # the full (envs, params, runs) tensor for `alg`, or the (params, runs)
+        # slab for a single `env` if one is specified.
+        # when settings are sampled, `params` is either the sampled settings or the full grid
+        results = self._readResults(alg, results, env, mmap)
 
-        if type(env) is str:
-            envs = sorted(self._envs, key=str.casefold)
-            env_idx = envs.index(env)
+        if self.data is None:
+            self.data = self._setUpDataStorage()
 
+        # either the full tensor or a single env's slab
+        if env is None:
+            where: Any = slice(None)
+            envs = list(range(len(self._envs)))
         else:
-            env_idx = env
+            where = self._envIndex(env)
+            envs = [where]
+
+        self.data[alg][where] = results
+        if self.completed is not None:
+            self.completed[alg][where] = True
+
+        for e in envs:
+            self._invalidateResults(alg, e)
+            self._rebuildSketch(alg, e)
+
+    def _readResults(self, alg: str, results: ArrayLike, env: Optional[str], mmap: bool) -> np.ndarray:
+        # loads `results` for `loadResults` if needed, and checks they have the right shape
+        if alg not in self._algs:
+            raise Exception('Algorithm has not been registered', alg)
+
+        if not isinstance(results, np.ndarray):
+            results = np.load(results, mmap_mode='r' if mmap else None)
+
+        expected: Tuple[int, ...] = (self._numSettings(alg), self.selection_runs)
+        full: Tuple[int, ...] = (self._numPermutations(alg), self.selection_runs)
+        if env is None:
+            expected = (len(self._envs),) + expected
+            full = (len(self._envs),) + full
+
+        # only the sampled settings of a full grid of results are kept
+        if results.shape == full and full != expected:
+            results = results[..., self._settingIndices(alg), :]
+
+        if results.shape != expected:
+            raise ValueError(f'Expected results for {alg} with shape {expected}, got {results.shape}')
+
+        return results
+
+    def _invalidateResults(self, alg: str, env_idx: int):
+        # only the sorted samples and online scores for this (alg, env) are now stale
+        self._cdf_index.get(env_idx, {}).pop(alg, None)
+
+        if self._online is not None:
+            self._online.invalidate(env_idx)
+
+    def _setUpCurveStorage(self, grow: bool = False):
+        if self.curves is not None:
+            raise Exception('We have already setup the curve storage')
+
+        assert self.curve_length is not None
+        n_envs = len(self._envs)
+
+        # curves which have not been recorded are all NaN
+        self.curves = {}
+        for alg in self._algs:
+            shape = (n_envs, self._numSettings(alg), self.selection_runs, self.curve_length)
+
+            if self.storage_path is None:
+                self.curves[alg] = np.full(shape, np.nan, dtype=self.dtype)
+            else:
+                os.makedirs(self.storage_path, exist_ok=True)
+                self.curves[alg] = openMemmap(curvesPath(self.storage_path, alg), shape, self.dtype, fill=np.nan, grow=grow)
+
+        self._freezeEnvSlots()
+        return self.curves
+
+    def recordCurve(self, alg: str, env: str, param_idx: int, run: int, curve: np.ndarray):
+        curve = np.asarray(curve)
+
+        # unless specified ahead of time, assume all curves are as long as the first one
+        if self.curves is None:
+            if self.curve_length is None:
+                self.curve_length = curve.shape[0]
+
+            self.curves = self._setUpCurveStorage()
+
+        if curve.ndim != 1 or curve.shape[0] > self.curve_length:
+            raise ValueError(f'Expected a curve with at most {self.curve_length} steps, got shape {curve.shape}')
+
+        # shorter curves are padded with NaN
+        env_idx = self._envIndex(env)
+        col = self._column(alg, param_idx)
+        stored = self.curves[alg][env_idx, col, run]
+        stored[:curve.shape[0]] = curve
+        stored[curve.shape[0]:] = np.nan
+
+        # keep any cached reductions up to date
+        for reducer, reduced in self._reduced.items():
+            reduced[alg][env_idx, col, run] = getCurveReducer(reducer)(stored)
+
+        # then record a scalar as usual, using the current reducer
+        result = getCurveReducer(self._reducer)(stored)
+        self.record(alg, env, param_idx, run, float(result))
+
+    def reduceCurves(self, reducer: Union[str, CurveReducer]) -> Dict[str, np.ndarray]:
+        # gives back the (envs, params, runs) tensor of reduced curves for each alg.
+        # named reducers are computed once, then kept up to date by `recordCurve`.
+        # other callables are recomputed on every call
+        if isinstance(reducer, str) and reducer in self._reduced:
+            return self._reduced[reducer]
+
+        # other processes may have already recorded curves to disk
+        if self.curves is None and self.storage_path is not None and os.path.exists(curvesPath(self.storage_path, self._sortedAlgs()[0])):
+            self.curve_length = np.load(curvesPath(self.storage_path, self._sortedAlgs()[0]), mmap_mode='r').shape[-1]
+            self.curves = self._setUpCurveStorage()
+
+        if self.curves is None:
+            raise Exception("Can't reduce curves without any curves")
+
+        fn = getCurveReducer(reducer)
+        out: Dict[str, np.ndarray] = {}
+        for alg, curves in self.curves.items():
+            out[alg] = np.empty(curves.shape[:3])
+
+            # one env at a time, so that we never need to read every curve into memory at once
+            for e in range(curves.shape[0]):
+                with warnings.catch_warnings():
+                    # curves that were never recorded are all NaN
+                    warnings.simplefilter('ignore', RuntimeWarning)
+                    out[alg][e] = fn(np.asarray(curves[e]))
+
+        if isinstance(reducer, str):
+            self._reduced[reducer] = out
 
-        cdfs = np.empty(len(self._algs))
+        return out
 
-        for i, alg in enumerate(self._algs):
-            env_data = self.data[alg][env_idx]
-            count = np.sum(env_data < data)
-            cdfs[i] = count / (env_data.shape[0] * env_data.shape[1])
+    def _reducedData(self, reducer: Union[str, CurveReducer]) -> Dict[str, np.ndarray]:
+        # the recorded results with every recorded curve reduced by `reducer`,
+        # results recorded without a curve are kept as they are
+        assert self.data is not None
+        reduced = self.reduceCurves(reducer)
+        return { alg: np.where(np.isnan(reduced[alg]), self.data[alg], reduced[alg]) for alg in self._algs }
 
-        return np.mean(cdfs)
+    def useCurveReducer(self, reducer: Union[str, CurveReducer]):
+        # replace the scalar results in `self.data` with curves reduced by `reducer`
+        reduced = self.reduceCurves(reducer)
+        self._reducer = reducer
 
-    def pickParameters(self):
         if self.data is None:
-            raise Exception("Can't pick parameters without data")
+            self.data = self._setUpDataStorage()
 
-        out: Dict[str, Params] = {}
-        envs = sorted(self._envs, key=str.casefold)
         for alg in self._algs:
-            param_vals = np.zeros(self.data[alg].shape[0:2])
-            for i, env in enumerate(envs):
-                data = self.data[alg][i]
+            np.copyto(self.data[alg], reduced[alg], where=~np.isnan(reduced[alg]))
+
+            # sketches summarize the old results, so start them again from the new ones
+            for e in range(len(self._envs)):
+                self._rebuildSketch(alg, e)
+
+        self.invalidateCdfIndex()
+        if self._online is not None:
+            self._online.invalidate()
+
+    def recordEvaluation(self, alg: str, env: str, param_idx: int, run: int, result: float):
+        # evaluation runs are only ever summarized, so memory doesn't grow with the number of runs
+        summary = self.evaluation.setdefault(alg, {}).get(env)
+        if summary is None:
+            summary = self.evaluation[alg][env] = EvaluationSummary(self.eval_relative_accuracy)
+
+        summary.add(result)
+
+    def mergeEvaluation(self, other: Dict[str, Dict[str, EvaluationSummary]]):
+        # combine the evaluation summaries from another process, e.g. `other_shb.evaluation`
+        for alg, envs in other.items():
+            for env, summary in envs.items():
+                mine = self.evaluation.setdefault(alg, {}).get(env)
+                if mine is None:
+                    mine = self.evaluation[alg][env] = EvaluationSummary(self.eval_relative_accuracy)
+
+                mine.merge(summary)
+
+    def evaluationScores(self) -> Dict[str, Dict[str, float]]:
+        # the average CDF-scaled evaluation result for each (alg, env), scaled against the selection data.
+        # uses the sketched distribution of results, so each value is only known to within `eval_relative_accuracy`
+        self._requireData("Can't cdfScale without data")
+
+        out: Dict[str, Dict[str, float]] = {}
+        for alg, envs in self.evaluation.items():
+            out[alg] = { env: self._evaluationMoments(alg, env)[0] for env in envs }
+
+        return out
+
+    def _evaluationMoments(self, alg: str, env: str) -> Tuple[float, float, int]:
+        # the (mean, std, count) of the CDF-scaled evaluation results for an (alg, env)
+        summary = self.evaluation.get(alg, {}).get(env)
+        if summary is None or summary.count == 0:
+            return np.nan, np.nan, 0
+
+        values, counts = summary.sketch.buckets()
+
+        # NaN results count as the worst possible score
+        scaled = self.cdfScaleBatch(env, values) if len(values) else np.zeros(0)
+
+        n = summary.count
+        mean = float(np.dot(scaled, counts) / n)
+        if n < 2:
+            return mean, np.nan, n
+
+        var = (np.dot(scaled**2, counts) - n * mean**2) / (n - 1)
+        return mean, float(np.sqrt(max(var, 0.))), n
+
+    def useResultCache(self, cache: Union[str, ResultCache]):
+        # results are looked up by the content of the job (alg, env, merged params, and seeds)
+        # rather than by position in the sweep. Every `record`ed result is added to the cache,
+        # and iterating selection jobs records cache hits and only gives back the misses
+        self.result_cache = ResultCache(cache) if isinstance(cache, str) else cache
+
+    def _cacheKey(self, job: Job) -> str:
+        return jobKey(job.alg, job.env, job.params, job.seed, job.alg_seed, job.env_seed)
+
+    def _recordFromCache(self, job: Job) -> bool:
+        if self.result_cache is None:
+            return False
+
+        result = self.result_cache.get(self._cacheKey(job))
+        if result is None:
+            return False
+
+        self.record(job.alg, job.env, job.idx, job.run, result)
+        return True
+
+    def useApproximateCdf(self, relative_accuracy: float = 0.01):
+        # keep a quantile sketch of the recorded results for each (alg, env), updated by `record`.
+        # CDF queries against a sketch cost O(log buckets) rather than O(log n) against the sorted raw data,
+        # and the sketches use a bounded amount of memory regardless of how many runs are recorded
+        self.sketch_relative_accuracy = relative_accuracy
+        self.sketches = {}
+
+        if self._getData() is not None:
+            for alg in self._algs:
+                for e in range(len(self._envs)):
+                    self._rebuildSketch(alg, e)
+
+    def _rebuildSketch(self, alg: str, env_idx: int):
+        if self.sketches is None:
+            return
+
+        assert self.data is not None and self.completed is not None
+        sketch = EvaluationSummary(self.sketch_relative_accuracy)
+        sketch.addMany(self.data[alg][env_idx][self.completed[alg][env_idx]])
+
+        self._sketch(alg, env_idx)
+        self.sketches[alg][env_idx] = sketch
+
+    def _sketch(self, alg: str, env_idx: int) -> EvaluationSummary:
+        # sketches are made on demand, so that algs and envs can be registered after `useApproximateCdf`
+        assert self.sketches is not None
+        sketches = self.sketches.setdefault(alg, [])
+        while len(sketches) <= env_idx:
+            sketches.append(EvaluationSummary(self.sketch_relative_accuracy))
+
+        return sketches[env_idx]
+
+    def cdfScaleApproximate(self, env: Union[str, int], data: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # gives back an estimate of `cdfScale` for each element of `data` using only the sketches,
+        # along with a bound such that the exact value (over recorded results) is within estimate +- bound
+        if self.sketches is None:
+            raise Exception('Call `useApproximateCdf` before approximate CDF scaling')
+
+        env_idx = self._envIndex(env)
+        data = np.asarray(data, dtype=np.float64)
+
+        sketches = [self._sketch(alg, env_idx) for alg in self._algs]
+        sketches = [sketch for sketch in sketches if sketch.count > 0]
+
+        estimate = np.zeros(data.shape)
+        bound = np.zeros(data.shape)
+        for sketch in sketches:
+            lo, hi = sketch.cdfBounds(data)
+            estimate += (lo + hi) / 2
+            bound += (hi - lo) / 2
+
+        n = max(1, len(sketches))
+        return estimate / n, bound / n
+
+    def scoreParametersApproximate(self) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        # same as `scoreParameters(completed_only=True)` but using the sketches for CDF scaling.
+        # gives back the estimated score of each setting and a bound on its error for each alg
+        self._requireData("Can't score parameters without data")
+
+        assert self.data is not None and self.completed is not None
+        out: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for alg in self._algs:
+            estimate = np.empty(self.data[alg].shape)
+            bound = np.empty(self.data[alg].shape)
+            for e in range(len(self._envs)):
+                estimate[e], bound[e] = self.cdfScaleApproximate(e, self.data[alg][e])
 
-                # take cdfScaling of each run/param combo
-                vf = np.vectorize(lambda x: self.cdfScale(env, x))
-                scaled = vf(data)
+            missing = ~self.completed[alg]
+            estimate[missing] = np.nan
+            bound[missing] = np.nan
+
+            # the average of bounded values is bounded by the average of the bounds
+            out[alg] = (
+                self._averageEnvs(self._averageRuns(estimate, True), True),
+                self._averageEnvs(self._averageRuns(bound, True), True),
+            )
+
+        return out
+
+    def pickParametersApproximate(self) -> Tuple[Dict[str, Params], Dict[str, float]]:
+        # gives back the picked parameters and the bound on the cross-env score of each pick
+        params: Dict[str, Params] = {}
+        bounds: Dict[str, float] = {}
+        for alg, (estimate, bound) in self.scoreParametersApproximate().items():
+            if np.all(np.isnan(estimate)):
+                raise Exception('No results have been recorded for algorithm', alg)
+
+            col = int(np.nanargmax(estimate))
+
+            _, sweepable, _ = self._algs[alg]
+            params[alg] = getParameterPermutation(sweepable, int(self._settingIndices(alg)[col]))
+            bounds[alg] = float(bound[col])
+
+        return params, bounds
+
+    def _envIndex(self, env: Union[str, int]) -> int:
+        if type(env) is not str:
+            return int(env)
+
+        if self._env_index is None:
+            self._env_index = { name: i for i, name in enumerate(self._envSlots()) }
+
+        if env not in self._env_index:
+            raise ValueError(f'{env} is not in the registered environment pool')
+
+        return self._env_index[env]
+
+    def invalidateCdfIndex(self):
+        # needs to be called if `self.data` is modified without going through `record`
+        self._cdf_index = {}
+
+    def _sortedEnvSamples(self, env_idx: int) -> List[np.ndarray]:
+        assert self.data is not None
+        cache = self._cdf_index.setdefault(env_idx, {})
+
+        for alg in self._algs:
+            if alg not in cache:
+                cache[alg] = np.sort(self.data[alg][env_idx], axis=None)
 
-                # average over runs
-                scaled = np.mean(scaled, axis=1)
-                param_vals[i] = scaled
+        return [cache[alg] for alg in self._algs]
 
-            # average over environments
-            param_vals = np.mean(param_vals, axis=0)
+    def _cdfScaleEnv(self, samples: List[np.ndarray], data: np.ndarray) -> np.ndarray:
+        # vectorized equivalent of calling `cdfScale` for every element of `data`.
+        # with each alg's samples for this env already sorted, we can count the
+        # number of samples strictly less than each value with a binary search
+        data = np.asarray(data)
+
+        cdfs = np.empty((len(samples),) + data.shape)
+        for i, env_data in enumerate(samples):
+            count = np.searchsorted(env_data, data, side='left')
+            cdfs[i] = count / env_data.shape[0]
+
+        # nothing compares as greater than NaN
+        cdfs[:, np.isnan(data)] = 0
+
+        return np.mean(cdfs, axis=0)
+
+    def cdfScale(self, env: Union[str, int], data: float):
+        self._requireData("Can't cdfScale without data")
+
+        samples = self._sortedEnvSamples(self._envIndex(env))
+        return self._cdfScaleEnv(samples, np.asarray(data, dtype=np.float64))[()]
+
+    def cdfScaleBatch(self, env: Union[str, int], data: np.ndarray) -> np.ndarray:
+        self._requireData("Can't cdfScale without data")
+
+        samples = self._sortedEnvSamples(self._envIndex(env))
+        return self._cdfScaleEnv(samples, np.asarray(data, dtype=np.float64))
+
+    def _scaleEnv(self, i: int, completed_only: bool, data: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+        assert self.data is not None and self.completed is not None
+        data = self.data if data is None else data
+
+        # only need to sort the pooled samples once per env
+        if completed_only:
+            samples = [np.sort(data[alg][i][self.completed[alg][i]]) for alg in self._algs]
+            samples = [s for s in samples if s.shape[0] > 0]
+        elif data is self.data:
+            samples = self._sortedEnvSamples(i)
+        else:
+            samples = [np.sort(data[alg][i], axis=None) for alg in self._algs]
+
+        out: Dict[str, np.ndarray] = {}
+        for alg in self._algs:
+            # take cdfScaling of each run/param combo
+            out[alg] = self._cdfScaleEnv(samples, data[alg][i]) if len(samples) else np.full(data[alg][i].shape, np.nan)
+
+            if completed_only:
+                out[alg][~self.completed[alg][i]] = np.nan
+
+        return out
+
+    def scaleData(self, completed_only: bool = False, data: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+        # gives back the CDF-scaled (envs, params, runs) tensor for each alg.
+        # if `completed_only`, then only cells that have been recorded are used as
+        # the reference distribution and all other cells are NaN in the output.
+        # `data` scales other results shaped like `self.data` (e.g. reduced curves) instead
+        self._requireData("Can't scale data without data")
+
+        assert self.data is not None
+        data = self.data if data is None else data
+
+        # this is only called once per experiment, so don't trust
+        # any cached samples in case `self.data` was modified directly
+        self.invalidateCdfIndex()
+
+        out = { alg: np.empty(data[alg].shape) for alg in self._algs }
+        for i in range(len(self._envs)):
+            scaled = self._scaleEnv(i, completed_only, data)
+            for alg in self._algs:
+                out[alg][i] = scaled[alg]
+
+        return out
+
+    @staticmethod
+    def _averageRuns(scaled: np.ndarray, completed_only: bool) -> np.ndarray:
+        if not completed_only:
+            return np.mean(scaled, axis=-1)
+
+        # settings which have never been run will be NaN
+        with np.errstate(invalid='ignore'):
+            counts = np.sum(~np.isnan(scaled), axis=-1)
+            return np.nansum(scaled, axis=-1) / counts
+
+    @staticmethod
+    def _averageEnvs(env_vals: np.ndarray, completed_only: bool) -> np.ndarray:
+        if not completed_only:
+            return np.mean(env_vals, axis=0)
+
+        # average over only the envs a setting has been run on
+        with np.errstate(invalid='ignore'):
+            counts = np.sum(~np.isnan(env_vals), axis=0)
+            return np.nansum(env_vals, axis=0) / counts
+
+    def scoreParameters(self, completed_only: bool = False, data: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+        # gives back the cross-environment score of every stored parameter setting for each alg.
+        # when only a sample of the settings is run, that is one score per sampled setting (see `sampleSettings`)
+        # and some of these may not have results yet
+        if self._settings is not None:
+            completed_only = True
+
+        scaled = self.scaleData(completed_only, data)
+
+        out: Dict[str, np.ndarray] = {}
+        for alg in self._algs:
+            # average over runs, then over environments
+            env_vals = self._averageRuns(scaled[alg], completed_only)
+            out[alg] = self._averageEnvs(env_vals, completed_only)
+
+        return out
+
+    def pickParameters(self, completed_only: bool = False, reducer: Union[None, str, CurveReducer] = None):
+        self._requireData("Can't pick parameters without data")
+
+        # if learning curves were recorded, they can be reduced to a scalar in a different way than when they were recorded.
+        # this only changes what is scored, the recorded results are left alone
+        data = None
+        if reducer is not None:
+            data = self._reducedData(reducer)
+
+        scores = self.scoreParameters(completed_only, data)
+
+        out: Dict[str, Params] = {}
+        for alg in self._algs:
+            if np.all(np.isnan(scores[alg])):
+                raise Exception('No results have been recorded for algorithm', alg)
 
             # max over parameters
-            param_idx = int(np.argmax(param_vals))
+            param_idx = int(self._settingIndices(alg)[np.nanargmax(scores[alg])])
 
             # save params
             _, sweepable, _ = self._algs[alg]
@@ -271,13 +1442,194 @@ class SHB:
 
         return out
 
+    def registration(self) -> Dict[str, Any]:
+        # a JSON-serializable description of everything needed to rebuild this object's jobs
+        return {
+            'selection_runs': self.selection_runs,
+            'eval_runs': self.eval_runs,
+            'repeated_measures': self.repeated_measures,
+            'dtype': self.dtype.str,
+            'algs': [list(self._algs[alg]) for alg in self._algs],
+            'envs': list(self._envs),
+            'env_slots': self._env_slots,
+            'setting_sample': self.setting_sample,
+        }
+
+    @staticmethod
+    def fromRegistration(registration: Dict[str, Any], storage_path: Optional[str] = None) -> 'SHB':
+        # algs can be given either as (name, params, per_env_params) lists
+        # or as { name, params, per_env_params } objects, e.g. when written by hand
+        algs: List[AlgDescription] = []
+        for alg in registration.get('algs', []):
+            if isinstance(alg, dict):
+                alg = (alg['name'], alg.get('params', {}), alg.get('per_env_params', {}))
+
+            name, params, per_env = alg
+            algs.append((name, params, per_env if per_env is not None else {}))
+
+        shb = SHB(
+            registration.get('selection_runs', 3),
+            registration.get('eval_runs', 250),
+            algs=algs,
+            envs=list(registration.get('envs', [])),
+            storage_path=storage_path,
+            dtype=registration.get('dtype', np.float64),
+        )
+
+        # bypass the warning about repeated measures, it was already given once
+        shb.repeated_measures = registration.get('repeated_measures', False)
+
+        if registration.get('setting_sample') is not None:
+            shb.sampleSettings(**registration['setting_sample'])
+
+        # keep the slots of an env pool which was grown after recording data
+        if registration.get('env_slots') is not None:
+            shb._env_slots = shb._extendEnvSlots(registration['env_slots'])
+
+        return shb
+
+    def save(self, path: str):
+        # snapshot the registration and all recorded data to a single `.npz` file.
+        # written to a temporary file first, so an interrupted save never clobbers the previous checkpoint
+        arrays: Dict[str, np.ndarray] = { 'registration': np.array(json.dumps(self.registration())) }
+        if self.data is not None and self.completed is not None:
+            for alg in self._algs:
+                arrays[f'data/{alg}'] = np.asarray(self.data[alg])
+                arrays[f'completed/{alg}'] = np.asarray(self.completed[alg])
+
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load(path: str) -> 'SHB':
+        with np.load(path) as saved:
+            shb = SHB.fromRegistration(json.loads(str(saved['registration'])))
+
+            # there is only data if something was recorded before saving
+            if len(saved.files) > 1:
+                shb._setUpDataStorage()
+                assert shb.data is not None and shb.completed is not None
+                for alg in shb._algs:
+                    shb.data[alg][:] = saved[f'data/{alg}']
+                    shb.completed[alg][:] = saved[f'completed/{alg}']
+
+        return shb
+
+    def onlineScorer(self) -> OnlineScorer:
+        # attaches a scorer which is kept up to date by every call to `record`
+        if self._online is None:
+            self._online = OnlineScorer(self)
+
+        return self._online
+
+    def currentBest(self) -> Dict[str, Params]:
+        # the parameters `pickParameters(completed_only=True)` would pick given the results recorded so far
+        return self.onlineScorer().currentBest()
+
+    def pickParametersBootstrap(self, n_boot: int = 1000, seed: int = 0, confidence: float = 0.95) -> Dict[str, BootstrapSummary]:
+        # resamples runs with replacement and repeats the entire selection procedure
+        # (cdf scaling, averaging over envs, maximizing) for each bootstrap sample
+        self._requireData("Can't pick parameters without data")
+
+        # cells which were never run would otherwise join every CDF pool, and could be picked
+        self._requireDenseSelection('Every selection job must be recorded to bootstrap the selection')
+        assert self.data is not None
+
+        rng = np.random.default_rng(seed)
+        run_idx = sampleRunIndices(rng, n_boot, len(self._envs), self.selection_runs, self.repeated_measures)
+
+        scores = bootstrapScores(self.data, run_idx)
+        out = { alg: summarize(scores[alg], confidence) for alg in self._algs }
+
+        # indices are those of the full grid, settings which were never run are never picked
+        if self._settings is not None:
+            for alg, summary in out.items():
+                settings = self._settingIndices(alg)
+                n = self._numPermutations(alg)
+                out[alg] = summary._replace(
+                    frequency=self._toFullGrid(settings, n, summary.frequency, 0.),
+                    score=self._toFullGrid(settings, n, summary.score, np.nan),
+                    lower=self._toFullGrid(settings, n, summary.lower, np.nan),
+                    upper=self._toFullGrid(settings, n, summary.upper, np.nan),
+                    picks=settings[summary.picks],
+                )
+
+        return out
+
+    def _requireDenseSelection(self, message: str):
+        assert self.completed is not None
+        for alg in self._algs:
+            if not np.all(self.completed[alg]):
+                raise Exception(message, alg)
+
+    @staticmethod
+    def _toFullGrid(settings: np.ndarray, n: int, values: np.ndarray, fill: float) -> np.ndarray:
+        out = np.full(n, fill)
+        out[settings] = values
+        return out
+
+    def selectionReliability(self, candidate_runs: Optional[List[int]] = None, n_boot: int = 1000, seed: int = 0) -> Dict[str, SelectionReliability]:
+        # treats the selection data as a dense pilot and estimates, for each candidate number of selection runs,
+        # how often the selection procedure would pick the same setting as the pilot does and the score lost when it doesn't.
+        # defaults to every number of runs up to `selection_runs`
+        if self._getData() is None:
+            raise Exception("Can't estimate selection reliability without data")
+
+        self._requireDenseSelection('Every selection job must be recorded to estimate selection reliability')
+
+        if candidate_runs is None:
+            candidate_runs = list(range(1, self.selection_runs + 1))
+
+        for runs in candidate_runs:
+            if runs < 1 or runs > self.selection_runs:
+                raise ValueError('Expected candidate runs between 1 and selection_runs', runs)
+
+        assert self.data is not None
+        full_scores = self.scoreParameters()
+
+        rng = np.random.default_rng(seed)
+        out = selectionReliability(self.data, full_scores, np.asarray(candidate_runs), rng, n_boot, self.repeated_measures)
+
+        if self._settings is not None:
+            for alg, summary in out.items():
+                settings = self._settingIndices(alg)
+                out[alg] = summary._replace(best=int(settings[summary.best]), picks=settings[summary.picks])
+
+        return out
+
+    def sensitivity(self, alg: str, completed_only: bool = False) -> Sensitivity:
+        # the score of every setting of `alg` as a grid over its swept hyperparameters,
+        # with marginal and conditional curves along each one
+        return self.sensitivityReport(completed_only)[alg]
+
+    def sensitivityReport(self, completed_only: bool = False) -> Dict[str, Sensitivity]:
+        # same as `sensitivity` for every alg, scoring the data only once
+        self._requireData("Can't compute sensitivity without data")
+
+        scores = self.scoreParameters(completed_only)
+
+        out: Dict[str, Sensitivity] = {}
+        for alg in self._algs:
+            # settings outside of the sample have never been run
+            _, sweepable, _ = self._algs[alg]
+            grid_scores = self._toFullGrid(self._settingIndices(alg), self._numPermutations(alg), scores[alg], np.nan)
+            out[alg] = sensitivityGrid(sweepable, grid_scores)
+
+        return out
+
 # --------------------------
 # --- Specific Instances ---
 # --------------------------
 
 class NamedCHS(SHB):
-    def __init__(self, selection_runs: int = 3, eval_runs: int = 250, repeated_measures: bool = False, algs: Optional[List[AlgDescription]] = None) -> None:
-        super().__init__(selection_runs, eval_runs, repeated_measures, algs)
+    _envs: List[str] = []
+
+    def __init__(self, selection_runs: int = 3, eval_runs: int = 250, repeated_measures: bool = False, algs: Optional[List[AlgDescription]] = None, storage_path: Optional[str] = None, dtype: Any = np.float64) -> None:
+        # the class-level env pool would otherwise be shadowed by an empty pool
+        super().__init__(selection_runs, eval_runs, repeated_measures, algs, envs=list(type(self)._envs), storage_path=storage_path, dtype=dtype)
 
     def registerEnvPool(self, envs: List[str]):
         raise NotImplementedError('Cannot register new environments to a named instance')
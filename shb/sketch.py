@@ -0,0 +1,239 @@
+import numpy as np
+from typing import Dict, Tuple
+
+class RunningStats:
+    """
+    Count, mean, and variance of a stream of values in constant memory.
+
+    Two `RunningStats` built from disjoint streams can be merged (Chan et al.) to give
+    the same statistics as if every value had been added to a single instance.
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.
+        self._m2 = 0.
+
+    def add(self, x: float):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+    def addMany(self, xs: np.ndarray):
+        # same as adding each value in turn, up to rounding
+        xs = np.asarray(xs, dtype=np.float64).ravel()
+        if xs.size == 0:
+            return
+
+        other = RunningStats()
+        other.count = xs.size
+        other.mean = float(np.mean(xs))
+        other._m2 = float(np.sum((xs - other.mean)**2))
+        self.merge(other)
+
+    def merge(self, other: 'RunningStats'):
+        if other.count == 0:
+            return
+
+        n = self.count + other.count
+        delta = other.mean - self.mean
+
+        self._m2 += other._m2 + delta**2 * self.count * other.count / n
+        self.mean += delta * other.count / n
+        self.count = n
+
+    @property
+    def variance(self) -> float:
+        # unbiased sample variance
+        if self.count < 2:
+            return np.nan
+
+        return self._m2 / (self.count - 1)
+
+    @property
+    def stderr(self) -> float:
+        return np.sqrt(self.variance / self.count)
+
+class QuantileSketch:
+    """
+    A DDSketch-style quantile sketch: values are counted in logarithmically sized buckets
+    so that every value is represented to within `relative_accuracy` of its magnitude.
+
+    Memory grows only with the logarithm of the range of values, not with the number of values.
+    Because a sketch is just a set of bucket counts, merging two sketches (with the same accuracy) is exact
+    and order independent: the result is identical to having added every value to a single sketch.
+    """
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-9):
+        if relative_accuracy <= 0 or relative_accuracy >= 1:
+            raise ValueError('Expected 0 < relative_accuracy < 1', relative_accuracy)
+
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self._log_gamma = np.log((1 + relative_accuracy) / (1 - relative_accuracy))
+
+        self.count = 0
+        self.zeros = 0
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+
+    def _key(self, x: float) -> int:
+        return int(np.ceil(np.log(x) / self._log_gamma))
+
+    def _value(self, key: int) -> float:
+        # the value at the center of the bucket, within `relative_accuracy` of anything in the bucket
+        gamma = np.exp(self._log_gamma)
+        return 2 * gamma**key / (gamma + 1)
+
+    def add(self, x: float, count: int = 1):
+        if np.isnan(x):
+            raise ValueError("Can't add NaN to a quantile sketch")
+
+        self.count += count
+        if abs(x) < self.min_value:
+            self.zeros += count
+
+        elif x > 0:
+            k = self._key(x)
+            self.positive[k] = self.positive.get(k, 0) + count
+
+        else:
+            k = self._key(-x)
+            self.negative[k] = self.negative.get(k, 0) + count
+
+    def addMany(self, xs: np.ndarray):
+        # same as adding each value in turn, but the bucket of every value is found at once
+        xs = np.asarray(xs, dtype=np.float64).ravel()
+        if np.any(np.isnan(xs)):
+            raise ValueError("Can't add NaN to a quantile sketch")
+
+        small = np.abs(xs) < self.min_value
+        self.count += xs.size
+        self.zeros += int(np.sum(small))
+
+        self._addKeys(self.positive, xs[~small & (xs > 0)])
+        self._addKeys(self.negative, -xs[~small & (xs < 0)])
+
+    def _addKeys(self, buckets: Dict[int, int], xs: np.ndarray):
+        keys, counts = np.unique(np.ceil(np.log(xs) / self._log_gamma).astype(np.int64), return_counts=True)
+        for k, c in zip(keys.tolist(), counts.tolist()):
+            buckets[k] = buckets.get(k, 0) + c
+
+    def merge(self, other: 'QuantileSketch'):
+        if other.relative_accuracy != self.relative_accuracy or other.min_value != self.min_value:
+            raise ValueError('Can only merge sketches with the same accuracy')
+
+        self.count += other.count
+        self.zeros += other.zeros
+        for k, c in other.positive.items():
+            self.positive[k] = self.positive.get(k, 0) + c
+
+        for k, c in other.negative.items():
+            self.negative[k] = self.negative.get(k, 0) + c
+
+    def buckets(self) -> Tuple[np.ndarray, np.ndarray]:
+        # gives back the representative value and count of each non-empty bucket, in increasing order of value
+        neg = sorted(self.negative.keys(), reverse=True)
+        pos = sorted(self.positive.keys())
+
+        values = [-self._value(k) for k in neg] + ([0.] if self.zeros else []) + [self._value(k) for k in pos]
+        counts = [self.negative[k] for k in neg] + ([self.zeros] if self.zeros else []) + [self.positive[k] for k in pos]
+
+        return np.array(values, dtype=np.float64), np.array(counts, dtype=np.int64)
+
+    def _bucketBounds(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # gives back the (lower, upper, count) of each non-empty bucket, in increasing order of value
+        gamma = np.exp(self._log_gamma)
+        neg = np.array(sorted(self.negative.keys(), reverse=True), dtype=np.int64)
+        pos = np.array(sorted(self.positive.keys()), dtype=np.int64)
+
+        lower = [-gamma**neg.astype(float)] + ([np.array([-self.min_value])] if self.zeros else []) + [gamma**(pos - 1.)]
+        upper = [-gamma**(neg - 1.)] + ([np.array([self.min_value])] if self.zeros else []) + [gamma**pos.astype(float)]
+        counts = [self.negative[k] for k in neg] + ([self.zeros] if self.zeros else []) + [self.positive[k] for k in pos]
+
+        return np.concatenate(lower), np.concatenate(upper), np.array(counts, dtype=np.int64)
+
+    def cdfBounds(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Gives back lower and upper bounds on the fraction of values strictly less than each element of `x`.
+
+        Every value in a bucket that lies entirely below `x` is certainly less than `x`,
+        only the bucket that `x` falls into is uncertain. So the gap between the bounds is
+        the fraction of values which are within `relative_accuracy` of `x`.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        if self.count == 0:
+            return np.zeros(x.shape), np.zeros(x.shape)
+
+        lower, upper, counts = self._bucketBounds()
+        cumulative = np.concatenate(([0], np.cumsum(counts)))
+
+        # buckets are disjoint and sorted, so both bounds are monotone over buckets
+        certain = cumulative[np.searchsorted(upper, x, side='left')]
+        possible = cumulative[np.searchsorted(lower, x, side='left')]
+
+        # nothing compares as greater than NaN
+        certain = np.where(np.isnan(x), 0, certain)
+        possible = np.where(np.isnan(x), 0, possible)
+
+        return certain / self.count, possible / self.count
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return np.nan
+
+        values, counts = self.buckets()
+        rank = q * (self.count - 1)
+        idx = np.searchsorted(np.cumsum(counts), rank, side='right')
+        return float(values[min(idx, len(values) - 1)])
+
+class EvaluationSummary:
+    """
+    Mergeable summary of the evaluation results for a single (alg, env) pair.
+
+    Attributes
+    ----------
+    stats : RunningStats
+        Exact count, mean, and variance of the (non-NaN) results
+    sketch : QuantileSketch
+        Approximate distribution of the (non-NaN) results
+    nans : int
+        The number of NaN results, e.g. from diverged runs
+    """
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.stats = RunningStats()
+        self.sketch = QuantileSketch(relative_accuracy)
+        self.nans = 0
+
+    @property
+    def count(self) -> int:
+        return self.stats.count + self.nans
+
+    def add(self, x: float):
+        if np.isnan(x):
+            self.nans += 1
+            return
+
+        self.stats.add(x)
+        self.sketch.add(x)
+
+    def addMany(self, xs: np.ndarray):
+        xs = np.asarray(xs, dtype=np.float64).ravel()
+        nan = np.isnan(xs)
+        self.nans += int(np.sum(nan))
+
+        self.stats.addMany(xs[~nan])
+        self.sketch.addMany(xs[~nan])
+
+    def merge(self, other: 'EvaluationSummary'):
+        self.stats.merge(other.stats)
+        self.sketch.merge(other.sketch)
+        self.nans += other.nans
+
+    def cdfBounds(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # NaN results are part of the distribution, but are never less than anything
+        lo, hi = self.sketch.cdfBounds(x)
+        if self.count == 0:
+            return lo, hi
+
+        frac = self.stats.count / self.count
+        return lo * frac, hi * frac
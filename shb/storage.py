@@ -0,0 +1,75 @@
+import os
+import numpy as np
+from typing import Any, Tuple
+
+def openMemmap(path: str, shape: Tuple[int, ...], dtype: Any, fill: Any = 0, grow: bool = False) -> np.ndarray:
+    """
+    Opens a memory-mapped `.npy` file for reading and writing, creating it (filled with `fill`) if it does not exist.
+
+    Creation is atomic: the file is built under a temporary name then hard-linked into place,
+    so many processes can race to open the same store and all end up sharing a single file.
+    Writes to distinct elements from different processes do not need any locking.
+
+    If `grow` is set, an existing file with fewer rows along the first axis is extended (filled with `fill`) to `shape`.
+    Growing replaces the file, so it should not happen while other processes are writing to it.
+    """
+    dtype = np.dtype(dtype)
+
+    if not os.path.exists(path):
+        tmp = f'{path}.{os.getpid()}.tmp'
+        arr = np.lib.format.open_memmap(tmp, mode='w+', dtype=dtype, shape=shape)
+        if fill != 0:
+            arr[:] = fill
+
+        arr.flush()
+        del arr
+
+        try:
+            os.link(tmp, path)
+
+        # someone else beat us to it, use theirs instead
+        except FileExistsError:
+            pass
+
+        finally:
+            os.remove(tmp)
+
+    arr = np.lib.format.open_memmap(path, mode='r+')
+
+    if grow and arr.dtype == dtype and arr.shape[1:] == tuple(shape[1:]) and arr.shape[0] < shape[0]:
+        arr = _growMemmap(path, arr, shape, fill)
+
+    if arr.shape != tuple(shape) or arr.dtype != dtype:
+        raise ValueError(f'Existing store at {path} has shape {arr.shape} and dtype {arr.dtype}, expected {tuple(shape)} and {dtype}')
+
+    return arr
+
+def _growMemmap(path: str, arr: np.ndarray, shape: Tuple[int, ...], fill: Any) -> np.ndarray:
+    # rows are the outermost axis, so the old file is a prefix of the new one.
+    # still build the new file on the side and swap it in, so a crash never leaves a half-grown store
+    tmp = f'{path}.{os.getpid()}.tmp'
+    out = np.lib.format.open_memmap(tmp, mode='w+', dtype=arr.dtype, shape=shape)
+
+    n = arr.shape[0]
+    out[:n] = arr
+    out[n:] = fill
+    out.flush()
+    del out, arr
+
+    os.replace(tmp, path)
+    return np.lib.format.open_memmap(path, mode='r+')
+
+def dataPath(path: str, alg: str):
+    return os.path.join(path, f'{alg}.npy')
+
+def completedPath(path: str, alg: str):
+    return os.path.join(path, f'{alg}.completed.npy')
+
+def settingsPath(path: str, alg: str):
+    return os.path.join(path, f'{alg}.settings.npy')
+
+def curvesPath(path: str, alg: str):
+    return os.path.join(path, f'{alg}.curves.npy')
+
+def envsPath(path: str):
+    return os.path.join(path, 'envs.json')
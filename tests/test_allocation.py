@@ -0,0 +1,91 @@
+import unittest
+import numpy as np
+from shb.shb import SHB
+from shb.allocation import neymanAllocation
+
+def buildFakeSHBTrial(selection_runs=30):
+    algs = [
+        ('DQN', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001] },
+        }, {}),
+    ]
+
+    shb = SHB(
+        selection_runs=selection_runs,
+        eval_runs=250,
+        repeated_measures=False,
+        algs=algs,
+        envs=['Acrobot', 'CliffWorld', 'LunarLander'],
+    )
+
+    return shb
+
+def fakeResult(job, seed=0):
+    # Acrobot and CliffWorld cleanly separate the settings, but in opposite orders.
+    # so the pick comes down to LunarLander, which is noisy and where stepsize 0.01 is slightly better
+    rng = np.random.default_rng((seed, job.seed, job.idx))
+    k = job.idx
+    if job.env == 'Acrobot':
+        return k + rng.normal(0, 0.01)
+
+    if job.env == 'CliffWorld':
+        return -k + rng.normal(0, 0.01)
+
+    return 0.3 * (k == 1) + rng.normal(0, 1)
+
+class TestAllocation(unittest.TestCase):
+    def test_neymanAllocation(self):
+        std = np.array([[1., 2.], [0., 7.]])
+        counts = neymanAllocation(std, 20, 2, 10)
+        self.assertEqual(counts.sum(), 20)
+        self.assertEqual(counts[1, 0], 2)
+        self.assertEqual(counts[1, 1], 10)
+        self.assertTrue(counts[0, 1] > counts[0, 0])
+
+        self.assertTrue(np.all(neymanAllocation(np.zeros(4), 12, 2, 10) == 3))
+
+        with self.assertRaises(ValueError):
+            neymanAllocation(std, 50, 2, 10)
+
+    def test_allocateRuns(self):
+        shb = buildFakeSHBTrial()
+        allocation = shb.allocateRuns(budget=90, pilot_runs=3)
+
+        rounds = allocation.iterateRounds()
+        pilot = next(rounds)
+        self.assertEqual(len(pilot), 3 * 3 * 3)
+        for job in pilot:
+            job.record(fakeResult(job))
+
+        rest = next(rounds)
+        self.assertEqual(len(pilot) + len(rest), 90)
+
+        # the env where settings overlap gets the runs
+        counts = allocation.allocation['DQN']
+        self.assertGreater(counts[2].sum(), counts[0].sum())
+        self.assertGreater(counts[2].sum(), counts[1].sum())
+        self.assertTrue(np.all(counts >= 3))
+
+        for job in rest:
+            job.record(fakeResult(job))
+
+        assert shb.completed is not None
+        self.assertTrue(np.array_equal(shb.completed['DQN'].sum(axis=2), counts))
+
+    def test_reliability(self):
+        # with the same number of runs, spending them on the noisy env picks the best setting more often
+        hits = { 'uniform': 0, 'allocated': 0 }
+        for seed in range(60):
+            uniform = buildFakeSHBTrial(selection_runs=10)
+            for job in uniform.iterateModelSelectionJobs():
+                job.record(fakeResult(job, seed))
+
+            hits['uniform'] += uniform.pickParameters()['DQN']['optimizer']['stepsize'] == 0.01
+
+            allocated = buildFakeSHBTrial(selection_runs=30)
+            for job in allocated.iterateAllocatedJobs(budget=90, pilot_runs=3):
+                job.record(fakeResult(job, seed))
+
+            hits['allocated'] += allocated.pickParameters(completed_only=True)['DQN']['optimizer']['stepsize'] == 0.01
+
+        self.assertGreater(hits['allocated'], hits['uniform'])
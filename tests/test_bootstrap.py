@@ -0,0 +1,155 @@
+import unittest
+import numpy as np
+from shb.shb import SHB
+from shb.bootstrap import bootstrapScores, sampleRunIndices
+
+def buildFakeSHBTrial(repeated_measures=False, selection_runs=5):
+    algs = [
+        ('DQN', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001] },
+            'epsilon': [0.05, 0.1],
+        }, {}),
+        ('DeepQ', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001, 0.0001] },
+        }, {})
+    ]
+
+    shb = SHB(
+        selection_runs=selection_runs,
+        eval_runs=250,
+        algs=algs,
+        envs=['MountainCar', 'CartPole', 'Acrobot'],
+    )
+
+    # bypass the warning about repeated measures and small runs :)
+    shb.repeated_measures = repeated_measures
+
+    return shb
+
+class TestBootstrap(unittest.TestCase):
+    def test_bootstrapScores(self):
+        rng = np.random.default_rng(0)
+        shb = buildFakeSHBTrial()
+        shb._setUpDataStorage()
+
+        assert shb.data is not None
+        for alg in shb.data:
+            # lots of ties to make sure strict inequality is respected
+            shb.data[alg][:] = rng.integers(0, 6, size=shb.data[alg].shape)
+
+        run_idx = sampleRunIndices(rng, 10, 3, 5)
+        scores = bootstrapScores(shb.data, run_idx)
+
+        # compare against actually resampling the data and scoring it
+        for b in range(10):
+            resampled = buildFakeSHBTrial()
+            resampled._setUpDataStorage()
+
+            assert resampled.data is not None
+            for alg in shb.data:
+                for e in range(3):
+                    resampled.data[alg][e] = shb.data[alg][e][:, run_idx[b, e]]
+
+            expected = resampled.scoreParameters()
+            for alg in shb.data:
+                self.assertTrue(np.allclose(scores[alg][b], expected[alg]))
+
+    def test_pickParametersBootstrap(self):
+        rng = np.random.default_rng(0)
+        shb = buildFakeSHBTrial(repeated_measures=True)
+
+        dqn = rng.normal(0, 1, size=(3, 6, 5))
+        dqn[:, 4] += 3
+        shb.loadResults('DQN', dqn)
+        shb.loadResults('DeepQ', rng.normal(0, 1, size=(3, 4, 5)))
+
+        summary = shb.pickParametersBootstrap(n_boot=200, seed=0)
+
+        self.assertAlmostEqual(np.sum(summary['DQN'].frequency), 1)
+        self.assertEqual(np.argmax(summary['DQN'].frequency), 4)
+        self.assertGreater(summary['DQN'].frequency[4], 0.95)
+        self.assertEqual(summary['DeepQ'].picks.shape, (200,))
+
+        self.assertTrue(np.all(summary['DQN'].lower <= summary['DQN'].score))
+        self.assertTrue(np.all(summary['DQN'].score <= summary['DQN'].upper))
+
+        # same seed, same answer
+        again = shb.pickParametersBootstrap(n_boot=200, seed=0)
+        self.assertTrue(np.all(again['DeepQ'].picks == summary['DeepQ'].picks))
+
+    def test_bootstrapNeedsDenseData(self):
+        shb = buildFakeSHBTrial()
+        shb.loadResults('DQN', -np.ones((3, 6, 5)))
+        shb.loadResults('DeepQ', np.ones((3, 4, 5)))
+
+        # a cell which was never run must not be scored as a 0
+        assert shb.completed is not None
+        shb.completed['DQN'][:, 0] = False
+
+        with self.assertRaises(Exception):
+            shb.pickParametersBootstrap(n_boot=10)
+
+    def test_repeatedMeasuresIndices(self):
+        rng = np.random.default_rng(0)
+        idx = sampleRunIndices(rng, 4, 3, 5, repeated_measures=True)
+
+        self.assertEqual(idx.shape, (4, 3, 5))
+        self.assertTrue(np.all(idx[:, 0] == idx[:, 2]))
+
+    def test_bootstrapScoresFewerRuns(self):
+        rng = np.random.default_rng(0)
+        shb = buildFakeSHBTrial()
+        shb._setUpDataStorage()
+
+        assert shb.data is not None
+        for alg in shb.data:
+            shb.data[alg][:] = rng.integers(0, 6, size=shb.data[alg].shape)
+
+        run_idx = sampleRunIndices(rng, 10, 3, 5, draws=2)
+        self.assertEqual(run_idx.shape, (10, 3, 2))
+        scores = bootstrapScores(shb.data, run_idx)
+
+        # the same as if only 2 runs had been done
+        for b in range(10):
+            resampled = buildFakeSHBTrial(selection_runs=2)
+            resampled._setUpDataStorage()
+
+            assert resampled.data is not None
+            for alg in shb.data:
+                for e in range(3):
+                    resampled.data[alg][e] = shb.data[alg][e][:, run_idx[b, e]]
+
+            expected = resampled.scoreParameters()
+            for alg in shb.data:
+                self.assertTrue(np.allclose(scores[alg][b], expected[alg]))
+
+    def test_selectionReliability(self):
+        rng = np.random.default_rng(0)
+        shb = buildFakeSHBTrial(selection_runs=20)
+
+        # one setting is a little better than the rest, so more runs are needed to find it reliably
+        for job in shb.iterateModelSelectionJobs():
+            job.record(rng.normal(0, 1) + (0.5 if job.alg == 'DQN' and job.idx == 4 else 0))
+
+        out = shb.selectionReliability([1, 5, 20], n_boot=200, seed=0)
+
+        self.assertEqual(out['DQN'].best, 4)
+        self.assertEqual(out['DQN'].picks.shape, (3, 200))
+        self.assertTrue(np.all(np.diff(out['DQN'].agreement) > 0))
+        self.assertTrue(np.all(out['DQN'].regret >= 0))
+        self.assertTrue(np.all(np.diff(out['DQN'].regret) < 0))
+
+        # agreement and regret are two views of the same picks
+        scores = shb.scoreParameters()['DQN']
+        self.assertAlmostEqual(out['DQN'].regret[0], np.mean(scores[4] - scores[out['DQN'].picks[0]]))
+        self.assertAlmostEqual(out['DQN'].agreement[0], np.mean(out['DQN'].picks[0] == 4))
+
+        with self.assertRaises(ValueError):
+            shb.selectionReliability([21])
+
+    def test_selectionReliabilityNeedsDenseData(self):
+        shb = buildFakeSHBTrial()
+        shb.record('DQN', 'Acrobot', 0, 0, 1.)
+
+        with self.assertRaises(Exception):
+            shb.selectionReliability()
@@ -0,0 +1,85 @@
+import tempfile
+import unittest
+import numpy as np
+from shb.shb import SHB
+from shb.cache import ResultCache, jobKey
+
+def buildFakeSHBTrial(stepsizes):
+    algs = [
+        ('DQN', {
+            'optimizer': { 'stepsize': stepsizes },
+            'epsilon': [0.05, 0.1],
+        }, {}),
+        ('DeepQ', {
+            'optimizer': { 'stepsize': [0.1, 0.01] },
+        }, { 'CartPole': { 'units': 64 } })
+    ]
+
+    shb = SHB(
+        selection_runs=3,
+        eval_runs=5,
+        repeated_measures=False,
+        algs=algs,
+        envs=['MountainCar', 'CartPole'],
+    )
+
+    return shb
+
+def fakeExperiment(job):
+    return job.params['optimizer']['stepsize'] * 100 + job.seed
+
+class TestCache(unittest.TestCase):
+    def test_jobKey(self):
+        a = jobKey('DQN', 'CartPole', { 'a': 1, 'b': { 'c': 0.1 } }, 1, 1, 0)
+        b = jobKey('DQN', 'CartPole', { 'b': { 'c': 0.1 }, 'a': np.int64(1) }, 1, 1, 0)
+        self.assertEqual(a, b)
+
+        self.assertNotEqual(a, jobKey('DQN', 'CartPole', { 'a': 1, 'b': { 'c': 0.1 } }, 1, 1, 1))
+        self.assertNotEqual(a, jobKey('DQN', 'MountainCar', { 'a': 1, 'b': { 'c': 0.1 } }, 1, 1, 0))
+
+    def test_growingSweep(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            first = buildFakeSHBTrial([0.1, 0.001])
+            first.useResultCache(tmp)
+            for job in first.iterateModelSelectionJobs():
+                job.record(fakeExperiment(job))
+
+            # a later campaign adds a stepsize to the middle of the sweep, shifting every `idx`
+            second = buildFakeSHBTrial([0.1, 0.01, 0.001])
+            second.useResultCache(tmp)
+
+            jobs = list(second.iterateModelSelectionJobs())
+            self.assertEqual(len(jobs), 2 * 2 * 3)
+            self.assertTrue(all(job.alg == 'DQN' and job.params['optimizer']['stepsize'] == 0.01 for job in jobs))
+
+            for job in jobs:
+                job.record(fakeExperiment(job))
+
+            expected = buildFakeSHBTrial([0.1, 0.01, 0.001])
+            for job in expected.iterateModelSelectionJobs():
+                job.record(fakeExperiment(job))
+
+            assert second.data is not None and expected.data is not None and second.completed is not None
+            for alg in ['DQN', 'DeepQ']:
+                self.assertTrue(np.allclose(second.data[alg], expected.data[alg]))
+                self.assertTrue(np.all(second.completed[alg]))
+
+            # batches only hold misses too
+            third = buildFakeSHBTrial([0.1, 0.01, 0.001, 0.0001])
+            third.useResultCache(ResultCache(tmp))
+            batches = list(third.iterateJobBatches())
+            self.assertEqual(len(batches), 2 * 2)
+            self.assertTrue(all(len(b) == 3 and b.params['optimizer']['stepsize'] == 0.0001 for b in batches))
+
+    def test_nanResults(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResultCache(tmp)
+            cache.put('a', np.nan)
+            cache.put('a', np.nan)
+            cache.put('b', 0.1)
+
+            other = ResultCache(tmp)
+            self.assertEqual(len(other), 2)
+            self.assertTrue(np.isnan(other.get('a')))  # type: ignore
+            self.assertEqual(other.get('b'), 0.1)
+            self.assertIsNone(other.get('c'))
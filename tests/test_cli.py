@@ -0,0 +1,69 @@
+import io
+import os
+import json
+import tempfile
+import unittest
+import numpy as np
+from contextlib import redirect_stdout
+from shb.cli import main
+from shb.shb import SHB
+
+registration = {
+    'selection_runs': 3,
+    'eval_runs': 5,
+    'envs': ['MountainCar', 'CartPole'],
+    'algs': [
+        { 'name': 'DQN', 'params': { 'optimizer': { 'stepsize': [0.1, 0.01, 0.001] } } },
+        { 'name': 'DeepQ', 'params': { 'optimizer': { 'stepsize': [0.1, 0.01, 0.001] } }, 'per_env_params': { 'CartPole': { 'units': 64 } } },
+    ],
+}
+
+def run(*argv: str):
+    out = io.StringIO()
+    with redirect_stdout(out):
+        main(list(argv))
+
+    return out.getvalue()
+
+class TestCli(unittest.TestCase):
+    def test_pipeline(self):
+        expected = SHB.fromRegistration(registration)
+        jobs = list(expected.iterateModelSelectionJobs())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            reg = os.path.join(tmp, 'registration.json')
+            campaign = os.path.join(tmp, 'campaign')
+            results = os.path.join(tmp, 'results')
+            os.makedirs(results)
+
+            with open(reg, 'w') as f:
+                json.dump(registration, f)
+
+            self.assertEqual(run('plan', reg, campaign).strip(), '36')
+
+            desc = json.loads(run('job', campaign, '30'))
+            self.assertEqual((desc['alg'], desc['env'], desc['idx'], desc['run']), (jobs[30].alg, jobs[30].env, jobs[30].idx, jobs[30].run))
+            self.assertEqual(desc['seed'], jobs[30].seed)
+            self.assertDictEqual(desc['params'], jobs[30].params)
+
+            # one alg written by array tasks one result at a time, the other in bulk
+            for i, j in enumerate(jobs):
+                if j.alg == 'DQN':
+                    with open(os.path.join(results, f'{i}.txt'), 'w') as f:
+                        f.write(str(j.idx + j.run))
+
+                expected.record(j.alg, j.env, j.idx, j.run, j.idx + j.run if j.alg == 'DQN' else -j.idx)
+
+            assert expected.data is not None
+            np.save(os.path.join(results, 'DeepQ.npy'), expected.data['DeepQ'])
+
+            self.assertEqual(run('ingest', campaign, results).strip(), '19')
+
+            picked = json.loads(run('pick', campaign))
+            self.assertDictEqual(picked, expected.pickParameters())
+
+            self.assertEqual(run('plan-eval', campaign).strip(), '20')
+            desc = json.loads(run('job', campaign, '7', '--eval'))
+            job = expected.getEvaluationJob(7, picked)
+            self.assertEqual((desc['alg'], desc['env'], desc['run'], desc['seed']), (job.alg, job.env, job.run, job.seed))
+            self.assertDictEqual(desc['params'], job.params)
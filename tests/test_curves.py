@@ -0,0 +1,114 @@
+import tempfile
+import unittest
+import numpy as np
+from shb.shb import SHB
+
+def buildFakeSHBTrial(path=None):
+    algs = [
+        ('DQN', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001] },
+        }, {}),
+        ('DeepQ', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001] },
+        }, {})
+    ]
+
+    shb = SHB(
+        selection_runs=3,
+        eval_runs=250,
+        repeated_measures=False,
+        algs=algs,
+        envs=['MountainCar', 'CartPole'],
+        storage_path=path,
+    )
+
+    return shb
+
+def fakeCurve(job):
+    # stepsize 0.01 has the best area under the curve,
+    # stepsize 0.001 learns slowly but ends best
+    steps = np.arange(100)
+    rate = job.params['optimizer']['stepsize']
+    final = 1 - 2 * rate
+    return final * (1 - np.exp(-rate * steps * 100)) + 0.001 * job.run
+
+class TestCurves(unittest.TestCase):
+    def test_reducers(self):
+        shb = buildFakeSHBTrial()
+        curves = {}
+        for job in shb.iterateModelSelectionJobs():
+            curve = fakeCurve(job)
+            curves[(job.alg, job.env, job.idx, job.run)] = curve
+            job.recordCurve(curve)
+
+        assert shb.data is not None
+        self.assertEqual(shb.curve_length, 100)
+        self.assertAlmostEqual(shb.data['DQN'][0, 1, 2], np.mean(curves[('DQN', 'CartPole', 1, 2)]))
+
+        auc = shb.pickParameters()
+        self.assertDictEqual(auc['DQN'], { 'optimizer': { 'stepsize': 0.01 } })
+
+        end = shb.pickParameters(reducer='end')
+        self.assertDictEqual(end['DQN'], { 'optimizer': { 'stepsize': 0.001 } })
+
+        # picking with another reducer leaves the recorded results alone
+        self.assertAlmostEqual(shb.data['DQN'][0, 1, 2], np.mean(curves[('DQN', 'CartPole', 1, 2)]))
+        self.assertDictEqual(shb.pickParameters(), auc)
+
+        # only named reductions are cached
+        last = shb.pickParameters(reducer=lambda c: c[..., -1])
+        self.assertDictEqual(last['DQN'], { 'optimizer': { 'stepsize': 0.001 } })
+        self.assertEqual(sorted(shb._reduced.keys()), ['end'])
+
+        with self.assertRaises(ValueError):
+            shb.reduceCurves('median')
+
+        # switching the recorded results is explicit
+        shb.useCurveReducer('end')
+        self.assertAlmostEqual(shb.data['DQN'][0, 1, 2], np.mean(curves[('DQN', 'CartPole', 1, 2)][75:]))
+        shb.useCurveReducer('auc')
+
+        # cached reductions are kept up to date by new curves
+        shb.recordCurve('DQN', 'CartPole', 1, 2, np.ones(100) * 5)
+        self.assertEqual(shb.reduceCurves('auc')['DQN'][0, 1, 2], 5)
+        self.assertEqual(shb.data['DQN'][0, 1, 2], 5)
+
+    def test_curveReducerSketches(self):
+        shb = buildFakeSHBTrial()
+        shb.useApproximateCdf()
+        for job in shb.iterateModelSelectionJobs():
+            job.recordCurve(fakeCurve(job))
+
+        # the sketches follow the recorded results when they are switched
+        shb.useCurveReducer('end')
+        params, _ = shb.pickParametersApproximate()
+        self.assertDictEqual(params, shb.pickParameters())
+        self.assertDictEqual(params['DQN'], { 'optimizer': { 'stepsize': 0.001 } })
+
+        assert shb.sketches is not None and shb.data is not None
+        self.assertEqual(shb.sketches['DQN'][0].count, 9)
+        self.assertAlmostEqual(shb.sketches['DQN'][0].stats.mean, np.mean(shb.data['DQN'][0]))
+
+    def test_raggedCurves(self):
+        shb = buildFakeSHBTrial()
+        shb.curve_length = 10
+
+        shb.recordCurve('DQN', 'CartPole', 0, 0, np.arange(5))
+        assert shb.curves is not None
+        self.assertTrue(np.all(np.isnan(shb.curves['DQN'][0, 0, 0, 5:])))
+        self.assertEqual(shb.reduceCurves('auc')['DQN'][0, 0, 0], 2)
+
+        with self.assertRaises(ValueError):
+            shb.recordCurve('DQN', 'CartPole', 0, 1, np.arange(11))
+
+    def test_curvesOnDisk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = buildFakeSHBTrial(tmp)
+            for job in writer.iterateModelSelectionJobs():
+                job.recordCurve(fakeCurve(job))
+
+            writer.flush()
+
+            # a fresh process can switch metrics without re-ingesting anything
+            reader = buildFakeSHBTrial(tmp)
+            self.assertDictEqual(reader.pickParameters(reducer='end'), writer.pickParameters(reducer='end'))
@@ -0,0 +1,161 @@
+import os
+import io
+import json
+import tempfile
+import unittest
+import numpy as np
+from contextlib import redirect_stdout
+from shb.shb import SHB, SC_CHS
+from shb.cli import main
+
+def buildFakeSHBTrial(envs, path=None):
+    algs = [
+        ('DQN', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001] },
+        }, {}),
+        ('DeepQ', {
+            'optimizer': { 'stepsize': [0.1, 0.01] },
+        }, {})
+    ]
+
+    shb = SHB(
+        selection_runs=3,
+        eval_runs=5,
+        repeated_measures=False,
+        algs=algs,
+        envs=envs,
+        storage_path=path,
+    )
+
+    return shb
+
+def fakeExperiment(job):
+    return job.params['optimizer']['stepsize'] * 100 + job.seed
+
+class TestGrowth(unittest.TestCase):
+    def test_growInMemory(self):
+        shb = buildFakeSHBTrial(['MountainCar', 'CartPole'])
+        shb.useApproximateCdf()
+        before = { (j.alg, j.env, j.idx, j.run): j.seed for j in shb.iterateModelSelectionJobs() }
+        for job in shb.iterateModelSelectionJobs():
+            job.record(fakeExperiment(job))
+
+        old_scaled = shb.cdfScaleBatch('MountainCar', np.arange(10.))
+
+        # Acrobot would sort first, but existing envs keep their slots and seeds
+        shb.registerEnvPool(['Acrobot'])
+        assert shb.data is not None and shb.completed is not None and shb.sketches is not None
+        self.assertEqual(shb.data['DQN'].shape, (3, 3, 3))
+        self.assertEqual(shb._sketch('DQN', 2).count, 0)
+        self.assertTrue(np.allclose(shb.cdfScaleBatch('MountainCar', np.arange(10.)), old_scaled))
+
+        jobs = list(shb.iterateModelSelectionJobs(skip_completed=True))
+        self.assertEqual(len(jobs), 3 * 3 + 2 * 3)
+        self.assertTrue(all(job.env == 'Acrobot' for job in jobs))
+
+        for job in shb.iterateModelSelectionJobs():
+            if (job.alg, job.env, job.idx, job.run) in before:
+                self.assertEqual(job.seed, before[(job.alg, job.env, job.idx, job.run)])
+
+        # new envs get a fresh block of seeds
+        seeds = [job.seed for job in jobs]
+        self.assertEqual(sorted(set(seeds)), [6, 7, 8])
+
+        for job in jobs:
+            job.record(fakeExperiment(job))
+
+        self.assertTrue(np.all(shb.completed['DQN']))
+        self.assertEqual(shb.pickParameters()['DQN'], { 'optimizer': { 'stepsize': 0.1 } })
+        self.assertEqual(shb.sketches['DQN'][2].count, 9)
+
+    def test_growOnlineScores(self):
+        shb = buildFakeSHBTrial(['MountainCar', 'CartPole'])
+        for job in shb.iterateModelSelectionJobs():
+            job.record(fakeExperiment(job))
+
+        shb.currentBest()
+        shb.registerEnvPool(['Acrobot'])
+        for job in shb.iterateModelSelectionJobs(skip_completed=True):
+            job.record(fakeExperiment(job))
+
+        online = shb.onlineScorer().scores()
+        expected = shb.scoreParameters(completed_only=True)
+        for alg in ['DQN', 'DeepQ']:
+            self.assertTrue(np.allclose(online[alg], expected[alg]))
+
+    def test_growOnDisk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            shb = buildFakeSHBTrial(['MountainCar', 'CartPole'], tmp)
+            for job in shb.iterateModelSelectionJobs():
+                job.record(fakeExperiment(job))
+
+            shb.flush()
+            assert shb.data is not None
+            old = np.array(shb.data['DQN'])
+
+            # simply opening the store with a larger pool is an error, growing it must be asked for
+            with self.assertRaises(ValueError):
+                buildFakeSHBTrial(['Acrobot', 'MountainCar', 'CartPole'], tmp).pickParameters()
+
+            with open(os.path.join(tmp, 'envs.json'), 'r') as f:
+                self.assertEqual(json.load(f), ['CartPole', 'MountainCar'])
+
+            # a later process registers a larger pool against the same store
+            grown = buildFakeSHBTrial(['MountainCar', 'CartPole'], tmp)
+            grown.registerEnvPool(['Acrobot'])
+            jobs = list(grown.iterateModelSelectionJobs(skip_completed=True))
+            self.assertEqual(len(jobs), 15)
+            self.assertTrue(all(job.env == 'Acrobot' for job in jobs))
+
+            assert grown.data is not None
+            self.assertEqual(grown.data['DQN'].shape, (3, 3, 3))
+            self.assertTrue(np.allclose(grown.data['DQN'][:2], old))
+
+            with open(os.path.join(tmp, 'envs.json'), 'r') as f:
+                self.assertEqual(json.load(f), ['CartPole', 'MountainCar', 'Acrobot'])
+
+            # stored envs can't be dropped from the pool
+            with self.assertRaises(Exception):
+                buildFakeSHBTrial(['CartPole'], tmp).iterateModelSelectionJobs(skip_completed=True).__next__()
+
+    def test_growCampaign(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            reg = {
+                'selection_runs': 2,
+                'envs': ['MountainCar', 'CartPole'],
+                'algs': [{ 'name': 'DQN', 'params': { 'optimizer': { 'stepsize': [0.1, 0.01] } } }],
+            }
+
+            path = os.path.join(tmp, 'reg.json')
+            campaign = os.path.join(tmp, 'campaign')
+            with open(path, 'w') as f:
+                json.dump(reg, f)
+
+            out = io.StringIO()
+            with redirect_stdout(out):
+                main(['plan', path, campaign])
+
+            shb = SHB.fromRegistration(reg, storage_path=os.path.join(campaign, 'data'))
+            for job in shb.iterateModelSelectionJobs():
+                job.record(1.0)
+
+            shb.flush()
+
+            reg['envs'] = ['Acrobot', 'MountainCar', 'CartPole']
+            with open(path, 'w') as f:
+                json.dump(reg, f)
+
+            out = io.StringIO()
+            with redirect_stdout(out):
+                main(['plan', path, campaign, '--skip-completed'])
+                main(['job', campaign, '0'])
+
+            lines = out.getvalue().strip().split('\n')
+            self.assertEqual(lines[0], '4')
+            self.assertEqual(json.loads(lines[1])['env'], 'Acrobot')
+            self.assertEqual(json.loads(lines[1])['seed'], 4)
+
+    def test_namedInstance(self):
+        shb = SC_CHS()
+        self.assertEqual(len(shb._envs), 6)
+        self.assertIsNot(shb._envs, SC_CHS._envs)
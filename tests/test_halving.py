@@ -0,0 +1,61 @@
+import unittest
+import numpy as np
+from shb.shb import SHB
+
+def buildFakeSHBTrial():
+    algs = [
+        ('DQN', {
+            'optimizer': { 'stepsize': [1.0, 0.1, 0.01, 0.001, 0.0001] },
+            'epsilon': [0.05, 0.1],
+        }, {}),
+    ]
+
+    shb = SHB(
+        selection_runs=3,
+        eval_runs=250,
+        repeated_measures=False,
+        algs=algs,
+        envs=['MountainCar', 'CartPole', 'Acrobot'],
+    )
+
+    return shb
+
+def fakeResult(job, steps):
+    # learning curves that improve with more steps
+    # with the best stepsize being 0.01
+    quality = -abs(np.log10(job.params['optimizer']['stepsize']) + 2) - job.params['epsilon']
+    rng = np.random.default_rng(job.seed * 1000 + job.idx)
+    return quality * np.sqrt(steps) + rng.normal(0, 0.1)
+
+class TestHalving(unittest.TestCase):
+    def test_successiveHalving(self):
+        full = buildFakeSHBTrial()
+        for job in full.iterateModelSelectionJobs():
+            job.record(fakeResult(job, 900))
+
+        shb = buildFakeSHBTrial()
+        sh = shb.successiveHalving(max_steps=900, eta=3, rungs=3)
+        self.assertEqual(sh.budgets, [100, 300, 900])
+
+        rounds = []
+        for jobs in sh.iterateRounds():
+            rounds.append(len(jobs))
+            for job in jobs:
+                job.record(fakeResult(job, job.steps))
+
+        # 10 settings -> 4 -> 2, each with 3 envs * 3 runs
+        self.assertEqual(rounds, [90, 36, 18])
+        self.assertEqual(np.sum(sh.survivors['DQN']), 2)
+
+        # only full budget results are stored in the shb
+        assert shb.completed is not None
+        self.assertEqual(np.sum(shb.completed['DQN']), 18)
+        self.assertDictEqual(shb.pickParameters(completed_only=True), full.pickParameters())
+
+    def test_jobSteps(self):
+        shb = buildFakeSHBTrial()
+        job = next(shb.iterateHalvingJobs(max_steps=1000, eta=2, rungs=4))
+        self.assertEqual(job.steps, 125)
+
+        # regular selection jobs use the full budget
+        self.assertIsNone(shb.getSelectionJob(0).steps)
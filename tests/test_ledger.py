@@ -0,0 +1,153 @@
+import io
+import os
+import json
+import time
+import tempfile
+import unittest
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from shb.cli import main
+from shb.ledger import JobLedger
+from shb.shb import SHB
+
+registration = {
+    'selection_runs': 3,
+    'eval_runs': 5,
+    'envs': ['MountainCar', 'CartPole'],
+    'algs': [
+        { 'name': 'DQN', 'params': { 'optimizer': { 'stepsize': [0.1, 0.01, 0.001] } } },
+        { 'name': 'DeepQ', 'params': { 'optimizer': { 'stepsize': [0.1, 0.01] } } },
+    ],
+}
+
+def fakeResult(job):
+    return job.idx + 0.1 * job.run
+
+def work(path: str, worker: str):
+    # a worker process claiming and completing jobs until the queue is empty
+    shb = SHB.fromRegistration(registration)
+    ledger = JobLedger(path)
+
+    done = []
+    for job in shb.iterateLedgerJobs(ledger, batch_size=3, worker=worker):
+        job.record(fakeResult(job))
+        done.append((job.alg, job.env, job.idx, job.run))
+
+    ledger.close()
+    return done
+
+def run(*argv: str):
+    out = io.StringIO()
+    with redirect_stdout(out):
+        main(list(argv))
+
+    return out.getvalue()
+
+class TestLedger(unittest.TestCase):
+    def test_claimAndComplete(self):
+        shb = SHB.fromRegistration(registration)
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = JobLedger(os.path.join(tmp, 'ledger.sqlite'))
+            self.assertEqual(shb.planLedger(ledger), 30)
+
+            # planning again doesn't duplicate jobs
+            self.assertEqual(shb.planLedger(ledger), 0)
+
+            rows = ledger.claim(4, worker='a')
+            self.assertEqual(len(rows), 4)
+            self.assertDictEqual(ledger.progress(), { 'pending': 26, 'claimed': 4, 'done': 0 })
+
+            # rows are the same as those of the manifest
+            manifest = shb.selectionManifest()
+            for row in rows:
+                expected = manifest[int(row['job_id']) - 1]
+                for name in manifest.dtype.names:
+                    self.assertEqual(row[name], expected[name])
+
+            # another worker gets different jobs
+            other = ledger.claim(4, worker='b')
+            self.assertEqual(len(np.intersect1d(rows['job_id'], other['job_id'])), 0)
+
+            ledger.complete(rows['job_id'], [1., 2., 3., 4.])
+            self.assertDictEqual(ledger.progress(), { 'pending': 22, 'claimed': 4, 'done': 4 })
+            self.assertTrue(np.allclose(ledger.results()['result'], [1., 2., 3., 4.]))
+
+            ledger.close()
+
+    def test_leaseExpires(self):
+        shb = SHB.fromRegistration(registration)
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = JobLedger(os.path.join(tmp, 'ledger.sqlite'), lease=0.2)
+            shb.planLedger(ledger)
+
+            # a worker claims everything, then dies
+            dead = ledger.claim(30, worker='dead')
+            self.assertEqual(len(ledger.claim(1, worker='alive')), 0)
+
+            time.sleep(0.3)
+            self.assertEqual(ledger.progress()['pending'], 30)
+
+            # every job is handed out again
+            alive = ledger.claim(30, worker='alive')
+            self.assertTrue(np.all(alive['job_id'] == dead['job_id']))
+
+            # a late result from the dead worker is still kept
+            ledger.complete(dead['job_id'][0], 5.)
+            self.assertEqual(ledger.progress()['done'], 1)
+
+            ledger.close()
+
+    def test_workersShareQueue(self):
+        shb = SHB.fromRegistration(registration)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'ledger.sqlite')
+            with JobLedger(path) as ledger:
+                shb.planLedger(ledger)
+
+            with ProcessPoolExecutor(max_workers=3) as executor:
+                futures = [executor.submit(work, path, f'w{i}') for i in range(3)]
+                done = [d for f in futures for d in f.result()]
+
+            # every job was done exactly once
+            self.assertEqual(len(done), 30)
+            self.assertEqual(len(set(done)), 30)
+
+            with JobLedger(path) as ledger:
+                self.assertEqual(shb.loadLedger(ledger), 30)
+
+                # results which are already in the store aren't loaded twice
+                self.assertEqual(shb.loadLedger(ledger), 0)
+
+            expected = SHB.fromRegistration(registration)
+            for job in expected.iterateModelSelectionJobs():
+                job.record(fakeResult(job))
+
+            assert shb.data is not None and expected.data is not None
+            for alg in expected.data:
+                self.assertTrue(np.allclose(shb.data[alg], expected.data[alg]))
+
+            self.assertDictEqual(shb.pickParameters(), expected.pickParameters())
+
+    def test_cli(self):
+        expected = SHB.fromRegistration(registration)
+        with tempfile.TemporaryDirectory() as tmp:
+            reg = os.path.join(tmp, 'registration.json')
+            campaign = os.path.join(tmp, 'campaign')
+            with open(reg, 'w') as f:
+                json.dump(registration, f)
+
+            self.assertEqual(run('plan', reg, campaign, '--ledger').strip(), '30')
+
+            while True:
+                lines = run('claim', campaign, '--n', '7').splitlines()
+                if len(lines) == 0:
+                    break
+
+                for line in lines:
+                    desc = json.loads(line)
+                    expected.record(desc['alg'], desc['env'], desc['idx'], desc['run'], desc['idx'] + 0.1 * desc['run'])
+                    run('complete', campaign, str(desc['job_id']), str(desc['idx'] + 0.1 * desc['run']))
+
+            self.assertEqual(run('ingest', campaign).strip(), '30')
+            self.assertDictEqual(json.loads(run('pick', campaign)), expected.pickParameters())
@@ -0,0 +1,57 @@
+import unittest
+import numpy as np
+from shb.shb import SHB
+
+def buildFakeSHBTrial():
+    algs = [
+        ('DQN', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001] },
+            'epsilon': [0.05, 0.1],
+        }, {}),
+        ('DeepQ', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001] },
+            'epsilon': [0.05, 0.1],
+        }, {})
+    ]
+
+    shb = SHB(
+        selection_runs=3,
+        eval_runs=250,
+        repeated_measures=False,
+        algs=algs,
+        envs=['MountainCar', 'CartPole', 'Acrobot'],
+    )
+
+    return shb
+
+class TestOnline(unittest.TestCase):
+    def test_currentBest(self):
+        rng = np.random.default_rng(0)
+        shb = buildFakeSHBTrial()
+        scorer = shb.onlineScorer()
+
+        jobs = list(shb.getSelectionJob(i) for i in rng.permutation(shb.numSelectionJobs()))
+        for i, job in enumerate(jobs):
+            job.record(rng.normal(job.idx, 2))
+
+            # check in every so often, like a dashboard would
+            if i % 17 == 0 or i == len(jobs) - 1:
+                scores = scorer.scores()
+                expected = shb.scoreParameters(completed_only=True)
+                for alg in ['DQN', 'DeepQ']:
+                    self.assertTrue(np.allclose(scores[alg], expected[alg], equal_nan=True))
+
+                best = shb.currentBest()
+                if len(best) == 2:
+                    self.assertDictEqual(best, shb.pickParameters(completed_only=True))
+
+        # once everything is in, this is the usual answer
+        self.assertDictEqual(shb.currentBest(), shb.pickParameters())
+
+    def test_partialAlgs(self):
+        shb = buildFakeSHBTrial()
+        shb.record('DQN', 'CartPole', 3, 0, 1.0)
+
+        best = shb.currentBest()
+        self.assertEqual(list(best.keys()), ['DQN'])
+        self.assertDictEqual(best['DQN'], { 'epsilon': 0.1, 'optimizer': { 'stepsize': 0.01 } })
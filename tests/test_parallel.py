@@ -0,0 +1,118 @@
+import unittest
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from shb.shb import SHB
+from shb.parallel import orderJobs
+
+def buildFakeSHBTrial():
+    algs = [
+        ('DQN', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001] },
+            'epsilon': [0.05, 0.1],
+        }, {}),
+        ('DeepQ', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001] },
+            'epsilon': [0.05, 0.1],
+        }, {})
+    ]
+
+    shb = SHB(
+        selection_runs=3,
+        eval_runs=5,
+        repeated_measures=False,
+        algs=algs,
+        envs=['MountainCar', 'CartPole'],
+    )
+
+    return shb
+
+def fakeExperiment(job):
+    return job.params['optimizer']['stepsize'] * job.params['epsilon'] + job.seed
+
+def fakeBatchExperiment(batch):
+    # a vectorized runner, all seeds of the batch at once
+    return batch.params['optimizer']['stepsize'] * batch.params['epsilon'] + batch.seeds
+
+class TestParallel(unittest.TestCase):
+    def test_runSelection(self):
+        expected = buildFakeSHBTrial()
+        for job in expected.iterateModelSelectionJobs():
+            job.record(fakeExperiment(job))
+
+        shb = buildFakeSHBTrial()
+        shb.runSelection(fakeExperiment, max_workers=2, chunksize=8)
+
+        assert shb.data is not None and expected.data is not None
+        for alg in ['DQN', 'DeepQ']:
+            self.assertTrue(np.allclose(shb.data[alg], expected.data[alg]))
+
+    def test_runEvaluation(self):
+        shb = buildFakeSHBTrial()
+        params = {
+            'DQN': { 'optimizer': { 'stepsize': 0.1 }, 'epsilon': 0.05 },
+            'DeepQ': { 'optimizer': { 'stepsize': 0.01 }, 'epsilon': 0.1 },
+        }
+
+        with ThreadPoolExecutor(2) as pool:
+            results = shb.runEvaluation(fakeExperiment, params, executor=pool)
+
+        # 3 params * 3 runs * 2 envs * 2 algs = 72 selection seeds used up
+        self.assertTrue(np.allclose(results['DeepQ']['CartPole'], 0.001 + np.arange(72, 77)))
+        self.assertTrue(np.allclose(results['DQN']['MountainCar'], 0.005 + np.arange(77, 82)))
+
+    def test_orderJobs(self):
+        shb = buildFakeSHBTrial()
+        jobs = orderJobs(shb.iterateModelSelectionJobs(), costs={ ('DQN', 'MountainCar'): 10, ('DeepQ', 'CartPole'): 5 })
+
+        self.assertEqual([(j.alg, j.env) for j in jobs[:18]], [('DQN', 'MountainCar')] * 18)
+        self.assertEqual([(j.alg, j.env) for j in jobs[18:36]], [('DeepQ', 'CartPole')] * 18)
+
+        # ties keep their usual ordering
+        self.assertEqual((jobs[18].idx, jobs[18].run), (0, 0))
+        self.assertEqual((jobs[19].idx, jobs[19].run), (1, 0))
+
+    def test_iterateJobBatches(self):
+        shb = buildFakeSHBTrial()
+        expected = { (j.alg, j.env, j.idx, j.run): j for j in shb.iterateModelSelectionJobs() }
+
+        batches = list(shb.iterateJobBatches(batch_size=2))
+        # 2 algs * 2 envs * 6 params, each with a batch of 2 runs and a batch of 1 run
+        self.assertEqual(len(batches), 48)
+        self.assertEqual([len(b) for b in batches[:2]], [2, 1])
+
+        # params are only built when asked for
+        self.assertIsNone(batches[0].jobs[0]._params)
+
+        seen = set()
+        for batch in batches:
+            for job, seed in zip(batch.jobs, batch.seeds):
+                self.assertEqual((job.alg, job.env, job.idx, job.params), (batch.alg, batch.env, batch.idx, batch.params))
+                self.assertEqual(seed, expected[(job.alg, job.env, job.idx, job.run)].seed)
+                seen.add((job.alg, job.env, job.idx, job.run))
+
+        self.assertEqual(seen, set(expected.keys()))
+
+        # shards partition the batches, and completed runs are left out
+        shards = [list(shb.iterateJobBatches(2, shard=k, num_shards=3)) for k in range(3)]
+        self.assertEqual(sum(len(s) for s in shards), 48)
+
+        batches[0].record([1., 2.])
+        remaining = list(shb.iterateJobBatches(skip_completed=True))
+        self.assertEqual(remaining[0].runs.tolist(), [2])
+        self.assertEqual(len(remaining), 24)
+
+        with self.assertRaises(ValueError):
+            batches[1].record([1., 2.])
+
+    def test_runSelectionBatches(self):
+        expected = buildFakeSHBTrial()
+        for job in expected.iterateModelSelectionJobs():
+            job.record(fakeExperiment(job))
+
+        shb = buildFakeSHBTrial()
+        with ThreadPoolExecutor(2) as pool:
+            shb.runSelectionBatches(fakeBatchExperiment, executor=pool)
+
+        assert shb.data is not None and expected.data is not None
+        for alg in ['DQN', 'DeepQ']:
+            self.assertTrue(np.allclose(shb.data[alg], expected.data[alg]))
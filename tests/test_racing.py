@@ -0,0 +1,65 @@
+import unittest
+import numpy as np
+from shb.shb import SHB
+
+def buildFakeSHBTrial():
+    algs = [
+        ('DQN', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001, 0.0001] },
+            'epsilon': [0.05, 0.1],
+        }, {}),
+        ('DeepQ', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001, 0.0001] },
+            'epsilon': [0.05, 0.1],
+        }, {})
+    ]
+
+    shb = SHB(
+        selection_runs=10,
+        eval_runs=250,
+        repeated_measures=False,
+        algs=algs,
+        envs=['MountainCar', 'CartPole', 'Acrobot'],
+    )
+
+    return shb
+
+def fakeResult(job):
+    # one setting is clearly best, the rest are spread out
+    rng = np.random.default_rng(job.seed * 1000 + job.idx)
+    return -10 * abs(np.log10(job.params['optimizer']['stepsize']) + 2) - job.params['epsilon'] + rng.normal(0, 0.5)
+
+class TestRacing(unittest.TestCase):
+    def test_race(self):
+        full = buildFakeSHBTrial()
+        for job in full.iterateModelSelectionJobs():
+            job.record(fakeResult(job))
+
+        shb = buildFakeSHBTrial()
+        n_jobs = 0
+        for job in shb.iterateRacingJobs(initial_runs=2):
+            job.record(fakeResult(job))
+            n_jobs += 1
+
+        self.assertLess(n_jobs, full.numSelectionJobs() / 2)
+        self.assertDictEqual(shb.pickParameters(completed_only=True), full.pickParameters())
+
+        # everything that was run matches the data from the full sweep
+        assert shb.data is not None and shb.completed is not None and full.data is not None
+        for alg in ['DQN', 'DeepQ']:
+            mask = shb.completed[alg]
+            self.assertTrue(np.all(shb.data[alg][mask] == full.data[alg][mask]))
+
+            # the best setting was always run to completion
+            self.assertTrue(np.all(mask[:, 2, :]))
+
+    def test_raceRequiresRecording(self):
+        shb = buildFakeSHBTrial()
+        rounds = shb.race().iterateRounds()
+
+        jobs = next(rounds)
+        for job in jobs[:-1]:
+            job.record(fakeResult(job))
+
+        with self.assertRaises(Exception):
+            next(rounds)
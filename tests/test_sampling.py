@@ -0,0 +1,241 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from shb.shb import SHB
+from shb.grid import sweepAxes, gridPositions, gridIndex, sampleSettingIndices
+from PyExpUtils.utils.permute import getParameterPermutation, getNumberOfPermutations
+
+try:
+    import scipy  # noqa: F401
+    has_scipy = True
+except ImportError:
+    has_scipy = False
+
+sweep = {
+    'optimizer': { 'stepsize': [0.1, 0.03, 0.01, 0.003, 0.001], 'beta': [0.9, 0.99, 0.999] },
+    'epsilon': [0.05, 0.1, 0.2],
+    'gamma': 0.99,
+    'target_refresh': [1, 8, 32, 128],
+    'buffer': { 'size': [1000, 10000], 'type': 'uniform' },
+}
+
+def buildFakeSHBTrial():
+    algs = [
+        ('DQN', sweep, {}),
+        ('DeepQ', { 'optimizer': { 'stepsize': [0.1, 0.01] } }, {}),
+    ]
+
+    shb = SHB(
+        selection_runs=3,
+        eval_runs=5,
+        repeated_measures=False,
+        algs=algs,
+        envs=['MountainCar', 'CartPole'],
+    )
+
+    return shb
+
+def fakeResult(job):
+    # higher stepsize and refresh are better
+    p = job.params
+    return np.log10(p['optimizer']['stepsize']) + np.log2(p.get('target_refresh', 1)) + 0.01 * job.run
+
+class TestSampling(unittest.TestCase):
+    def test_gridOrder(self):
+        axes = sweepAxes(sweep)
+        self.assertEqual([key for key, _ in axes], ['buffer.size', 'buffer.type', 'epsilon', 'gamma', 'optimizer.beta', 'optimizer.stepsize', 'target_refresh'])
+
+        n = getNumberOfPermutations(sweep)
+        positions = gridPositions(axes, np.arange(n))
+        self.assertTrue(np.array_equal(gridIndex(axes, positions), np.arange(n)))
+
+        for idx in [0, 1, 17, 100, n - 1]:
+            params = getParameterPermutation(sweep, idx)
+            pos = positions[idx]
+            self.assertEqual(params['buffer']['size'], axes[0][1][pos[0]])
+            self.assertEqual(params['epsilon'], axes[2][1][pos[2]])
+            self.assertEqual(params['optimizer']['stepsize'], axes[5][1][pos[5]])
+            self.assertEqual(params['target_refresh'], axes[6][1][pos[6]])
+
+    def test_listOfDicts(self):
+        # each dict in a list is its own set of axes, not one axis with a value per dict
+        nested = { 'opt': [{ 'a': 1 }, { 'a': 2 }, { 'a': 3 }], 'b': [1, 2] }
+        axes = sweepAxes(nested)
+        self.assertEqual([key for key, _ in axes], ['b', 'opt.[0].a', 'opt.[1].a', 'opt.[2].a'])
+
+        idx = sampleSettingIndices(nested, 3)
+        self.assertTrue(np.array_equal(idx, np.arange(2)))
+
+        shb = SHB(selection_runs=2, algs=[('DQN', nested, {})], envs=['CartPole'])
+        shb.sampleSettings(3)
+        for job in shb.iterateModelSelectionJobs():
+            job.record(job.params['b'])
+
+        self.assertDictEqual(shb.pickParameters()['DQN'], getParameterPermutation(nested, 1))
+
+    def test_sampleSettings(self):
+        shb = buildFakeSHBTrial()
+        settings = shb.sampleSettings(20, seed=1)
+        self.assertEqual(len(settings['DQN']), 20)
+        self.assertTrue(np.array_equal(settings['DeepQ'], [0, 1]))
+
+        # reproducible
+        other = buildFakeSHBTrial()
+        self.assertTrue(np.array_equal(other.sampleSettings(20, seed=1)['DQN'], settings['DQN']))
+
+        jobs = list(shb.iterateModelSelectionJobs())
+        self.assertEqual(len(jobs), shb.numSelectionJobs())
+        self.assertEqual(len(jobs), 2 * 3 * (20 + 2))
+        self.assertEqual(set(j.idx for j in jobs if j.alg == 'DQN'), set(settings['DQN'].tolist()))
+        self.assertEqual(len(shb.selectionManifest()), len(jobs))
+        self.assertEqual(sum(len(b) for b in shb.iterateJobBatches()), len(jobs))
+
+        for job in jobs:
+            if job.alg == 'DQN':
+                self.assertDictEqual(job.params, getParameterPermutation(sweep, job.idx))
+
+            job.record(fakeResult(job))
+
+        # picks the best of the sampled settings
+        picked = shb.pickParameters()['DQN']
+
+        def score(idx):
+            p = getParameterPermutation(sweep, idx)
+            return np.log10(p['optimizer']['stepsize']) + np.log2(p['target_refresh'])
+
+        best = max(settings['DQN'], key=score)
+        self.assertDictEqual(picked, getParameterPermutation(sweep, best))
+
+        # so does the bootstrap, reporting on the full grid
+        summary = shb.pickParametersBootstrap(n_boot=20)['DQN']
+        self.assertTrue(np.all(np.isin(summary.picks, settings['DQN'])))
+        self.assertEqual(np.argmax(summary.frequency), best)
+        self.assertEqual(summary.score.shape, (getNumberOfPermutations(sweep),))
+        self.assertTrue(np.all(np.isnan(np.delete(summary.score, settings['DQN']))))
+
+        # the registration remembers the sample
+        clone = SHB.fromRegistration(shb.registration())
+        assert clone._settings is not None
+        self.assertTrue(np.array_equal(clone._settings['DQN'], settings['DQN']))
+
+        # only the sampled settings are stored
+        assert shb.data is not None
+        self.assertEqual(shb.data['DQN'].shape, (2, 20, 3))
+
+        # which can't change once results are stored
+        with self.assertRaises(Exception):
+            shb.sampleSettings(10)
+
+        with self.assertRaises(ValueError):
+            buildFakeSHBTrial().sampleSettings(10, method='halton')
+
+    def test_mergeSamples(self):
+        # two campaigns with different samples fill in the same full grid
+        full = buildFakeSHBTrial()
+        for seed in [0, 1]:
+            shb = buildFakeSHBTrial()
+            shb.sampleSettings(30, seed=seed)
+            for job in shb.iterateModelSelectionJobs():
+                job.record(fakeResult(job))
+
+            # each sample's results can be loaded into the full grid through the setting indices
+            assert shb.data is not None and shb.completed is not None
+            if full.data is None:
+                full._setUpDataStorage()
+
+            for alg in ['DQN', 'DeepQ']:
+                assert full.data is not None and full.completed is not None
+                settings = shb._settingIndices(alg)
+                full.data[alg][:, settings] = shb.data[alg]
+                full.completed[alg][:, settings] |= shb.completed[alg]
+
+        assert full.completed is not None
+        self.assertGreater(full.completed['DQN'][0, :, 0].sum(), 30)
+
+    def test_sparseStorage(self):
+        # six axes of ten values is a million settings, only the sampled ones are stored and scored
+        big = { f'p{i}': list(range(10)) for i in range(6) }
+        shb = SHB(selection_runs=3, algs=[('DQN', big, {})], envs=['MountainCar', 'CartPole'])
+        settings = shb.sampleSettings(100, seed=0)['DQN']
+
+        for job in shb.iterateModelSelectionJobs():
+            job.record(job.params['p0'] + job.params['p5'] + 0.01 * job.run)
+
+        assert shb.data is not None
+        self.assertEqual(shb.data['DQN'].shape, (2, 100, 3))
+        self.assertEqual(shb.scoreParameters()['DQN'].shape, (100,))
+
+        best = max(settings, key=lambda idx: (lambda p: p['p0'] + p['p5'])(getParameterPermutation(big, idx)))
+        self.assertDictEqual(shb.pickParameters()['DQN'], getParameterPermutation(big, best))
+
+        # settings outside of the sample can't be recorded
+        outside = int(np.setdiff1d(np.arange(1000), settings)[0])
+        with self.assertRaises(ValueError):
+            shb.record('DQN', 'CartPole', outside, 0, 1.0)
+
+    def test_loadFullGrid(self):
+        shb = buildFakeSHBTrial()
+        settings = shb.sampleSettings(20, seed=1)['DQN']
+
+        # a full grid of results keeps only the sampled settings
+        results = np.random.default_rng(0).random((2, getNumberOfPermutations(sweep), 3))
+        shb.loadResults('DQN', results)
+
+        assert shb.data is not None
+        self.assertTrue(np.array_equal(shb.data['DQN'], results[:, settings]))
+
+        with self.assertRaises(ValueError):
+            shb.loadResults('DQN', results[:, :21])
+
+    def test_sampledStoreOnDisk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            shb = SHB(selection_runs=3, algs=[('DQN', sweep, {})], envs=['CartPole'], storage_path=tmp)
+            shb.sampleSettings(20, seed=1)
+            for job in shb.iterateModelSelectionJobs():
+                job.record(fakeResult(job))
+
+            shb.flush()
+            self.assertEqual(np.load(os.path.join(tmp, 'DQN.npy'), mmap_mode='r').shape, (1, 20, 3))
+
+            reader = SHB(selection_runs=3, algs=[('DQN', sweep, {})], envs=['CartPole'], storage_path=tmp)
+            reader.sampleSettings(20, seed=1)
+            self.assertDictEqual(reader.pickParameters(), shb.pickParameters())
+
+            # the columns of the store would mean different settings with a different sample
+            other = SHB(selection_runs=3, algs=[('DQN', sweep, {})], envs=['CartPole'], storage_path=tmp)
+            other.sampleSettings(20, seed=2)
+            with self.assertRaises(ValueError):
+                other.pickParameters()
+
+    def test_allocationOnSample(self):
+        shb = SHB(selection_runs=3, algs=[('DQN', sweep, {})], envs=['MountainCar', 'CartPole'])
+        settings = shb.sampleSettings(10, seed=2)
+
+        for job in shb.iterateAllocatedJobs(budget=2 * 10 * 2 + 6, pilot_runs=2):
+            self.assertIn(job.idx, settings[job.alg])
+            job.record(fakeResult(job))
+
+        assert shb.completed is not None
+        self.assertEqual(shb.completed['DQN'].shape, (2, 10, 3))
+
+    def test_racingOnSample(self):
+        shb = buildFakeSHBTrial()
+        settings = shb.sampleSettings(10, seed=2)
+
+        for job in shb.iterateRacingJobs(initial_runs=2):
+            self.assertIn(job.idx, settings[job.alg])
+            job.record(fakeResult(job))
+
+    @unittest.skipUnless(has_scipy, 'sobol sampling requires scipy')
+    def test_sobol(self):
+        idx = sampleSettingIndices(sweep, 16, method='sobol', seed=0)
+        self.assertEqual(len(np.unique(idx)), 16)
+
+        # every value of every axis shows up in a balanced sample
+        axes = sweepAxes(sweep)
+        positions = gridPositions(axes, idx)
+        for a, (_, values) in enumerate(axes):
+            self.assertEqual(len(np.unique(positions[:, a])), len(values))
+
+        self.assertTrue(np.array_equal(idx, sampleSettingIndices(sweep, 16, method='sobol', seed=0)))
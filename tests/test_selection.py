@@ -1,6 +1,9 @@
+import os
+import tempfile
 import unittest
 import numpy as np
 from shb.shb import SHB
+from PyExpUtils.utils.permute import getParameterPermutation
 
 def buildFakeSHBTrial():
     per_env_params = {
@@ -81,3 +84,87 @@ class TestSelection(unittest.TestCase):
         }
 
         self.assertDictEqual(params, expected)
+
+    def test_pickParametersMatchesCdfScale(self):
+        np.random.seed(1)
+        shb = buildFakeSHBTrial()
+        shb._setUpDataStorage()
+
+        # lots of ties to make sure strict inequality is respected
+        shb.data['DQN'][:] = np.random.randint(0, 5, size=(2, 6, 3))
+        shb.data['DeepQ'][:] = np.random.randint(0, 5, size=(2, 6, 3))
+
+        # brute-force reference using the scalar cdfScale
+        for alg in ['DQN', 'DeepQ']:
+            vals = np.zeros((2, 6))
+            for e in range(2):
+                for p in range(6):
+                    vals[e, p] = np.mean([shb.cdfScale(e, x) for x in shb.data[alg][e, p]])
+
+                    expected = np.mean([
+                        np.sum(shb.data[a][e] < shb.data[alg][e, p, 0]) / 18 for a in ['DQN', 'DeepQ']
+                    ])
+                    self.assertAlmostEqual(shb.cdfScale(e, shb.data[alg][e, p, 0]), expected)
+
+            best = int(np.argmax(vals.mean(axis=0)))
+            expected = getParameterPermutation(shb._algs[alg][1], best)
+            self.assertDictEqual(shb.pickParameters()[alg], expected)
+
+    def test_cdfScaleBatch(self):
+        shb = buildFakeSHBTrial()
+
+        for i, job in enumerate(shb.iterateModelSelectionJobs()):
+            job.record(i)
+
+        values = np.array([[10, 19], [-1, 1000]])
+        batch = shb.cdfScaleBatch('MountainCar', values)
+        self.assertEqual(batch.shape, (2, 2))
+
+        for idx in np.ndindex(values.shape):
+            self.assertAlmostEqual(batch[idx], shb.cdfScale('MountainCar', values[idx]))
+
+    def test_cdfScaleInvalidatedOnRecord(self):
+        shb = buildFakeSHBTrial()
+
+        jobs = list(shb.iterateModelSelectionJobs())
+        for i, job in enumerate(jobs):
+            job.record(i)
+
+        self.assertAlmostEqual(shb.cdfScale('CartPole', 10), 0.27777, places=4)
+
+        # move a large value from CartPole below the query point
+        # the cached index for CartPole must be rebuilt
+        jobs[17].record(-1)
+        self.assertAlmostEqual(shb.cdfScale('CartPole', 10), 11 / 36)
+
+    def test_loadResults(self):
+        expected = buildFakeSHBTrial()
+        for i, job in enumerate(expected.iterateModelSelectionJobs()):
+            job.record(i)
+
+        assert expected.data is not None
+
+        # full tensor for one alg from an array, single env slab for the other
+        shb = buildFakeSHBTrial()
+        shb.loadResults('DeepQ', expected.data['DeepQ'].copy())
+        shb.loadResults('DQN', expected.data['DQN'][0], env='CartPole')
+        shb.loadResults('DQN', expected.data['DQN'][1], env='MountainCar')
+
+        assert shb.data is not None
+        self.assertTrue(np.all(shb.data['DeepQ'] == expected.data['DeepQ']))
+        self.assertTrue(np.all(shb.data['DQN'] == expected.data['DQN']))
+        self.assertAlmostEqual(shb.cdfScale('CartPole', 10), 0.27777, places=4)
+
+        # and from a memory-mapped file on disk
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'DQN.npy')
+            np.save(path, expected.data['DQN'] + 1)
+            shb.loadResults('DQN', path, mmap=True)
+
+        self.assertTrue(np.all(shb.data['DQN'] == expected.data['DQN'] + 1))
+
+        with self.assertRaises(ValueError):
+            shb.loadResults('DQN', np.zeros((2, 6, 4)))
+
+        with self.assertRaises(ValueError):
+            shb.loadResults('DQN', np.zeros((2, 6, 3)), env='CartPole')
@@ -0,0 +1,105 @@
+import unittest
+import numpy as np
+from PyExpUtils.utils.permute import getParameterPermutation
+from shb.shb import SHB
+from shb.sensitivity import sensitivityGrid
+
+def buildFakeSHBTrial():
+    algs = [
+        ('DQN', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001], 'beta': 0.9 },
+            'epsilon': [0.05, 0.1],
+            'lambda': [0.0, 0.5, 0.9, 1.0],
+        }, {}),
+        ('DeepQ', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001, 0.0001] },
+        }, {})
+    ]
+
+    shb = SHB(
+        selection_runs=5,
+        eval_runs=250,
+        algs=algs,
+        envs=['MountainCar', 'CartPole', 'Acrobot'],
+    )
+
+    return shb
+
+class TestSensitivity(unittest.TestCase):
+    def test_gridMatchesPermutations(self):
+        shb = buildFakeSHBTrial()
+        _, sweepable, _ = shb._algs['DQN']
+
+        scores = np.random.default_rng(0).random(24)
+        out = sensitivityGrid(sweepable, scores)
+
+        self.assertEqual(out.axes, ['epsilon', 'lambda', 'optimizer.stepsize'])
+        self.assertEqual(out.grid.shape, (2, 4, 3))
+
+        for idx in range(24):
+            params = getParameterPermutation(sweepable, idx)
+            pos = (
+                out.values[0].index(params['epsilon']),
+                out.values[1].index(params['lambda']),
+                out.values[2].index(params['optimizer']['stepsize']),
+            )
+            self.assertEqual(out.grid[pos], scores[idx])
+
+        best = int(np.argmax(scores))
+        params = getParameterPermutation(sweepable, best)
+        self.assertEqual(out.values[0][out.best[0]], params['epsilon'])
+        self.assertEqual(out.values[1][out.best[1]], params['lambda'])
+        self.assertEqual(out.values[2][out.best[2]], params['optimizer']['stepsize'])
+
+        self.assertTrue(np.allclose(out.marginal['lambda'], out.grid.mean(axis=(0, 2))))
+        self.assertTrue(np.allclose(out.conditional['lambda'], out.grid[out.best[0], :, out.best[2]]))
+        self.assertEqual(out.conditional['lambda'][out.best[1]], scores.max())
+
+    def test_nestedSweep(self):
+        # each dict in a list is swept separately, and labelled by its position in the list
+        sweepable = { 'layers': [{ 'units': [16, 32] }, { 'units': [8] }], 'alpha': [0.1, 0.2, 0.3] }
+        scores = np.arange(6, dtype=np.float64)
+        out = sensitivityGrid(sweepable, scores)
+
+        self.assertEqual(out.axes, ['alpha', 'layers.[0].units'])
+        self.assertEqual(out.values, [[0.1, 0.2, 0.3], [16, 32]])
+
+        for idx in range(6):
+            params = getParameterPermutation(sweepable, idx)
+            pos = (out.values[0].index(params['alpha']), out.values[1].index(params['layers'][0]['units']))
+            self.assertEqual(out.grid[pos], scores[idx])
+
+    def test_missingSettings(self):
+        shb = buildFakeSHBTrial()
+        _, sweepable, _ = shb._algs['DeepQ']
+
+        out = sensitivityGrid(sweepable, np.array([0.2, np.nan, 0.7, 0.1]))
+        self.assertEqual(out.axes, ['optimizer.stepsize'])
+        self.assertEqual(out.best, (2,))
+        self.assertTrue(np.isnan(out.marginal['optimizer.stepsize'][1]))
+
+        with self.assertRaises(Exception):
+            sensitivityGrid(sweepable, np.full(4, np.nan))
+
+        with self.assertRaises(ValueError):
+            sensitivityGrid(sweepable, np.zeros(3))
+
+    def test_sensitivityReport(self):
+        rng = np.random.default_rng(0)
+        shb = buildFakeSHBTrial()
+        shb._setUpDataStorage()
+
+        assert shb.data is not None
+        for alg in shb.data:
+            shb.data[alg][:] = rng.random(shb.data[alg].shape)
+
+        scores = shb.scoreParameters()
+        picked = shb.pickParameters()
+        report = shb.sensitivityReport()
+
+        for alg in ['DQN', 'DeepQ']:
+            self.assertTrue(np.allclose(np.sort(report[alg].grid.ravel()), np.sort(scores[alg])))
+            self.assertTrue(np.allclose(shb.sensitivity(alg).grid, report[alg].grid))
+
+        out = report['DQN']
+        self.assertEqual(out.values[2][out.best[2]], picked['DQN']['optimizer']['stepsize'])
@@ -0,0 +1,87 @@
+import unittest
+import numpy as np
+from shb.shb import SHB
+
+def buildFakeSHBTrial():
+    algs = [
+        ('DQN', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001] },
+        }, {}),
+        ('DeepQ', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001] },
+        }, {})
+    ]
+
+    shb = SHB(
+        selection_runs=10,
+        eval_runs=250,
+        repeated_measures=False,
+        algs=algs,
+        envs=['CliffWorld', 'LunarLander'],
+    )
+
+    return shb
+
+def fakeResult(job):
+    # CliffWorld always gives the same result for a setting, LunarLander is all over the place
+    rng = np.random.default_rng(job.seed)
+    if job.env == 'CliffWorld':
+        return np.log10(job.params['optimizer']['stepsize'])
+
+    return rng.normal(0, 10)
+
+params = {
+    'DQN': { 'optimizer': { 'stepsize': 0.01 } },
+    'DeepQ': { 'optimizer': { 'stepsize': 0.1 } },
+}
+
+class TestSequential(unittest.TestCase):
+    def test_sequentialEvaluation(self):
+        shb = buildFakeSHBTrial()
+        for job in shb.iterateModelSelectionJobs():
+            job.record(fakeResult(job))
+
+        full = { (j.alg, j.env, j.run): j.seed for j in shb.iterateEvaluationJobs(params) }
+
+        seq = shb.sequentialEvaluation(params, half_width=0.02, initial_runs=20, wave_size=50)
+        n_jobs = 0
+        for jobs in seq.iterateWaves():
+            for job in jobs:
+                self.assertEqual(job.seed, full[(job.alg, job.env, job.run)])
+                job.record(fakeResult(job))
+                n_jobs += 1
+
+        # the quiet env stops straight away, the noisy one runs up to the cap
+        self.assertEqual(seq.runs['DQN']['CliffWorld'], 20)
+        self.assertEqual(seq.runs['DQN']['LunarLander'], 250)
+        self.assertEqual(n_jobs, 2 * (20 + 250))
+        self.assertTrue(all(all(envs.values()) for envs in seq.stopped.values()))
+
+        self.assertEqual(shb.evaluation['DQN']['LunarLander'].count, 250)
+        self.assertLess(seq.halfWidth('DQN', 'LunarLander'), 0.1)
+
+    def test_stopsAtTarget(self):
+        shb = buildFakeSHBTrial()
+        for job in shb.iterateModelSelectionJobs():
+            job.record(fakeResult(job))
+
+        for job in shb.iterateSequentialEvaluationJobs(params, half_width=0.1, initial_runs=10, wave_size=10):
+            job.record(fakeResult(job))
+
+        # stopped at the first wave where the interval was narrow enough
+        summary = shb.evaluation['DeepQ']['LunarLander']
+        self.assertLess(summary.count, 250)
+        self.assertEqual(summary.count % 10, 0)
+
+        _, std, n = shb._evaluationMoments('DeepQ', 'LunarLander')
+        self.assertLessEqual(1.96 * std / np.sqrt(n), 0.1)
+
+    def test_waitsForWave(self):
+        shb = buildFakeSHBTrial()
+        for job in shb.iterateModelSelectionJobs():
+            job.record(fakeResult(job))
+
+        waves = shb.sequentialEvaluation(params, initial_runs=10).iterateWaves()
+        next(waves)
+        with self.assertRaises(Exception):
+            next(waves)
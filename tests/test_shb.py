@@ -1,3 +1,6 @@
+import os
+import pickle
+import tempfile
 import unittest
 from shb.shb import SHB
 
@@ -188,3 +191,119 @@ class TestSHB(unittest.TestCase):
         self.assertEqual(job.seed, 324)
         self.assertEqual(job.alg_seed, 324)
         self.assertEqual(job.env_seed, 324)
+
+    def test_randomAccess(self):
+        shb = buildFakeSHBTrial()
+        self.assertEqual(shb.numSelectionJobs(), 324)
+
+        jobs = list(shb.iterateModelSelectionJobs())
+        for i in [0, 1, 18, 54, 161, 162, 323]:
+            job = shb.getSelectionJob(i)
+            self.assertEqual((job.alg, job.env, job.idx, job.run), (jobs[i].alg, jobs[i].env, jobs[i].idx, jobs[i].run))
+            self.assertEqual((job.seed, job.alg_seed, job.env_seed), (jobs[i].seed, jobs[i].alg_seed, jobs[i].env_seed))
+            self.assertDictEqual(job.params, jobs[i].params)
+
+        with self.assertRaises(IndexError):
+            shb.getSelectionJob(324)
+
+        params = {
+            'DeepQ': { 'optimizer': { 'stepsize': 0.1 }, 'epsilon': 0.05, 'gamma': 0.999 },
+            'DQN': { 'optimizer': { 'stepsize': 0.01 }, 'epsilon': 0.15, 'gamma': 0.99 },
+        }
+
+        job = shb.getEvaluationJob(250, params)
+        self.assertEqual(job.env, 'MountainCar')
+        self.assertEqual(job.seed, 574)
+        self.assertEqual(job.env_seed, 324)
+
+    def test_sharding(self):
+        shb = buildFakeSHBTrial()
+
+        shards = [list(shb.iterateModelSelectionJobs(shard=k, num_shards=4)) for k in range(4)]
+        self.assertEqual(sum(len(s) for s in shards), 324)
+
+        # every job appears in exactly one shard
+        seen = sorted((j.alg, j.env, j.idx, j.run) for s in shards for j in s)
+        expected = sorted((j.alg, j.env, j.idx, j.run) for j in shb.iterateModelSelectionJobs())
+        self.assertEqual(seen, expected)
+
+        # shards take every 4th job in job order
+        for i, job in enumerate(shards[1]):
+            other = shb.getSelectionJob(4 * i + 1)
+            self.assertEqual((job.alg, job.env, job.idx, job.run, job.seed), (other.alg, other.env, other.idx, other.run, other.seed))
+
+        with self.assertRaises(ValueError):
+            next(shb.iterateModelSelectionJobs(shard=4, num_shards=4))
+
+    def test_manifest(self):
+        shb = buildFakeSHBTrial()
+        jobs = list(shb.iterateModelSelectionJobs())
+
+        manifest = shb.selectionManifest()
+        self.assertEqual(len(manifest), 324)
+        for i in [0, 1, 18, 54, 161, 162, 323]:
+            job = shb.getManifestJob(manifest[i])
+            self.assertEqual((job.alg, job.env, job.idx, job.run), (jobs[i].alg, jobs[i].env, jobs[i].idx, jobs[i].run))
+            self.assertEqual(tuple(manifest[i][['seed', 'alg_seed', 'env_seed']]), (jobs[i].seed, jobs[i].alg_seed, jobs[i].env_seed))
+            self.assertDictEqual(job.params, jobs[i].params)
+
+        shard = shb.selectionManifest(shard=1, num_shards=4)
+        self.assertEqual([shb.getManifestJob(row).seed for row in shard], [j.seed for j in jobs[1::4]])
+
+        jobs[0].record(0.0)
+        self.assertEqual(len(shb.selectionManifest(skip_completed=True)), 323)
+
+    def test_compactJobs(self):
+        shb = buildFakeSHBTrial()
+        job = shb.getSelectionJob(5)
+
+        # params are only built when needed, and jobs don't carry a __dict__
+        self.assertIsNone(job._params)
+        self.assertFalse(hasattr(job, '__dict__'))
+
+        clone = pickle.loads(pickle.dumps(job))
+        self.assertEqual((clone.alg, clone.env, clone.idx, clone.run, clone.seed), (job.alg, job.env, job.idx, job.run, job.seed))
+        self.assertDictEqual(clone.params, job.params)
+        self.assertFalse(hasattr(clone, '_storeData'))
+
+    def test_saveAndResume(self):
+        shb = buildFakeSHBTrial()
+
+        # pretend the driver died a third of the way through
+        jobs = list(shb.iterateModelSelectionJobs())
+        for job in jobs[:100]:
+            job.record(0.0)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'checkpoint.npz')
+            shb.save(path)
+
+            resumed = SHB.load(path)
+
+        self.assertEqual(resumed.selection_runs, 3)
+        self.assertEqual(resumed.numSelectionJobs(), 324)
+        self.assertDictEqual(resumed._algs['DQN'][2], shb._algs['DQN'][2])
+
+        # a recorded 0.0 is not the same as never having run
+        remaining = list(resumed.iterateModelSelectionJobs(skip_completed=True))
+        self.assertEqual(len(remaining), 224)
+
+        first = remaining[0]
+        self.assertEqual((first.alg, first.env, first.idx, first.run), (jobs[100].alg, jobs[100].env, jobs[100].idx, jobs[100].run))
+        self.assertEqual(first.seed, jobs[100].seed)
+
+        for job in remaining:
+            job.record(1.0)
+
+        self.assertEqual(len(list(resumed.iterateModelSelectionJobs(skip_completed=True))), 0)
+
+    def test_saveWithoutData(self):
+        shb = buildFakeSHBTrial()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'checkpoint.npz')
+            shb.save(path)
+            resumed = SHB.load(path)
+
+        self.assertIsNone(resumed.data)
+        self.assertEqual(len(list(resumed.iterateModelSelectionJobs(skip_completed=True))), 324)
@@ -0,0 +1,185 @@
+import unittest
+import numpy as np
+from shb.shb import SHB
+from shb.sketch import EvaluationSummary, RunningStats, QuantileSketch
+
+def buildFakeSHBTrial():
+    algs = [
+        ('DQN', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001] },
+        }, {}),
+        ('DeepQ', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001] },
+        }, {})
+    ]
+
+    shb = SHB(
+        selection_runs=10,
+        eval_runs=100,
+        repeated_measures=False,
+        algs=algs,
+        envs=['MountainCar', 'CartPole'],
+    )
+
+    return shb
+
+class TestSketch(unittest.TestCase):
+    def test_runningStats(self):
+        rng = np.random.default_rng(0)
+        x = rng.normal(3, 2, size=1000)
+
+        a = RunningStats()
+        b = RunningStats()
+        for v in x[:300]:
+            a.add(v)
+
+        for v in x[300:]:
+            b.add(v)
+
+        a.merge(b)
+        self.assertEqual(a.count, 1000)
+        self.assertAlmostEqual(a.mean, np.mean(x))
+        self.assertAlmostEqual(a.variance, np.var(x, ddof=1))
+
+    def test_quantileSketch(self):
+        rng = np.random.default_rng(0)
+        x = rng.normal(0, 100, size=5000)
+
+        whole = QuantileSketch(0.01)
+        parts = [QuantileSketch(0.01) for _ in range(4)]
+        for i, v in enumerate(x):
+            whole.add(v)
+            parts[i % 4].add(v)
+
+        # merging is exact, regardless of how the stream was split up
+        merged = parts[0]
+        for part in parts[1:]:
+            merged.merge(part)
+
+        self.assertEqual(merged.positive, whole.positive)
+        self.assertEqual(merged.negative, whole.negative)
+        self.assertEqual(merged.count, 5000)
+
+        for q in [0.01, 0.25, 0.5, 0.75, 0.99]:
+            expected = np.quantile(x, q, method='lower')
+            self.assertAlmostEqual(whole.quantile(q), expected, delta=0.011 * abs(expected) + 1)
+
+        # memory depends on the range of values, not how many there are
+        self.assertLess(len(whole.positive) + len(whole.negative), 1000)
+
+        with self.assertRaises(ValueError):
+            whole.merge(QuantileSketch(0.05))
+
+    def test_addMany(self):
+        rng = np.random.default_rng(0)
+        x = np.concatenate((rng.normal(0, 100, size=5000), [0., 1e-12, np.nan, np.nan]))
+
+        one = EvaluationSummary(0.01)
+        for v in x:
+            one.add(v)
+
+        many = EvaluationSummary(0.01)
+        many.addMany(x[:1000])
+        many.addMany(x[1000:])
+
+        # the buckets are identical, only the running stats can differ by rounding
+        self.assertEqual(many.sketch.positive, one.sketch.positive)
+        self.assertEqual(many.sketch.negative, one.sketch.negative)
+        self.assertEqual((many.sketch.zeros, many.nans, many.count), (one.sketch.zeros, one.nans, one.count))
+        self.assertAlmostEqual(many.stats.mean, one.stats.mean)
+        self.assertAlmostEqual(many.stats.variance, one.stats.variance)
+
+        with self.assertRaises(ValueError):
+            QuantileSketch().addMany(np.array([1., np.nan]))
+
+    def test_recordEvaluation(self):
+        rng = np.random.default_rng(0)
+        shb = buildFakeSHBTrial()
+        for job in shb.iterateModelSelectionJobs():
+            job.record(rng.normal(job.idx, 1))
+
+        params = { 'DQN': { 'optimizer': { 'stepsize': 0.1 } }, 'DeepQ': { 'optimizer': { 'stepsize': 0.001 } } }
+
+        # pretend the evaluation jobs were split between two processes
+        workers = [buildFakeSHBTrial(), buildFakeSHBTrial()]
+        results = {}
+        for k, worker in enumerate(workers):
+            for job in worker.iterateEvaluationJobs(params, shard=k, num_shards=2):
+                result = rng.normal(job.params['optimizer']['stepsize'] * 10, 1)
+                results.setdefault((job.alg, job.env), []).append(result)
+                job.record(result)
+
+        shb.mergeEvaluation(workers[0].evaluation)
+        shb.mergeEvaluation(workers[1].evaluation)
+
+        summary = shb.evaluation['DQN']['CartPole']
+        self.assertEqual(summary.count, 100)
+        self.assertAlmostEqual(summary.stats.mean, np.mean(results[('DQN', 'CartPole')]))
+
+        scores = shb.evaluationScores()
+        for (alg, env), values in results.items():
+            expected = np.mean([shb.cdfScale(env, v) for v in values])
+            self.assertAlmostEqual(scores[alg][env], expected, delta=0.02)
+
+    def test_nanResults(self):
+        shb = buildFakeSHBTrial()
+        shb.record('DQN', 'CartPole', 0, 0, 1.0)
+
+        shb.recordEvaluation('DQN', 'CartPole', 0, 0, np.nan)
+        shb.recordEvaluation('DQN', 'CartPole', 0, 1, 2.0)
+
+        summary = shb.evaluation['DQN']['CartPole']
+        self.assertEqual(summary.nans, 1)
+        self.assertEqual(summary.count, 2)
+        self.assertEqual(summary.stats.mean, 2.0)
+
+    def test_approximateCdf(self):
+        rng = np.random.default_rng(0)
+        shb = buildFakeSHBTrial()
+        shb.useApproximateCdf(relative_accuracy=0.01)
+
+        for job in shb.iterateModelSelectionJobs():
+            job.record(rng.normal(job.idx * 10, 5))
+
+        # the exact answer is always within the reported bound
+        values = rng.normal(10, 20, size=200)
+        estimate, bound = shb.cdfScaleApproximate('CartPole', values)
+        exact = shb.cdfScaleBatch('CartPole', values)
+        self.assertTrue(np.all(np.abs(estimate - exact) <= bound + 1e-12))
+        self.assertLess(np.max(bound), 0.05)
+
+        scores = shb.scoreParametersApproximate()
+        expected = shb.scoreParameters(completed_only=True)
+        for alg in ['DQN', 'DeepQ']:
+            estimate, bound = scores[alg]
+            self.assertTrue(np.all(np.abs(estimate - expected[alg]) <= bound + 1e-12))
+
+        params, bounds = shb.pickParametersApproximate()
+        self.assertDictEqual(params, shb.pickParameters())
+        self.assertLess(bounds['DQN'], 0.05)
+
+        # replacing a result rebuilds the sketch rather than double counting
+        shb.record('DQN', 'CartPole', 0, 0, 1000.)
+        assert shb.sketches is not None
+        self.assertEqual(shb.sketches['DQN'][0].count, 30)
+        self.assertAlmostEqual(shb.sketches['DQN'][0].sketch.quantile(1), 1000, delta=10)
+
+    def test_registerAfterApproximateCdf(self):
+        rng = np.random.default_rng(0)
+        shb = buildFakeSHBTrial()
+        shb.useApproximateCdf()
+
+        # algs and envs registered later still get sketches
+        shb.registerEnvPool(['Acrobot'])
+        shb.registerAlg('Sarsa', { 'alpha': [0.1, 0.5] })
+
+        for job in shb.iterateModelSelectionJobs():
+            job.record(rng.normal(job.idx, 1))
+
+        assert shb.sketches is not None
+        self.assertEqual(shb.sketches['Sarsa'][shb._envIndex('Acrobot')].count, 20)
+
+        scores = shb.scoreParametersApproximate()
+        expected = shb.scoreParameters(completed_only=True)
+        estimate, bound = scores['Sarsa']
+        self.assertTrue(np.all(np.abs(estimate - expected['Sarsa']) <= bound + 1e-12))
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import multiprocessing as mp
+from shb.shb import SHB
+
+def buildFakeSHBTrial(path=None, dtype=np.float64):
+    algs = [
+        ('DQN', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001] },
+            'epsilon': [0.05, 0.1],
+        }, {}),
+        ('DeepQ', {
+            'optimizer': { 'stepsize': [0.1, 0.01, 0.001] },
+            'epsilon': [0.05, 0.1],
+        }, {})
+    ]
+
+    shb = SHB(
+        selection_runs=3,
+        eval_runs=250,
+        repeated_measures=False,
+        algs=algs,
+        envs=['MountainCar', 'CartPole'],
+        storage_path=path,
+        dtype=dtype,
+    )
+
+    return shb
+
+def fakeResult(i: int):
+    return (i * 7919) % 101
+
+def recordShard(path: str, shard: int, num_shards: int):
+    shb = buildFakeSHBTrial(path)
+    for job in shb.iterateModelSelectionJobs(shard=shard, num_shards=num_shards):
+        job.record(fakeResult(job.run * 1000 + job.idx * 10 + len(job.env) + len(job.alg)))
+
+    shb.flush()
+
+class TestStorage(unittest.TestCase):
+    def test_concurrentWriters(self):
+        expected = buildFakeSHBTrial()
+        for job in expected.iterateModelSelectionJobs():
+            job.record(fakeResult(job.run * 1000 + job.idx * 10 + len(job.env) + len(job.alg)))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            procs = [mp.Process(target=recordShard, args=(tmp, k, 4)) for k in range(4)]
+            for p in procs:
+                p.start()
+
+            for p in procs:
+                p.join()
+                self.assertEqual(p.exitcode, 0)
+
+            # a fresh reader sees everything the workers wrote
+            shb = buildFakeSHBTrial(tmp)
+            self.assertDictEqual(shb.pickParameters(), expected.pickParameters())
+
+            assert shb.data is not None and shb.completed is not None and expected.data is not None
+            for alg in ['DQN', 'DeepQ']:
+                self.assertTrue(np.all(shb.data[alg] == expected.data[alg]))
+                self.assertTrue(np.all(shb.completed[alg]))
+
+    def test_completed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            shb = buildFakeSHBTrial(tmp)
+            shb.record('DQN', 'CartPole', 2, 1, 0.0)
+
+            assert shb.completed is not None
+            self.assertTrue(shb.completed['DQN'][0, 2, 1])
+            self.assertEqual(np.sum(shb.completed['DQN']), 1)
+            self.assertEqual(np.sum(shb.completed['DeepQ']), 0)
+
+    def test_float32(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            shb = buildFakeSHBTrial(tmp, dtype=np.float32)
+            shb.record('DQN', 'CartPole', 0, 0, 1.5)
+            shb.flush()
+
+            self.assertEqual(os.path.getsize(os.path.join(tmp, 'DQN.npy')) - 128, 2 * 6 * 3 * 4)
+
+            # reopening with a different dtype is an error, not a silent reinterpretation
+            with self.assertRaises(ValueError):
+                buildFakeSHBTrial(tmp, dtype=np.float64).pickParameters()
+
+    def test_readsDontCreateStore(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            shb = buildFakeSHBTrial(tmp)
+
+            with self.assertRaises(Exception):
+                shb.pickParameters()
+
+            with self.assertRaises(Exception):
+                shb.cdfScale('CartPole', 0.5)
+
+            self.assertEqual(os.listdir(tmp), [])
+
+            # nothing has been recorded yet, so there is still nothing to pick from
+            shb._setUpDataStorage()
+            with self.assertRaises(Exception):
+                buildFakeSHBTrial(tmp).pickParameters()